@@ -0,0 +1,90 @@
+"""
+Real-time versus offline batch cost of the same prompts.
+
+Both paths run against the in-process stand-in server in `mock_provider.py`,
+which imitates the chat, file-upload and batch endpoints of each provider, so
+the comparison needs no network access. The batch path should record the same
+tokens at about half the cost.
+
+Usage:
+    python benchmarks/bench_batch_job.py [--prompts 200] [--provider openai]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "packages"))
+
+from llm.factory import get_client_class  # noqa: E402
+from llm.ledger import CostLedger  # noqa: E402
+from llm.llm_utils import LLMEngine  # noqa: E402
+from llm.types import Prompt  # noqa: E402
+from mock_provider import MockProvider  # noqa: E402
+
+CONFIGS = {
+    "openai": "default:\n  model: gpt-4o-mini\n",
+    "gemini": "default:\n  model: gemini-1.5-flash\n",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--provider", choices=sorted(CONFIGS), default="openai")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    prompts = [
+        Prompt(f"Correct the grammar of sentence {i}.", "You are a grammar checker.")
+        for i in range(args.prompts)
+    ]
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, MockProvider() as mock:
+        config_path = os.path.join(workdir, "config.yaml")
+        Path(config_path).write_text(CONFIGS[args.provider])
+        base_url = mock.openai_url if args.provider == "openai" else mock.gemini_url
+        client_class = get_client_class(args.provider)
+
+        for mode in ("real-time", "batch"):
+            ledger = CostLedger()
+            client = client_class(
+                LLMEngine(config_path=config_path),
+                prompts[0],
+                "key",
+                ledger=ledger,
+                base_url=base_url,
+            )
+            start = time.perf_counter()
+            if mode == "batch":
+                outcomes = list(client.call_batch_job(prompts, poll_interval=0.01))
+            else:
+                outcomes = client.call_batch(prompts)
+            elapsed = time.perf_counter() - start
+            totals = ledger.aggregated()
+            results[mode] = {
+                "succeeded": sum(r.status == "success" for r in outcomes),
+                "total_tokens": totals["overall_total_tokens"],
+                "total_cost": totals["overall_total_cost"],
+                "seconds": elapsed,
+            }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<12}{'ok':>6}{'tokens':>10}{'cost USD':>14}{'seconds':>10}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<12}{result['succeeded']:>6}{result['total_tokens']:>10}"
+            f"{result['total_cost']:>14.6f}{result['seconds']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Throughput, latency and memory of the client stack against a local stand-in.
+
+`OpenAIClient` and `GeminiClient` run against the in-process server in
+`mock_provider.py` in four modes:
+
+- single: sequential `call_request` calls
+- batch: `call_batch` on a thread pool
+- async: `acall_batch` on one event loop
+- streaming: sequential `stream_request` calls, drained chunk by chunk
+
+For each provider and mode we report throughput, p50/p95/p99 latency, the
+client-side overhead per call and the growth of the resident set size.
+Overhead is the mean latency minus the latency the server injects, so it also
+includes the local HTTP round trip. Rate limits are lifted in the generated
+config so the limiter never throttles the run.
+
+`--json` writes the results for later runs to `--compare` against. A compare
+run exits with status 1 when throughput drops, or p95 latency or overhead
+grows, by more than `--tolerance`.
+
+Usage:
+    python benchmarks/bench_clients.py [--calls 200] [--latency 0.005] \
+        [--json results.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "packages"))
+
+import numpy as np  # noqa: E402
+from llm.factory import get_client_class  # noqa: E402
+from llm.llm_utils import LLMEngine  # noqa: E402
+from llm.types import JobType, Prompt  # noqa: E402
+from mock_provider import MockProvider  # noqa: E402
+
+CONFIGS = {
+    "openai": "model: gpt-4o-mini",
+    "gemini": "model: gemini-1.5-flash",
+}
+MODES = ("single", "batch", "async", "streaming")
+# metric -> True when larger is better
+COMPARED_METRICS = {"calls_per_sec": True, "p95_ms": False, "overhead_ms": False}
+
+
+def rss_kb() -> int:
+    """Current resident set size, or the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def timed(latencies: List[float], call: Callable[..., Any]) -> Callable[..., Any]:
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        result = call(*args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+def atimed(latencies: List[float], call: Callable[..., Any]) -> Callable[..., Any]:
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        result = await call(*args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+def run_pass(
+    client: Any,
+    mode: str,
+    concurrency: int,
+    prompts: List[Prompt],
+    latencies: List[float],
+) -> int:
+    """Send `prompts` in a synchronous mode; return the number of errors."""
+    errors = 0
+    if mode == "batch":
+        # shadow the bound method so call_batch times every request it sends
+        client.call_request = timed(latencies, client.call_request)
+        try:
+            results = client.call_batch(prompts, max_concurrency=concurrency)
+        finally:
+            del client.call_request
+        return sum(result.status == "error" for result in results)
+
+    def drain(prompt: Prompt) -> None:
+        for _ in client.stream_request(prompt=prompt):
+            pass
+
+    if mode == "single":
+        call = timed(latencies, partial(client.call_request, JobType.CHAT_COMPLETION))
+    else:
+        call = timed(latencies, drain)
+    for prompt in prompts:
+        try:
+            call(prompt=prompt)
+        except Exception:
+            errors += 1
+    return errors
+
+
+async def arun_pass(
+    client: Any, concurrency: int, prompts: List[Prompt], latencies: List[float]
+) -> int:
+    client.acall_request = atimed(latencies, client.acall_request)
+    try:
+        results = await client.acall_batch(prompts, max_concurrency=concurrency)
+    finally:
+        del client.acall_request
+    return sum(result.status == "error" for result in results)
+
+
+def start_measurement() -> Tuple[int, float]:
+    gc.collect()
+    return rss_kb(), time.perf_counter()
+
+
+def finish_measurement(
+    start: Tuple[int, float], latencies: List[float], errors: int
+) -> Dict[str, Any]:
+    elapsed = time.perf_counter() - start[1]
+    gc.collect()
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "elapsed": elapsed,
+        "rss_growth_kb": rss_kb() - start[0],
+    }
+
+
+def run_mode(
+    client: Any, mode: str, prompts: List[Prompt], warmup: int, concurrency: int
+) -> Dict[str, Any]:
+    """Warm up connection pools and lazy imports, then measure one pass."""
+    if mode == "async":
+        # async pools belong to their event loop, so both passes share one
+        return asyncio.run(arun_mode(client, prompts, warmup, concurrency))
+    run_pass(client, mode, concurrency, prompts[:warmup], [])
+    start = start_measurement()
+    latencies: List[float] = []
+    errors = run_pass(client, mode, concurrency, prompts, latencies)
+    return finish_measurement(start, latencies, errors)
+
+
+async def arun_mode(
+    client: Any, prompts: List[Prompt], warmup: int, concurrency: int
+) -> Dict[str, Any]:
+    await arun_pass(client, concurrency, prompts[:warmup], [])
+    start = start_measurement()
+    latencies: List[float] = []
+    errors = await arun_pass(client, concurrency, prompts, latencies)
+    return finish_measurement(start, latencies, errors)
+
+
+def summarize(run: Dict[str, Any], injected: float) -> Dict[str, Any]:
+    # failed calls are excluded from latencies; wrappers only see successes
+    latencies = np.array(run["latencies"] or [0.0]) * 1000
+    calls = len(run["latencies"])
+    return {
+        "calls": calls,
+        "errors": run["errors"],
+        "calls_per_sec": calls / run["elapsed"] if run["elapsed"] else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "overhead_ms": max(0.0, float(latencies.mean()) - injected * 1000),
+        "rss_growth_kb": run["rss_growth_kb"],
+    }
+
+
+def benchmark(
+    provider: str, mock: MockProvider, workdir: str, args: argparse.Namespace
+) -> Dict[str, Any]:
+    config_path = os.path.join(workdir, f"{provider}.yaml")
+    Path(config_path).write_text(
+        f"default:\n  {CONFIGS[provider]}\n"
+        "  rate_limit_rpm: 100000000\n  rate_limit_tpm: 100000000000\n"
+    )
+    base_url = mock.openai_url if provider == "openai" else mock.gemini_url
+    client = get_client_class(provider)(
+        LLMEngine(config_path=config_path), Prompt("warm-up"), "key", base_url=base_url
+    )
+    prompts = [
+        Prompt(f"Correct the grammar of sentence {i}.", "You are a grammar checker.")
+        for i in range(args.calls)
+    ]
+    return {
+        mode: summarize(
+            run_mode(client, mode, prompts, args.warmup, args.concurrency),
+            args.latency,
+        )
+        for mode in args.modes
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    regressions = []
+    for provider, modes in results.items():
+        for mode, metrics in modes.items():
+            reference = baseline.get(provider, {}).get(mode)
+            if reference is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                old, new = reference[metric], metrics[metric]
+                if not old:
+                    continue
+                change = (new - old) / old
+                if (-change if higher_is_better else change) > tolerance:
+                    regressions.append(
+                        f"{provider}/{mode} {metric}: {old:.2f} -> {new:.2f} "
+                        f"({change:+.0%})"
+                    )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--providers", nargs="+", choices=CONFIGS, default=list(CONFIGS)
+    )
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--output-tokens", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON results")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results: Dict[str, Any] = {}
+    with (
+        tempfile.TemporaryDirectory() as workdir,
+        MockProvider(
+            latency=args.latency,
+            output_tokens=args.output_tokens,
+            error_rate=args.error_rate,
+        ) as mock,
+    ):
+        for provider in args.providers:
+            results[provider] = benchmark(provider, mock, workdir, args)
+
+    print(
+        f"{'provider':<9}{'mode':<11}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'ovh ms':>8}{'errors':>8}{'rss KB':>9}"
+    )
+    for provider, modes in results.items():
+        for mode, m in modes.items():
+            print(
+                f"{provider:<9}{mode:<11}{m['calls_per_sec']:>9.1f}"
+                f"{m['p50_ms']:>9.2f}{m['p95_ms']:>9.2f}{m['p99_ms']:>9.2f}"
+                f"{m['overhead_ms']:>8.2f}{m['errors']:>8}{m['rss_growth_kb']:>9}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        regressions = compare(
+            results, json.loads(Path(args.compare).read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark for `import llm` and the first `load_llm_client` call.
+
+Every scenario runs in a fresh interpreter so nothing is already cached in
+`sys.modules`. For each one we report the median wall time and which provider
+SDKs ended up imported, showing that start-up cost only grows with the
+providers a job actually uses.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 7] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+PACKAGES_DIR = Path(__file__).resolve().parent.parent / "packages"
+SDK_MODULES = ("openai", "google.genai", "dotenv")
+
+SCENARIOS = {
+    "import llm": "import llm",
+    "openai client": "import llm; llm.load_llm_client('key', provider='openai')",
+    "gemini client": "import llm; llm.load_llm_client('key', provider='gemini')",
+    "both clients": (
+        "import llm; llm.load_llm_client('key', provider='openai'); "
+        "llm.load_llm_client('key', provider='gemini')"
+    ),
+}
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {sdk_modules!r} if name in sys.modules]
+print(json.dumps([elapsed, loaded]))
+"""
+
+
+def run_scenario(code: str, runs: int, workdir: str) -> Dict[str, Any]:
+    env = dict(os.environ, PYTHONPATH=str(PACKAGES_DIR))
+    timings: List[float] = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code, sdk_modules=SDK_MODULES)],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        elapsed, loaded = json.loads(output.strip().splitlines()[-1])
+        timings.append(elapsed)
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "sdk_modules": loaded,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        Path(workdir, "config.yaml").write_text("default:\n  model: gpt-4o-mini\n")
+        results = {
+            name: run_scenario(code, args.runs, workdir)
+            for name, code in SCENARIOS.items()
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<16}{'median ms':>12}{'min ms':>10}  sdk modules")
+    for name, result in results.items():
+        print(
+            f"{name:<16}{result['median_ms']:>12.1f}{result['min_ms']:>10.1f}  "
+            f"{', '.join(result['sdk_modules']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
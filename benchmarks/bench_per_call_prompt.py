@@ -0,0 +1,103 @@
+"""
+Per-prompt overhead of building a client per prompt versus reusing one client.
+
+The "client per prompt" scenario calls `load_llm_client` for every prompt, the
+pattern the examples used before prompts could be passed per call. The "warm
+client" scenario builds one client and resolves each prompt per call with
+`resolve_prompt`, which is what `call_request(job, prompt, variables)` does
+before sending. The "template" scenario renders the same prompts in bulk with
+`PromptTemplate.render_many`, as a batch job would. No requests are sent, so
+the numbers are pure client-side cost.
+
+Usage:
+    python benchmarks/bench_per_call_prompt.py [--prompts 2000] [--provider openai]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "packages"))
+
+from llm import load_llm_client  # noqa: E402
+from llm.prompt import (  # noqa: E402
+    ExamplePrompt,
+    compile_prompt,
+    ielts_tutor_prompt,
+)
+
+CONFIGS = {
+    "openai": "default:\n  model: gpt-4o-mini\n",
+    "gemini": "default:\n  model: gemini-1.5-flash\n",
+}
+
+
+def measure(run: Callable[[int], None], prompts: int) -> Dict[str, float]:
+    start = time.perf_counter()
+    for index in range(prompts):
+        run(index)
+    elapsed = time.perf_counter() - start
+    return {"total_ms": elapsed * 1000, "per_prompt_us": elapsed / prompts * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--prompts", type=int, default=2000)
+    parser.add_argument("--provider", choices=sorted(CONFIGS), default="openai")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args()
+    # client construction logs its parameters; keep the output readable
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config_path = os.path.join(workdir, "config.yaml")
+        Path(config_path).write_text(CONFIGS[args.provider])
+
+        def client_per_prompt(index: int) -> None:
+            client = load_llm_client(
+                "key",
+                ielts_tutor_prompt(f"answer {index}"),
+                provider=args.provider,
+                config_path=config_path,
+            )
+            client.resolve_prompt()
+
+        warm = load_llm_client(
+            "key",
+            ExamplePrompt.ielts_tutor_template,
+            provider=args.provider,
+            config_path=config_path,
+        )
+
+        def warm_client(index: int) -> None:
+            warm.resolve_prompt(variables={"student_answer": f"answer {index}"})
+
+        rendered = compile_prompt(ExamplePrompt.ielts_tutor_template).render_many(
+            {"student_answer": f"answer {index}"} for index in range(args.prompts)
+        )
+
+        def template(index: int) -> None:
+            next(rendered)
+
+        results = {
+            "client per prompt": measure(client_per_prompt, args.prompts),
+            "warm client": measure(warm_client, args.prompts),
+            "template": measure(template, args.prompts),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scenario':<20}{'total ms':>12}{'us / prompt':>14}")
+    for name, result in results.items():
+        print(f"{name:<20}{result['total_ms']:>12.1f}{result['per_prompt_us']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
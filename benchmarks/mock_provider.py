@@ -0,0 +1,563 @@
+"""
+In-process stand-in for the OpenAI and Gemini HTTP APIs.
+
+Serves just enough of both APIs for the real SDKs to run against it:
+
+- OpenAI: `/v1/responses` (plain and streamed), `/v1/embeddings`,
+  `/v1/files` uploads and downloads, and the `/v1/batches` lifecycle.
+- Gemini: `:generateContent`, `:streamGenerateContent`,
+  `:batchEmbedContents`, `cachedContents` creation, resumable file uploads,
+  `:batchGenerateContent`, batch polling and result downloads.
+
+Prompt caching is imitated too: OpenAI reports instructions it has seen before
+as cached input tokens, and Gemini reports the tokens of a referenced context
+cache.
+
+Latency, output size and an error rate can be injected, so benchmarks and
+manual checks exercise the clients without network access or API keys.
+
+Usage:
+    with MockProvider(latency=0.01) as mock:
+        client = OpenAIClient(engine, prompt, "key", base_url=mock.openai_url)
+        client = GeminiClient(engine, prompt, "key", base_url=mock.gemini_url)
+"""
+
+import base64
+import email.parser
+import hashlib
+import itertools
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+
+class MockProvider:
+    """
+    Threaded HTTP server imitating both providers.
+
+    Args:
+        latency: Seconds each request takes before it is answered.
+        output_tokens: Output tokens reported (and text chunks streamed) per reply.
+        error_rate: Share of requests answered with an HTTP 500, or with an \
+            error line inside batch results.
+        batch_polls: Status polls a batch job stays in progress for.
+        embedding_dimensions: Length of the returned embedding vectors.
+        seed: Seed of the error injection.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        output_tokens: int = 5,
+        error_rate: float = 0.0,
+        batch_polls: int = 1,
+        embedding_dimensions: int = 8,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.batch_polls = batch_polls
+        self.embedding_dimensions = embedding_dimensions
+        self.requests = 0
+        # JSON body of the latest generation or embedding request
+        self.last_request: Optional[Dict[str, Any]] = None
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        # context cache name -> tokens it holds
+        self.context_caches: Dict[str, int] = {}
+        self._prefixes: Set[str] = set()
+        self._ids = itertools.count()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "server is not running"
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def openai_url(self) -> str:
+        return f"{self.url}/v1"
+
+    @property
+    def gemini_url(self) -> str:
+        return self.url
+
+    def start(self) -> "MockProvider":
+        provider = self
+
+        class Handler(_Handler):
+            mock = provider
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockProvider":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def next_id(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return next(self._ids)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def usage(self, request: Any, prefix_tokens: int = 0) -> Dict[str, int]:
+        # roughly four characters per token, like the clients' own estimate
+        input_tokens = max(1, len(json.dumps(request)) // 4) + prefix_tokens
+        return {
+            "input": input_tokens,
+            "output": self.output_tokens,
+            "total": input_tokens + self.output_tokens,
+        }
+
+    def cached_prefix(self, instructions: Optional[str]) -> int:
+        """Tokens of `instructions` served from cache: all once seen before."""
+        if not instructions:
+            return 0
+        with self._lock:
+            seen = instructions in self._prefixes
+            self._prefixes.add(instructions)
+        return len(instructions) // 4 if seen else 0
+
+    def create_context_cache(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        tokens = max(1, len(json.dumps(request.get("systemInstruction"))) // 4)
+        name = f"cachedContents/{self.next_id()}"
+        with self._lock:
+            self.context_caches[name] = tokens
+        return {
+            "name": name,
+            "model": request.get("model"),
+            "usageMetadata": {"totalTokenCount": tokens},
+        }
+
+    # OpenAI payloads
+
+    def openai_response(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        index = self.next_id()
+        instructions = request.get("instructions")
+        cached = self.cached_prefix(instructions)
+        usage = self.usage(
+            request.get("input"), len(instructions) // 4 if instructions else 0
+        )
+        text = " ".join(f"tok{k}" for k in range(self.output_tokens))
+        return {
+            "id": f"resp_{index}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": request.get("model"),
+            "status": "completed",
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_{index}",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [
+                        {"type": "output_text", "text": text, "annotations": []}
+                    ],
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": usage["input"],
+                "output_tokens": usage["output"],
+                "total_tokens": usage["total"],
+                "input_tokens_details": {"cached_tokens": cached},
+                "output_tokens_details": {"reasoning_tokens": 0},
+            },
+        }
+
+    def openai_batch(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        done = batch["polls"] > self.batch_polls
+        if done and batch["output_file_id"] is None:
+            self.__run_openai_batch(batch)
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": batch["endpoint"],
+            "input_file_id": batch["input_file_id"],
+            "completion_window": "24h",
+            "created_at": batch["created_at"],
+            "status": "completed" if done else "in_progress",
+            "output_file_id": batch["output_file_id"],
+            "error_file_id": batch["error_file_id"],
+        }
+
+    def __run_openai_batch(self, batch: Dict[str, Any]) -> None:
+        output: List[str] = []
+        errors: List[str] = []
+        for line in self.files[batch["input_file_id"]].splitlines():
+            request = json.loads(line)
+            result: Dict[str, Any] = {"custom_id": request["custom_id"], "error": None}
+            if self.should_fail():
+                result["response"] = {
+                    "status_code": 500,
+                    "body": {"error": {"message": "injected failure"}},
+                }
+                errors.append(json.dumps(result))
+            else:
+                result["response"] = {
+                    "status_code": 200,
+                    "body": self.openai_response(request["body"]),
+                }
+                output.append(json.dumps(result))
+        # providers write results in completion order, not input order
+        self._random.shuffle(output)
+        batch["output_file_id"] = self.store_file("\n".join(output).encode())
+        if errors:
+            batch["error_file_id"] = self.store_file("\n".join(errors).encode())
+
+    def embedding(self, text: str) -> List[float]:
+        # deterministic per text, so equal inputs embed identically
+        digest = hashlib.sha256(text.encode()).digest()
+        return [
+            digest[k % len(digest)] / 255 - 0.5
+            for k in range(self.embedding_dimensions)
+        ]
+
+    def openai_embeddings(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        texts = request["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        data = []
+        for index, text in enumerate(texts):
+            vector: Any = self.embedding(text)
+            if request.get("encoding_format") == "base64":
+                packed = struct.pack(f"<{len(vector)}f", *vector)
+                vector = base64.b64encode(packed).decode()
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        tokens = sum(max(1, len(text) // 4) for text in texts)
+        self.next_id()
+        return {
+            "object": "list",
+            "data": data,
+            "model": request.get("model"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def gemini_embeddings(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.next_id()
+        return {
+            "embeddings": [
+                {
+                    "values": self.embedding(
+                        "".join(part["text"] for part in item["content"]["parts"])
+                    )
+                }
+                for item in request["requests"]
+            ]
+        }
+
+    # Gemini payloads
+
+    def gemini_response(self, request: Dict[str, Any], text: str) -> Dict[str, Any]:
+        cached = self.context_caches.get(request.get("cachedContent", ""), 0)
+        system = request.get("systemInstruction")
+        usage = self.usage(
+            request.get("contents"),
+            cached + (len(json.dumps(system)) // 4 if system else 0),
+        )
+        return {
+            "candidates": [
+                {
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": "STOP",
+                }
+            ],
+            "usageMetadata": {
+                "promptTokenCount": usage["input"],
+                "candidatesTokenCount": usage["output"],
+                "totalTokenCount": usage["total"],
+                "cachedContentTokenCount": cached,
+            },
+            "responseId": f"gem_{self.next_id()}",
+        }
+
+    def gemini_batch(self, name: str) -> Dict[str, Any]:
+        batch = self.batches[name]
+        batch["polls"] += 1
+        done = batch["polls"] > self.batch_polls
+        metadata: Dict[str, Any] = {
+            "@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatch",
+            "model": batch["model"],
+            "state": "BATCH_STATE_SUCCEEDED" if done else "BATCH_STATE_RUNNING",
+        }
+        if done:
+            if batch["output_file_id"] is None:
+                self.__run_gemini_batch(batch)
+            metadata["output"] = {"responsesFile": batch["output_file_id"]}
+        return {"name": name, "metadata": metadata, "done": done}
+
+    def __run_gemini_batch(self, batch: Dict[str, Any]) -> None:
+        output: List[str] = []
+        for line in self.files[batch["input_file_id"]].splitlines():
+            request = json.loads(line)
+            if self.should_fail():
+                result = {
+                    "key": request["key"],
+                    "error": {"code": 500, "message": "injected failure"},
+                }
+            else:
+                text = " ".join(f"g{k}" for k in range(self.output_tokens))
+                result = {
+                    "key": request["key"],
+                    "response": self.gemini_response(request["request"], text),
+                }
+            output.append(json.dumps(result))
+        self._random.shuffle(output)
+        batch["output_file_id"] = self.store_file(
+            "\n".join(output).encode(), prefix="files/"
+        )
+
+    def store_file(self, data: bytes, prefix: str = "file-") -> str:
+        file_id = f"{prefix}{self.next_id()}"
+        with self._lock:
+            self.files[file_id] = data
+        return file_id
+
+
+class _Server(ThreadingHTTPServer):
+    # the default backlog of 5 drops bursts of new connections, which the
+    # client then retries after a one second SYN timeout
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock: MockProvider
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without TCP_NODELAY the
+    # second one waits for a delayed ACK and every reply gains ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        time.sleep(self.mock.latency)
+        path = urlparse(self.path).path
+        if path.startswith("/v1/batches/"):
+            return self._json(self.mock.openai_batch(path.rsplit("/", 1)[1]))
+        if path.startswith("/v1/files/") and path.endswith("/content"):
+            return self._bytes(self.mock.files[path.split("/")[3]])
+        if "/batches/" in path:
+            return self._json(self.mock.gemini_batch(path.split("/", 2)[2]))
+        if path.endswith(":download"):
+            name = path.split("/", 2)[2][: -len(":download")]
+            return self._bytes(self.mock.files[name])
+        self._json({"error": {"message": f"unknown path {path}"}}, 404)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("content-length", 0)))
+        time.sleep(self.mock.latency)
+        url = urlparse(self.path)
+        path = url.path
+        if path == "/v1/files":
+            return self._openai_upload(body)
+        if path == "/v1/batches":
+            return self._openai_create_batch(json.loads(body))
+        if path == "/upload/v1beta/files":
+            return self._gemini_upload(body, parse_qs(url.query))
+        if path.endswith(":batchGenerateContent"):
+            return self._gemini_create_batch(path, json.loads(body))
+        if path.endswith("/cachedContents"):
+            return self._json(self.mock.create_context_cache(json.loads(body)))
+
+        request = json.loads(body or b"{}")
+        self.mock.last_request = request
+        if self.mock.should_fail():
+            return self._json({"error": {"message": "injected failure"}}, 500)
+        cached_content = request.get("cachedContent")
+        if cached_content and cached_content not in self.mock.context_caches:
+            # deleted or expired on the server
+            return self._json(
+                {
+                    "error": {
+                        "code": 404,
+                        "message": "CachedContent not found (or permission denied)",
+                        "status": "NOT_FOUND",
+                    }
+                },
+                404,
+            )
+        if path == "/v1/responses":
+            response = self.mock.openai_response(request)
+            if request.get("stream"):
+                return self._openai_stream(response)
+            return self._json(response)
+        if path == "/v1/embeddings":
+            return self._json(self.mock.openai_embeddings(request))
+        if path.endswith(":batchEmbedContents"):
+            return self._json(self.mock.gemini_embeddings(request))
+        if path.endswith(":generateContent"):
+            text = " ".join(f"g{k}" for k in range(self.mock.output_tokens))
+            return self._json(self.mock.gemini_response(request, text))
+        if path.endswith(":streamGenerateContent"):
+            return self._gemini_stream(request)
+        self._json({"error": {"message": f"unknown path {path}"}}, 404)
+
+    def _openai_upload(self, body: bytes) -> None:
+        # multipart/form-data with a "file" and a "purpose" field
+        message = email.parser.BytesParser().parsebytes(
+            b"content-type: "
+            + self.headers["content-type"].encode()
+            + b"\r\n\r\n"
+            + body
+        )
+        data = b""
+        for part in message.walk():
+            if part.get_param("name", header="content-disposition") == "file":
+                data = part.get_payload(decode=True)
+        file_id = self.mock.store_file(data)
+        self._json(
+            {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(data),
+                "created_at": int(time.time()),
+                "filename": "batch.jsonl",
+                "purpose": "batch",
+                "status": "processed",
+            }
+        )
+
+    def _openai_create_batch(self, request: Dict[str, Any]) -> None:
+        batch_id = f"batch_{self.mock.next_id()}"
+        self.mock.batches[batch_id] = {
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "created_at": int(time.time()),
+            "polls": 0,
+            "output_file_id": None,
+            "error_file_id": None,
+        }
+        batch = self.mock.openai_batch(batch_id)
+        self._json(dict(batch, status="validating"))
+
+    def _openai_stream(self, response: Dict[str, Any]) -> None:
+        events: List[Dict[str, Any]] = [
+            {
+                "type": "response.created",
+                "response": dict(response, status="in_progress", output=[]),
+            }
+        ]
+        events += [
+            {
+                "type": "response.output_text.delta",
+                "item_id": response["output"][0]["id"],
+                "output_index": 0,
+                "content_index": 0,
+                "delta": f"tok{k} ",
+                "logprobs": [],
+            }
+            for k in range(self.mock.output_tokens)
+        ]
+        events.append({"type": "response.completed", "response": response})
+        self._sse(
+            [dict(event, sequence_number=i) for i, event in enumerate(events)],
+            named=True,
+        )
+
+    def _gemini_stream(self, request: Dict[str, Any]) -> None:
+        chunks = [
+            {
+                "candidates": [
+                    {"content": {"role": "model", "parts": [{"text": f"g{k} "}]}}
+                ]
+            }
+            for k in range(self.mock.output_tokens - 1)
+        ]
+        chunks.append(self.mock.gemini_response(request, "end"))
+        self._sse(chunks)
+
+    def _gemini_upload(self, body: bytes, query: Dict[str, List[str]]) -> None:
+        # resumable protocol: a start request returns the URL the bytes go to
+        if "upload_id" not in query:
+            upload_id = self.mock.next_id()
+            self.send_response(200)
+            self.send_header(
+                "x-goog-upload-url",
+                f"{self.mock.url}/upload/v1beta/files?upload_id={upload_id}",
+            )
+            self.send_header("x-goog-upload-status", "active")
+            self.send_header("content-length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+            return
+        name = self.mock.store_file(body, prefix="files/")
+        payload = json.dumps(
+            {"file": {"name": name, "mimeType": "jsonl", "sizeBytes": len(body)}}
+        ).encode()
+        self.send_response(200)
+        self.send_header("x-goog-upload-status", "final")
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _gemini_create_batch(self, path: str, request: Dict[str, Any]) -> None:
+        name = f"batches/{self.mock.next_id()}"
+        self.mock.batches[name] = {
+            "model": path.split("/")[-1].split(":")[0],
+            "input_file_id": request["batch"]["inputConfig"]["fileName"],
+            "polls": 0,
+            "output_file_id": None,
+        }
+        batch = self.mock.batches[name]
+        self._json(
+            {
+                "name": name,
+                "metadata": {"model": batch["model"], "state": "BATCH_STATE_PENDING"},
+            }
+        )
+
+    def _json(self, payload: Any, status: int = 200) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _bytes(self, data: bytes) -> None:
+        self.send_response(200)
+        self.send_header("content-type", "application/octet-stream")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _sse(self, events: List[Dict[str, Any]], named: bool = False) -> None:
+        lines = []
+        for event in events:
+            if named:
+                lines.append(f"event: {event['type']}")
+            lines.append(f"data: {json.dumps(event)}\n")
+        data = ("\n".join(lines) + "\n").encode()
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
@@ -1,4 +1,4 @@
-from .factory import load_llm_client
-from .types import Prompt
+from .factory import load_llm_client, load_llm_router
+from .types import Message, Prompt
 
-__all__ = ["load_llm_client", "Prompt"]
+__all__ = ["load_llm_client", "load_llm_router", "Message", "Prompt"]
@@ -1,29 +1,929 @@
-from abc import ABC, abstractmethod
-from typing import Any, Dict
+import asyncio
+import logging
+import os
+import time
+import uuid
+from abc import ABC
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from llm.types import JobType
+import numpy as np
+from utils.logging import initiate_logger
+
+from llm.batch_job import wait_for_batch_job
+from llm.cache import ResponseCache, cache_key
+from llm.coalesce import SingleFlight
+from llm.embeddings import allocate_embeddings, plan_batches
+from llm.ledger import CostLedger, make_job_info
+from llm.llm_utils import LLMEngine
+from llm.metrics import get_metrics_registry
+from llm.pricing import ModelPricing, get_pricing_registry
+from llm.prompt import render_prompt
+from llm.rate_limiter import RateLimiter, get_rate_limiter
+from llm.retry import RetryPolicy, RetryRunner
+from llm.semantic_cache import SemanticCache
+from llm.streaming import StreamTimer
+from llm.tokens import (
+    APPROXIMATE,
+    ContextWindowExceeded,
+    RequestEstimate,
+    TokenCounter,
+    get_token_counter,
+)
+from llm.transport import TransportConfig, get_transport_registry
+from llm.types import (
+    BatchJob,
+    BatchResult,
+    JobInfo,
+    JobType,
+    Prompt,
+    PromptInput,
+    ResponseUsage,
+)
 
 
 class LLMClientBase(ABC):
-    @abstractmethod
-    def call_request(self, job_name: JobType) -> Any:
+    """
+    Provider-agnostic request flow shared by the provider clients.
+
+    `call_request` and `acall_request` resolve the prompt, check the \
+    context window, consult the response and semantic caches, coalesce \
+    identical requests in flight, retry or hedge under a `RetryPolicy`, \
+    pace requests through the rate limiter and record every attempt in \
+    the ledger and metrics. Streams and embeddings are timed, settled and \
+    recorded the same way. A provider client only implements the hooks \
+    that talk to its SDK: `_send`/`_asend` for one chat completion, \
+    `_stream`/`_astream`, `_embed`/`_aembed`, `_usage_from`, \
+    `_load_response`, `_retryable` and `_build_transport`.
+    """
+
+    # provider name used for the transport pool, limits, pricing and metrics
+    provider: str
+    logger: logging.Logger
+    engine: LLMEngine
+    prompt: Prompt
+    job_info: CostLedger
+    pricing: ModelPricing = ModelPricing()
+    tokens: TokenCounter = APPROXIMATE
+    # "reject" or "truncate" prompts that do not fit the context window
+    context_overflow: str = "reject"
+    # per-request input limits of the provider's embedding endpoint
+    embedding_batch_size: int = 100
+    embedding_batch_tokens: Optional[int] = None
+
+    def __init__(
+        self,
+        engine: LLMEngine,
+        prompt: Prompt,
+        api_key: Optional[str],
+        cache: Optional[ResponseCache] = None,
+        ledger: Optional[CostLedger] = None,
+        base_url: Optional[str] = None,
+        transport: Optional[TransportConfig] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        retry: Optional[RetryPolicy] = None,
+        context_overflow: str = "reject",
+        single_flight: Optional[SingleFlight] = None,
+    ):
+        self.logger = initiate_logger(self.__class__.__name__)
+        if not api_key:
+            # SDKs fall back to an API key variable, which may be in the .env
+            from utils.secrets_manager import load_secrets
+
+            load_secrets()
+        # SDK clients own the connection pools, so they are shared process-wide
+        transport = transport or TransportConfig()
+        self.client = get_transport_registry().get(
+            self.provider,
+            api_key,
+            base_url,
+            transport,
+            lambda: self._build_transport(api_key, base_url, transport),
+        )
+        self._transport_args = (api_key, base_url, transport)
+        self.engine = engine
+        self.prompt = prompt
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.single_flight = single_flight
+        self.retry = RetryRunner(retry, self._retryable, self.logger) if retry else None
+        self.job_info = ledger if ledger is not None else CostLedger()
+        self.metrics = get_metrics_registry()
+        self.pricing = self.__resolve_pricing(engine.params.model)
+        self.tokens = get_token_counter(self.provider, engine.params.model)
+        if context_overflow not in ("reject", "truncate"):
+            raise ValueError("context_overflow must be 'reject' or 'truncate'")
+        self.context_overflow = context_overflow
+        self.batch_pricing = self.pricing.batch()
+        # replayed responses are not subject to the provider's limits
+        self.rate_limiter = (
+            RateLimiter()
+            if transport.offline
+            else get_rate_limiter(
+                self.provider,
+                engine.params.model,
+                api_key,
+                rpm=engine.params.rate_limit_rpm,
+                tpm=engine.params.rate_limit_tpm,
+            )
+        )
+
+    def call_request(
+        self,
+        job_name: JobType,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Any:
         """
         Execute a request to the LLM with specified input and parameters.
 
-        This method should define how to send a prompt or input to the LLM \
-        and return its output.
+        `prompt` (a Prompt or a list of chat messages) and `variables` are \
+        resolved per call by `resolve_prompt`, so one client can serve a \
+        whole stream of different inputs. Chat completions are streamed \
+        when `LLMParams.stream` is set, and TEXT_EMBEDDING embeds the \
+        prompt text.
+        """
+        if job_name == JobType.TEXT_EMBEDDING:
+            return self.embed([self.resolve_prompt(prompt, variables).prompt])
+        if job_name == JobType.CHAT_COMPLETION and self.engine.params.stream:
+            return self.stream_request(prompt, variables)
+        if job_name != JobType.CHAT_COMPLETION:
+            self.logger.error("The %s job is not currently available!", job_name.value)
+            raise ValueError("Error job name not found!")
+        self.logger.info(
+            "Calling %s API and request with %s job...", self.provider, job_name
+        )
+        prompt = self.fit_context_window(self.resolve_prompt(prompt, variables))
+        key = self.__cache_key(prompt)
+        payload = self.cache.get(key) if key else None
+        query = None
+        if payload is None and self.__semantic_cacheable():
+            query = self.semantic_cache.query(self.provider, prompt, self.engine.params)
+            payload = query.payload
+        if payload is not None:
+            return self.__cache_hit(payload)
+        if self.__coalescable():
+            response, shared = self.single_flight.call(
+                key or cache_key(self.provider, prompt, self.engine.params),
+                partial(self.__send, prompt),
+            )
+            if shared:
+                # the leader records the call and fills the caches
+                self.__record_coalesced(response)
+                return response
+        else:
+            response = self.__send(prompt)
+        self.__fill_caches(key, query, response)
+        return response
+
+    async def acall_request(
+        self,
+        job_name: JobType,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Asynchronous counterpart of `call_request`.
+
+        Requests go through the provider's native async transport, so many \
+        can be in flight on a single event loop without tying up one OS \
+        thread per call.
+        """
+        if job_name == JobType.TEXT_EMBEDDING:
+            return await self.aembed([self.resolve_prompt(prompt, variables).prompt])
+        if job_name == JobType.CHAT_COMPLETION and self.engine.params.stream:
+            return self.astream_request(prompt, variables)
+        if job_name != JobType.CHAT_COMPLETION:
+            self.logger.error("The %s job is not currently available!", job_name.value)
+            raise ValueError("Error job name not found!")
+        self.logger.info(
+            "Calling %s API (async) and request with %s job...",
+            self.provider,
+            job_name,
+        )
+        prompt = self.fit_context_window(self.resolve_prompt(prompt, variables))
+        key = self.__cache_key(prompt)
+        payload = self.cache.get(key) if key else None
+        query = None
+        if payload is None and self.__semantic_cacheable():
+            # the embedding request is blocking; keep the event loop free
+            query = await asyncio.to_thread(
+                self.semantic_cache.query, self.provider, prompt, self.engine.params
+            )
+            payload = query.payload
+        if payload is not None:
+            return self.__cache_hit(payload)
+        if self.__coalescable():
+            response, shared = await self.single_flight.acall(
+                key or cache_key(self.provider, prompt, self.engine.params),
+                partial(self.__asend, prompt),
+            )
+            if shared:
+                self.__record_coalesced(response)
+                return response
+        else:
+            response = await self.__asend(prompt)
+        self.__fill_caches(key, query, response)
+        return response
+
+    def stream_request(
+        self,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        """
+        Stream a chat completion as text chunks.
+
+        Usage, cost, time-to-first-token and tokens per second are recorded \
+        in the ledger once the stream is exhausted. A stream the consumer \
+        abandons is recorded with the tokens estimated so far, and a failed \
+        one as a failed attempt. `call_request` delegates here when \
+        `LLMParams.stream` is set.
+        """
+        prompt = self.fit_context_window(self.resolve_prompt(prompt, variables))
+        self.logger.info("Streaming %s API response...", self.provider)
+        reserved = self.reserved_tokens(prompt)
+        waited = self.rate_limiter.acquire(reserved)
+        timer = StreamTimer()
+        response = None
+        streamed: List[str] = []
+        failed = False
+        try:
+            with self.metrics.in_flight(self.provider, self.engine.params.model):
+                for text, final in self._stream(prompt):
+                    if text:
+                        timer.mark_token()
+                        streamed.append(text)
+                        yield text
+                    if final is not None:
+                        response = final
+        except Exception as exc:
+            if response is None:
+                failed = True
+                self.__record_failed_attempt(exc, reserved, waited, 1, False)
+            raise
+        finally:
+            timer.finish()
+            if response is not None:
+                self.__record_job_info(response, reserved, waited, timer)
+            elif not failed:
+                # stopped early by the consumer, or ended without usage
+                self.__record_unfinished_stream(
+                    prompt, "".join(streamed), reserved, waited, timer
+                )
+
+    async def astream_request(
+        self,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Asynchronous generator counterpart of `stream_request`."""
+        prompt = self.fit_context_window(self.resolve_prompt(prompt, variables))
+        self.logger.info("Streaming %s API response (async)...", self.provider)
+        reserved = self.reserved_tokens(prompt)
+        waited = await self.rate_limiter.aacquire(reserved)
+        timer = StreamTimer()
+        response = None
+        streamed: List[str] = []
+        failed = False
+        try:
+            with self.metrics.in_flight(self.provider, self.engine.params.model):
+                async for text, final in self._astream(prompt):
+                    if text:
+                        timer.mark_token()
+                        streamed.append(text)
+                        yield text
+                    if final is not None:
+                        response = final
+        except Exception as exc:
+            if response is None:
+                failed = True
+                self.__record_failed_attempt(exc, reserved, waited, 1, False)
+            raise
+        finally:
+            timer.finish()
+            if response is not None:
+                self.__record_job_info(response, reserved, waited, timer)
+            elif not failed:
+                # stopped early by the consumer, or ended without usage
+                self.__record_unfinished_stream(
+                    prompt, "".join(streamed), reserved, waited, timer
+                )
+
+    def resolve_prompt(
+        self,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Prompt:
+        """
+        Build the Prompt for a single request.
+
+        Args:
+            prompt: Prompt or list of chat messages; defaults to the prompt \
+                the client was constructed with.
+            variables: Values for `{name}` placeholders in the prompt text.
+
+        Returns:
+            Prompt ready to be sent.
+        """
+        return render_prompt(self.prompt if prompt is None else prompt, variables)
+
+    def estimate_request(
+        self,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> RequestEstimate:
+        """
+        Estimate the tokens and worst-case cost of a chat request locally.
+
+        Args:
+            prompt: Prompt or list of chat messages, as for `call_request`.
+            variables: Values for `{name}` placeholders in the prompt text.
+
+        Returns:
+            Input tokens, the `max_tokens` output budget, the cost if the \
+            whole budget is used and the model's context window.
+        """
+        prompt = self.resolve_prompt(prompt, variables)
+        input_tokens = self.tokens.count_prompt(prompt)
+        max_tokens = self.engine.params.max_tokens
+        input_cost, output_cost = self.pricing.cost(input_tokens, max_tokens)
+        return RequestEstimate(
+            input_tokens=input_tokens,
+            max_output_tokens=max_tokens,
+            max_cost=input_cost + output_cost,
+            context_window=self.pricing.context_window,
+        )
+
+    def fit_context_window(self, prompt: Prompt) -> Prompt:
+        """
+        Check that `prompt` plus `max_tokens` of output fits the context window.
+
+        With `context_overflow` set to "truncate", a prompt that does not fit \
+        is shortened by `TokenCounter.truncate_prompt`; otherwise, or when \
+        it cannot be shortened enough, `ContextWindowExceeded` is raised \
+        before anything is sent.
+        """
+        window = self.pricing.context_window
+        if window is None:
+            return prompt
+        max_tokens = self.engine.params.max_tokens
+        input_tokens = self.tokens.count_prompt(prompt)
+        if input_tokens + max_tokens <= window:
+            return prompt
+        if self.context_overflow == "truncate":
+            truncated = self.tokens.truncate_prompt(prompt, window - max_tokens)
+            if truncated is not None:
+                self.logger.warning(
+                    "Prompt of %d tokens truncated to fit the %d-token context window",
+                    input_tokens,
+                    window,
+                )
+                return truncated
+        raise ContextWindowExceeded(input_tokens, max_tokens, window)
+
+    def reserved_tokens(self, prompt: Prompt) -> int:
+        """Tokens a chat request may consume, reserved with the rate limiter."""
+        return self.tokens.count_prompt(prompt) + self.engine.params.max_tokens
+
+    def call_batch(
+        self,
+        prompts: Sequence[PromptInput],
+        max_concurrency: int = 8,
+        job_name: JobType = JobType.CHAT_COMPLETION,
+    ) -> List[BatchResult]:
+        """
+        Run many prompts through this client on a bounded worker pool.
+
+        Args:
+            prompts: Prompts to send, one request each.
+            max_concurrency: Maximum number of requests in flight at once.
+            job_name: Job type used for every request.
+
+        Returns:
+            One `BatchResult` per prompt, in input order. A failing prompt \
+            yields an "error" result instead of aborting the batch.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        def run(index: int, prompt: PromptInput) -> BatchResult:
+            try:
+                response = self.call_request(job_name, prompt=prompt)
+            except Exception as exc:
+                return BatchResult(index, prompt, "error", error=exc)
+            return BatchResult(index, prompt, "success", response=response)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            return list(pool.map(run, range(len(prompts)), prompts))
+
+    async def acall_batch(
+        self,
+        prompts: Sequence[PromptInput],
+        max_concurrency: int = 32,
+        job_name: JobType = JobType.CHAT_COMPLETION,
+    ) -> List[BatchResult]:
+        """Asynchronous counterpart of `call_batch` built on `acall_request`."""
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(index: int, prompt: PromptInput) -> BatchResult:
+            async with semaphore:
+                try:
+                    response = await self.acall_request(job_name, prompt=prompt)
+                except Exception as exc:
+                    return BatchResult(index, prompt, "error", error=exc)
+            return BatchResult(index, prompt, "success", response=response)
+
+        return list(await asyncio.gather(*(run(i, p) for i, p in enumerate(prompts))))
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed one provider request worth of texts into a float32 matrix."""
+        reserved = sum(self.tokens.count(text) for text in texts)
+        waited = self.rate_limiter.acquire(reserved)
+        start = time.perf_counter()
+        with self.metrics.in_flight(self.provider, self.engine.params.model):
+            matrix, tokens = self._embed(texts)
+        self.__record_embedding(reserved, tokens, waited, time.perf_counter() - start)
+        return matrix
+
+    async def aembed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Asynchronous counterpart of `embed_batch`."""
+        reserved = sum(self.tokens.count(text) for text in texts)
+        waited = await self.rate_limiter.aacquire(reserved)
+        start = time.perf_counter()
+        with self.metrics.in_flight(self.provider, self.engine.params.model):
+            matrix, tokens = await self._aembed(texts)
+        self.__record_embedding(reserved, tokens, waited, time.perf_counter() - start)
+        return matrix
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        max_concurrency: int = 4,
+        path: Optional[Union[str, os.PathLike]] = None,
+    ) -> np.ndarray:
+        """
+        Embed texts with the client's model, which must be an embedding model.
+
+        Inputs are split into requests under the provider's per-request \
+        limits, requests run concurrently, and every batch is written \
+        straight into one contiguous float32 matrix. Each request is \
+        recorded in the ledger under JobType.TEXT_EMBEDDING.
+
+        Args:
+            texts: Texts to embed, one matrix row each.
+            max_concurrency: Maximum number of requests in flight.
+            path: Optional `.npy` file the matrix is written to and \
+                memory-mapped from, see `llm.embeddings.load_embeddings`.
+
+        Returns:
+            float32 matrix of shape (len(texts), dimensions).
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        batches = plan_batches(
+            texts, self.embedding_batch_size, self.embedding_batch_tokens, self.tokens
+        )
+        matrix = None if batches else allocate_embeddings(0, 0, path)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = {
+                pool.submit(self.embed_batch, texts[start:stop]): start
+                for start, stop in batches
+            }
+            for future in as_completed(futures):
+                vectors = future.result()
+                if matrix is None:
+                    matrix = allocate_embeddings(len(texts), vectors.shape[1], path)
+                start = futures[future]
+                matrix[start : start + len(vectors)] = vectors
+        if isinstance(matrix, np.memmap):
+            matrix.flush()
+        return matrix
+
+    async def aembed(
+        self,
+        texts: Sequence[str],
+        max_concurrency: int = 8,
+        path: Optional[Union[str, os.PathLike]] = None,
+    ) -> np.ndarray:
+        """Asynchronous counterpart of `embed` built on `aembed_batch`."""
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(start: int, stop: int) -> np.ndarray:
+            async with semaphore:
+                return await self.aembed_batch(texts[start:stop])
+
+        batches = plan_batches(
+            texts, self.embedding_batch_size, self.embedding_batch_tokens, self.tokens
+        )
+        results = await asyncio.gather(*(run(*batch) for batch in batches))
+        dimensions = results[0].shape[1] if results else 0
+        matrix = allocate_embeddings(len(texts), dimensions, path)
+        for (start, stop), vectors in zip(batches, results):
+            matrix[start:stop] = vectors
+        if isinstance(matrix, np.memmap):
+            matrix.flush()
+        return matrix
+
+    def submit_batch_job(self, prompts: Sequence[Prompt]) -> BatchJob:
+        """Upload `prompts` to the provider's batch endpoint and start a job."""
+        raise NotImplementedError(f"{type(self).__name__} has no batch endpoint")
+
+    def poll_batch_job(self, job: BatchJob) -> BatchJob:
+        """Return the current state of a submitted batch job."""
+        raise NotImplementedError(f"{type(self).__name__} has no batch endpoint")
+
+    def iter_batch_job_results(
+        self, job: BatchJob, prompts: Sequence[Prompt]
+    ) -> Iterator[BatchResult]:
+        """Stream the results of a finished job, recording each at batch prices."""
+        raise NotImplementedError(f"{type(self).__name__} has no batch endpoint")
+
+    def call_batch_job(
+        self,
+        prompts: Sequence[PromptInput],
+        poll_interval: float = 10.0,
+        max_poll_interval: float = 300.0,
+        timeout: Optional[float] = None,
+    ) -> Iterator[BatchResult]:
+        """
+        Run prompts offline through the provider's batch endpoint.
+
+        Batch endpoints answer within hours instead of seconds, but cost \
+        about half as much and do not count against rate limits, which \
+        suits jobs that do not need answers in real time. This blocks until \
+        the job finishes and then streams results as they are read from the \
+        output file, so they arrive out of order; `BatchResult.index` maps \
+        each one back to its prompt. Costs are recorded under JobType.BATCH.
+
+        Args:
+            prompts: Prompts to send, one request each.
+            poll_interval: Seconds before the first status poll.
+            max_poll_interval: Upper bound on the backoff between polls.
+            timeout: Seconds to wait for the job; None waits forever.
+
+        Returns:
+            Iterator of BatchResult, one per prompt.
+        """
+        resolved = [self.resolve_prompt(prompt) for prompt in prompts]
+        job = self.submit_batch_job(resolved)
+        self.logger.info("Submitted batch job %s with %d requests", job.id, job.size)
+        job = wait_for_batch_job(
+            self.poll_batch_job,
+            job,
+            poll_interval=poll_interval,
+            max_poll_interval=max_poll_interval,
+            timeout=timeout,
+            logger=self.logger,
+        )
+        if job.output_file is None and job.error_file is None:
+            raise RuntimeError(f"Batch job {job.id} ended as {job.status}")
+        return self.iter_batch_job_results(job, resolved)
 
-        It typically handles payload construction, sending the request, and \
-        parsing the response.
+    def get_cost_info(
+        self,
+        type: Literal["aggregated", "individual"] = "aggregated",
+        call_no: Optional[Union[int, Literal["all"]]] = None,
+    ) -> Any:
         """
-        pass
+        Return the cost of the calls made so far.
 
-    @abstractmethod
-    def get_cost_info(self) -> Any:
-        """Estimate the cost of a given request to the LLM."""
-        pass
+        Args:
+            type: "aggregated" for running totals (overall, per model and per \
+                job type), "individual" for the record of a single call.
+            call_no: Index of the call, or "all", when type is "individual".
+        """
+        if type == "aggregated":
+            aggregated = self.job_info.aggregated()
+            self.logger.info(
+                "Total cost for all calls: USD %.5f",
+                aggregated["overall_total_cost"],
+            )
+            return aggregated
+        else:
+            if call_no == "all":
+                return self.job_info.individual("all")
+            elif call_no is None:
+                raise ValueError("call_no must be provided for individual type")
+            elif len(self.job_info) == 0:
+                raise ValueError("No individual job data available.")
+            else:
+                return self.job_info.individual(call_no)
 
-    @abstractmethod
     def get_call_metadata(self) -> Dict[str, Any]:
-        """Return metadata information about the LLM or the request."""
-        pass
+        """Return the job parameters together with the full cost ledger."""
+        return {
+            "job_parameters": asdict(self.engine.params),
+            "job_cost": self.job_info.snapshot(),
+        }
+
+    def _build_transport(
+        self, api_key: Optional[str], base_url: Optional[str], config: TransportConfig
+    ) -> Any:
+        """Build the provider's SDK client; pooled per key, URL and config."""
+        raise NotImplementedError(f"{type(self).__name__} has no provider transport")
+
+    def _send(self, prompt: Prompt, timeout: Optional[float] = None) -> Any:
+        """Send one chat completion to the provider and return its response."""
+        raise NotImplementedError(f"{type(self).__name__} has no chat endpoint")
+
+    async def _asend(self, prompt: Prompt, timeout: Optional[float] = None) -> Any:
+        """Asynchronous counterpart of `_send`."""
+        raise NotImplementedError(f"{type(self).__name__} has no chat endpoint")
+
+    def _stream(self, prompt: Prompt) -> Iterator[Tuple[str, Any]]:
+        """
+        Stream one chat completion as (text, final) pairs.
+
+        `text` is the chunk handed to the consumer, possibly empty; `final` \
+        is None until the provider sends the response carrying the usage of \
+        the whole stream.
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no chat endpoint")
+
+    def _astream(self, prompt: Prompt) -> AsyncIterator[Tuple[str, Any]]:
+        """Asynchronous generator counterpart of `_stream`."""
+        raise NotImplementedError(f"{type(self).__name__} has no chat endpoint")
+
+    def _embed(self, texts: Sequence[str]) -> Tuple[np.ndarray, Optional[int]]:
+        """
+        Embed texts in one provider request.
+
+        Returns:
+            float32 matrix, and the input tokens the provider reports; None \
+            when it reports none, so the reserved estimate is billed.
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no embedding endpoint")
+
+    async def _aembed(self, texts: Sequence[str]) -> Tuple[np.ndarray, Optional[int]]:
+        """Asynchronous counterpart of `_embed`."""
+        raise NotImplementedError(f"{type(self).__name__} has no embedding endpoint")
+
+    def _usage_from(self, response: Any) -> ResponseUsage:
+        """Id and token usage of a provider response."""
+        raise NotImplementedError(f"{type(self).__name__} has no chat endpoint")
+
+    def _load_response(self, payload: str) -> Any:
+        """Rebuild a response serialized in the response cache."""
+        raise NotImplementedError(f"{type(self).__name__} has no chat endpoint")
+
+    def _retryable(self, exc: BaseException) -> bool:
+        """Whether a retry policy may send the request again after `exc`."""
+        return False
+
+    def _record_batch_response(self, response: Any) -> None:
+        """Record a response read from a batch job at batch prices."""
+        self.__record(self.__job_info_from(response, self.batch_pricing), JobType.BATCH)
+
+    def __send(self, prompt: Prompt) -> Any:
+        if self.retry is None:
+            return self.__attempt(prompt)
+        return self.retry.call(partial(self.__attempt, prompt))
+
+    async def __asend(self, prompt: Prompt) -> Any:
+        if self.retry is None:
+            return await self.__aattempt(prompt)
+        return await self.retry.acall(partial(self.__aattempt, prompt))
+
+    def __attempt(
+        self,
+        prompt: Prompt,
+        number: int = 1,
+        hedged: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        reserved = self.reserved_tokens(prompt)
+        waited = self.rate_limiter.acquire(reserved)
+        start = time.perf_counter()
+        try:
+            with self.metrics.in_flight(self.provider, self.engine.params.model):
+                response = self._send(prompt, timeout)
+        except Exception as exc:
+            self.__record_failed_attempt(exc, reserved, waited, number, hedged)
+            raise
+        # add each call information to job info dictionary
+        self.__record_job_info(
+            response,
+            reserved,
+            waited,
+            number=number,
+            hedged=hedged,
+            latency=time.perf_counter() - start,
+        )
+        return response
+
+    async def __aattempt(
+        self,
+        prompt: Prompt,
+        number: int = 1,
+        hedged: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        reserved = self.reserved_tokens(prompt)
+        waited = await self.rate_limiter.aacquire(reserved)
+        start = time.perf_counter()
+        try:
+            with self.metrics.in_flight(self.provider, self.engine.params.model):
+                response = await self._asend(prompt, timeout)
+        except Exception as exc:
+            self.__record_failed_attempt(exc, reserved, waited, number, hedged)
+            raise
+        self.__record_job_info(
+            response,
+            reserved,
+            waited,
+            number=number,
+            hedged=hedged,
+            latency=time.perf_counter() - start,
+        )
+        return response
+
+    def __semantic_cacheable(self) -> bool:
+        return self.semantic_cache is not None and self.semantic_cache.is_cacheable(
+            self.engine.params
+        )
+
+    def __cache_key(self, prompt: Prompt) -> Optional[str]:
+        if self.cache is None or not self.cache.is_cacheable(self.engine.params):
+            return None
+        return cache_key(self.provider, prompt, self.engine.params)
+
+    def __cache_hit(self, payload: str) -> Any:
+        response = self._load_response(payload)
+        # answered without a provider call of its own, so nothing was billed
+        self.__record(
+            make_job_info(self._usage_from(response).id, cache_hit=True),
+            JobType.CHAT_COMPLETION,
+        )
+        return response
+
+    def __fill_caches(self, key: Optional[str], query: Any, response: Any) -> None:
+        if not key and query is None:
+            return
+        payload = response.model_dump_json()
+        if key:
+            self.cache.set(key, payload)
+        if query is not None:
+            self.semantic_cache.add(query, payload)
+
+    def __coalescable(self) -> bool:
+        return self.single_flight is not None and self.single_flight.is_coalescable(
+            self.engine.params
+        )
+
+    def __record_coalesced(self, response: Any) -> None:
+        # followers are counted, while the shared call is billed once
+        self.__record(
+            make_job_info(self._usage_from(response).id, coalesced=True),
+            JobType.CHAT_COMPLETION,
+        )
+
+    def __record_job_info(
+        self,
+        response: Any,
+        reserved: int,
+        waited: float,
+        timer: Optional[StreamTimer] = None,
+        number: int = 1,
+        hedged: bool = False,
+        latency: Optional[float] = None,
+    ) -> None:
+        job_info = self.__job_info_from(response)
+        job_info["rate_limit_wait"] = waited
+        job_info["attempt"] = number
+        job_info["hedged"] = hedged
+        if timer is not None:
+            job_info["ttft"] = timer.ttft
+            job_info["tokens_per_second"] = timer.tokens_per_second(
+                job_info["output_tokens"]
+            )
+            latency = timer.elapsed
+        self.rate_limiter.settle(reserved, job_info["total_tokens"])
+        if waited:
+            self.logger.info("Request waited %.3fs for the rate limiter", waited)
+        self.__record(job_info, JobType.CHAT_COMPLETION, latency)
+
+    def __record(
+        self, job_info: JobInfo, job_type: JobType, latency: Optional[float] = None
+    ) -> None:
+        self.job_info.record(job_info, self.engine.params.model, job_type)
+        self.metrics.record(
+            self.provider, self.engine.params.model, job_type, job_info, latency
+        )
+
+    def __record_failed_attempt(
+        self,
+        exc: BaseException,
+        reserved: int,
+        waited: float,
+        number: int,
+        hedged: bool,
+    ) -> None:
+        # nothing is known to be billed for a failed attempt
+        self.rate_limiter.settle(reserved, 0)
+        self.metrics.record_error(
+            self.provider, self.engine.params.model, JobType.CHAT_COMPLETION, exc
+        )
+        self.__record(
+            make_job_info(
+                f"error-{type(exc).__name__}",
+                rate_limit_wait=waited,
+                attempt=number,
+                hedged=hedged,
+                failed=True,
+            ),
+            JobType.CHAT_COMPLETION,
+        )
+
+    def __record_unfinished_stream(
+        self,
+        prompt: Prompt,
+        text: str,
+        reserved: int,
+        waited: float,
+        timer: StreamTimer,
+    ) -> None:
+        # no final usage arrived; bill the prompt and the text streamed so far
+        input_tokens = self.tokens.count_prompt(prompt)
+        output_tokens = self.tokens.count(text) if text else 0
+        input_cost, output_cost = self.pricing.cost(input_tokens, output_tokens)
+        self.rate_limiter.settle(reserved, input_tokens + output_tokens)
+        self.__record(
+            make_job_info(
+                f"stream-{uuid.uuid4().hex}",
+                input_tokens,
+                output_tokens,
+                input_cost=input_cost,
+                output_cost=output_cost,
+                rate_limit_wait=waited,
+                ttft=timer.ttft,
+                tokens_per_second=timer.tokens_per_second(output_tokens),
+                failed=True,
+            ),
+            JobType.CHAT_COMPLETION,
+            timer.elapsed,
+        )
+
+    def __record_embedding(
+        self, reserved: int, tokens: Optional[int], waited: float, latency: float
+    ) -> None:
+        if tokens is None:
+            # no usage reported; the estimate that was reserved is billed
+            tokens = reserved
+        self.rate_limiter.settle(reserved, tokens)
+        input_cost, _ = self.pricing.cost(tokens, 0)
+        # embedding responses carry no id, so each request gets its own
+        self.__record(
+            make_job_info(
+                f"emb-{uuid.uuid4().hex}",
+                tokens,
+                input_cost=input_cost,
+                rate_limit_wait=waited,
+            ),
+            JobType.TEXT_EMBEDDING,
+            latency,
+        )
+
+    def __resolve_pricing(self, model: str) -> ModelPricing:
+        # resolved up front so an unknown model never fails after a paid call
+        pricing = get_pricing_registry().resolve(self.provider, model)
+        if pricing is None:
+            self.logger.warning(
+                "No pricing found for model %s; its cost will be recorded as 0", model
+            )
+            return ModelPricing()
+        return pricing
+
+    def __job_info_from(
+        self, response: Any, pricing: Optional[ModelPricing] = None
+    ) -> JobInfo:
+        usage = self._usage_from(response)
+        input_cost, output_cost = (pricing or self.pricing).cost(
+            usage.input_tokens, usage.output_tokens, usage.cached_tokens
+        )
+        return make_job_info(
+            usage.id,
+            usage.input_tokens,
+            usage.output_tokens,
+            usage.cached_tokens,
+            input_cost=input_cost,
+            output_cost=output_cost,
+            total_tokens=usage.total_tokens,
+        )
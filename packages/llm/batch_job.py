@@ -0,0 +1,66 @@
+import logging
+import time
+from typing import Callable, Optional
+
+from llm.types import BatchJob
+
+# Batch output files come back in arbitrary order; each line carries the id
+# of the request it answers.
+REQUEST_ID_PREFIX = "request-"
+
+
+class BatchRequestError(Exception):
+    """A single request of a batch job failed on the provider side."""
+
+
+def batch_request_id(index: int) -> str:
+    return f"{REQUEST_ID_PREFIX}{index}"
+
+
+def batch_request_index(request_id: str) -> int:
+    return int(request_id[len(REQUEST_ID_PREFIX) :])
+
+
+def wait_for_batch_job(
+    poll: Callable[[BatchJob], BatchJob],
+    job: BatchJob,
+    poll_interval: float = 10.0,
+    max_poll_interval: float = 300.0,
+    backoff: float = 2.0,
+    timeout: Optional[float] = None,
+    logger: Optional[logging.Logger] = None,
+) -> BatchJob:
+    """
+    Poll a batch job with exponential backoff until the provider finishes it.
+
+    Batch jobs take minutes to hours, so the interval between polls grows \
+    by `backoff` after every unfinished poll up to `max_poll_interval`.
+
+    Args:
+        poll: Function returning the refreshed state of a job.
+        job: Job returned by `submit_batch_job`.
+        poll_interval: Seconds before the first poll.
+        max_poll_interval: Upper bound on the seconds between polls.
+        backoff: Factor the interval grows by after each poll.
+        timeout: Give up after this many seconds; None waits forever.
+        logger: Logger for progress messages.
+
+    Returns:
+        BatchJob in a terminal state.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    interval = poll_interval
+    while not job.done:
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"Batch job {job.id} still {job.status} after {timeout}s"
+                )
+            interval = min(interval, remaining)
+        time.sleep(interval)
+        job = poll(job)
+        if logger is not None:
+            logger.info("Batch job %s is %s", job.id, job.status)
+        interval = min(interval * backoff, max_poll_interval)
+    return job
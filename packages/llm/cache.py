@@ -0,0 +1,198 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from llm.types import LLMParams, Prompt
+
+# LLMParams fields that change what the model returns; everything else
+# (streaming, user id, rate limits) must not split the cache.
+OUTPUT_PARAMS = (
+    "model",
+    "temperature",
+    "max_tokens",
+    "stop",
+    "n",
+    "top_p",
+    "top_k",
+    "frequency_penalty",
+    "presence_penalty",
+    "logprobs",
+)
+
+
+def cache_key(provider: str, prompt: Prompt, params: LLMParams) -> str:
+    """Stable hash of a request's prompt and output-affecting parameters."""
+    payload = {
+        "provider": provider,
+        "instructions": prompt.instructions,
+        "prompt": prompt.prompt,
+        "messages": prompt.messages,
+        "params": {name: getattr(params, name) for name in OUTPUT_PARAMS},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of serialized provider responses.
+
+    Lookups hit a bounded in-process LRU first and fall back to an optional \
+    SQLite file that survives restarts. Entries expire after `ttl` seconds \
+    in both tiers, and the oldest-accessed rows are evicted once the file \
+    holds more than `max_disk_entries`.
+
+    Args:
+        max_entries: Capacity of the in-memory LRU.
+        db_path: SQLite file for the persistent tier; None keeps memory only.
+        ttl: Entry lifetime in seconds; None never expires.
+        max_disk_entries: Row limit of the persistent tier.
+        force: Cache responses even when temperature > 0.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        db_path: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_disk_entries: int = 100_000,
+        force: bool = False,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.force = force
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_entries = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            self._db.commit()
+            (self._disk_entries,) = self._db.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+
+    def is_cacheable(self, params: LLMParams) -> bool:
+        """Sampling at temperature > 0 is only cached when `force` is set."""
+        return self.force or not params.temperature
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self.__expired(entry[0], now):
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+            row = self.__disk_get(key, now)
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            payload, created_at = row
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            # keeps its original age, so promotion does not extend the TTL
+            self.__memory_set(key, payload, created_at)
+            return payload
+
+    def set(self, key: str, payload: str) -> None:
+        now = time.time()
+        with self._lock:
+            self.__memory_set(key, payload, now)
+            if self._db is not None:
+                cursor = self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, payload, now, now),
+                )
+                self._disk_entries += cursor.rowcount
+                self.__evict_disk()
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_entries"] = self._disk_entries
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_entries = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def __memory_set(self, key: str, payload: str, created_at: float) -> None:
+        self._memory[key] = (created_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def __disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self.__expired(row[1], now):
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            self._disk_entries -= 1
+            return None
+        self._db.execute(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self._db.commit()
+        return str(row[0]), float(row[1])
+
+    def __evict_disk(self) -> None:
+        # the counter over-estimates after REPLACE, so recount before deleting
+        if self._db is None or self._disk_entries <= self.max_disk_entries:
+            return
+        if self.ttl is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.ttl,),
+            )
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+        self._disk_entries = min(count, self.max_disk_entries)
@@ -0,0 +1,342 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from llm.transport import TransportConfig
+
+CASSETTE_MODES = ("record", "replay", "replay_timed")
+MAGIC = b"LLMCASS1"
+# per entry: sha256 of the request, size of the compressed payload
+_ENTRY = struct.Struct("<32sI")
+# request headers that change what the provider does with an identical body
+_KEY_HEADERS = ("x-goog-upload-command",)
+
+
+class CassetteMiss(LookupError):
+    """Raised on replay when a request was never recorded."""
+
+
+def base_path(base_url: Optional[str]) -> bytes:
+    """Path prefix a client's base URL puts in front of every endpoint."""
+    if not base_url:
+        return b""
+    return urlsplit(base_url).path.rstrip("/").encode()
+
+
+def request_key(request: httpx.Request, prefix: bytes = b"") -> bytes:
+    """
+    Digest identifying a request across runs.
+
+    The host and the base URL's path `prefix` are left out so recordings \
+    replay against any base URL, JSON bodies are compared key-order \
+    independently and multipart boundaries, which are random per request, \
+    are blanked.
+    """
+    body = request.content
+    content_type = request.headers.get("content-type", "")
+    if "boundary=" in content_type:
+        body = body.replace(content_type.split("boundary=", 1)[1].encode(), b"")
+    elif body[:1] in (b"{", b"["):
+        with contextlib.suppress(ValueError):
+            body = json.dumps(
+                json.loads(body), sort_keys=True, separators=(",", ":")
+            ).encode()
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    path = request.url.raw_path
+    if prefix and path.startswith(prefix + b"/"):
+        path = path[len(prefix) :]
+    digest.update(path)
+    for name in _KEY_HEADERS:
+        digest.update(request.headers.get(name, "").encode())
+    digest.update(body)
+    return digest.digest()
+
+
+class Cassette:
+    """
+    Append-only file of recorded HTTP exchanges with an in-memory index.
+
+    Each entry is a fixed-size header (request digest and payload size) \
+    followed by a zlib-compressed payload holding the response status, \
+    headers, latency and raw body. Opening a cassette only walks the \
+    headers to index every digest's entries, and replay reads bodies \
+    through a memory map. A request recorded several times (polling, or \
+    repeated prompts) replays its responses in order and then repeats the \
+    last one.
+
+    Args:
+        path: Cassette file.
+        mode: "record" starts a new cassette and records live traffic; \
+            "replay" serves recorded responses at full speed; \
+            "replay_timed" waits for each response's recorded latency.
+    """
+
+    def __init__(self, path: str, mode: str = "replay") -> None:
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"mode must be one of {CASSETTE_MODES}, not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self._index: Dict[bytes, List[Tuple[int, int]]] = defaultdict(list)
+        self._cursors: Dict[bytes, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        if self.recording:
+            # held open while recording; closed by close()
+            self._file = open(path, "wb")  # noqa: SIM115
+            self._file.write(MAGIC)
+        else:
+            self._file = open(path, "rb")  # noqa: SIM115
+            if os.fstat(self._file.fileno()).st_size > len(MAGIC):
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__build_index()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._index.values())
+
+    def record(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        body: bytes,
+        latency: float,
+        prefix: bytes = b"",
+    ) -> None:
+        meta = {
+            "method": request.method,
+            "url": str(request.url.copy_with(query=None)),
+            "status": response.status_code,
+            "headers": response.headers.multi_items(),
+            "latency": latency,
+        }
+        payload = zlib.compress(json.dumps(meta).encode() + b"\n" + body)
+        key = request_key(request, prefix)
+        with self._lock:
+            offset = self._file.tell() + _ENTRY.size
+            self._file.write(_ENTRY.pack(key, len(payload)))
+            self._file.write(payload)
+            self._file.flush()
+            self._index[key].append((offset, len(payload)))
+
+    def play(
+        self, request: httpx.Request, prefix: bytes = b""
+    ) -> Tuple[httpx.Response, float]:
+        """Return the recorded response to `request` and its recorded latency."""
+        key = request_key(request, prefix)
+        with self._lock:
+            entries = self._index.get(key)
+            if not entries:
+                raise CassetteMiss(
+                    f"{request.method} {request.url.path} is not in {self.path}"
+                )
+            cursor = self._cursors[key]
+            self._cursors[key] = min(cursor + 1, len(entries) - 1)
+            offset, size = entries[cursor]
+            assert self._map is not None
+            payload = zlib.decompress(self._map[offset : offset + size])
+        meta, body = payload.split(b"\n", 1)
+        info: Dict[str, Any] = json.loads(meta)
+        response = _http_module(request).Response(
+            info["status"],
+            headers=[tuple(header) for header in info["headers"]],
+            content=body,
+            request=request,
+        )
+        return response, info["latency"]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+    def __build_index(self) -> None:
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{self.path} is not a cassette file")
+        offset = len(MAGIC)
+        size = len(self._map) if self._map is not None else offset
+        while offset + _ENTRY.size <= size:
+            key, length = _ENTRY.unpack_from(self._map, offset)
+            offset += _ENTRY.size
+            if offset + length > size:
+                break  # entry cut short by an interrupted recording
+            self._index[key].append((offset, length))
+            offset += length
+
+
+class CassetteTransport:
+    """
+    httpx transport recording to, or replaying from, a `Cassette`.
+
+    Duck-typed rather than derived from `httpx.BaseTransport`, since SDKs \
+    may ship their own fork of httpx (openai uses `httpx2`); responses and \
+    the live transport come from the module of the request being sent.
+    """
+
+    def __init__(
+        self, cassette: Cassette, config: TransportConfig, prefix: bytes = b""
+    ) -> None:
+        self.cassette = cassette
+        self.config = config
+        # base URL path of the client, left out of request keys
+        self.prefix = prefix
+        self._live: Any = None
+        self._lock = threading.Lock()
+
+    def handle_request(self, request: Any) -> Any:
+        request.read()
+        if not self.cassette.recording:
+            response, latency = self.cassette.play(request, self.prefix)
+            if self.cassette.mode == "replay_timed":
+                time.sleep(latency)
+            return response
+        http = _http_module(request)
+        with self._lock:
+            if self._live is None:
+                self._live = http.HTTPTransport(
+                    limits=_limits(http, self.config), http2=self.config.http2
+                )
+        start = time.monotonic()
+        response = self._live.handle_request(request)
+        try:
+            # raw bytes: the recorded headers still describe their encoding
+            body = b"".join(response.stream)
+        finally:
+            response.close()
+        self.cassette.record(
+            request, response, body, time.monotonic() - start, self.prefix
+        )
+        return http.Response(
+            response.status_code,
+            headers=response.headers,
+            content=body,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        if self._live is not None:
+            self._live.close()
+
+
+class AsyncCassetteTransport:
+    """Asynchronous counterpart of `CassetteTransport`."""
+
+    def __init__(
+        self, cassette: Cassette, config: TransportConfig, prefix: bytes = b""
+    ) -> None:
+        self.cassette = cassette
+        self.config = config
+        # base URL path of the client, left out of request keys
+        self.prefix = prefix
+        self._live: Any = None
+
+    async def handle_async_request(self, request: Any) -> Any:
+        await request.aread()
+        if not self.cassette.recording:
+            response, latency = self.cassette.play(request, self.prefix)
+            if self.cassette.mode == "replay_timed":
+                await asyncio.sleep(latency)
+            return response
+        http = _http_module(request)
+        if self._live is None:
+            # no await since the check, so no other task can race this
+            self._live = http.AsyncHTTPTransport(
+                limits=_limits(http, self.config), http2=self.config.http2
+            )
+        start = time.monotonic()
+        response = await self._live.handle_async_request(request)
+        try:
+            body = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        self.cassette.record(
+            request, response, body, time.monotonic() - start, self.prefix
+        )
+        return http.Response(
+            response.status_code,
+            headers=response.headers,
+            content=body,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        if self._live is not None:
+            await self._live.aclose()
+
+
+_cassettes: Dict[Tuple[str, str], Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str, mode: str) -> Cassette:
+    """Return the cassette shared by every transport using `path` and `mode`."""
+    key = (os.path.abspath(path), mode)
+    with _cassettes_lock:
+        if key not in _cassettes:
+            _cassettes[key] = Cassette(path, mode)
+        return _cassettes[key]
+
+
+def cassette_transport(
+    config: TransportConfig, base_url: Optional[str] = None
+) -> Optional[CassetteTransport]:
+    """
+    Transport for an SDK's httpx client, or None without a cassette.
+
+    `base_url` is the URL the SDK sends requests under, its default when \
+    the client does not set one.
+    """
+    if config.cassette is None:
+        return None
+    return CassetteTransport(
+        get_cassette(config.cassette, config.cassette_mode),
+        config,
+        base_path(base_url),
+    )
+
+
+def async_cassette_transport(
+    config: TransportConfig, base_url: Optional[str] = None
+) -> Optional[AsyncCassetteTransport]:
+    """Asynchronous counterpart of `cassette_transport`."""
+    if config.cassette is None:
+        return None
+    return AsyncCassetteTransport(
+        get_cassette(config.cassette, config.cassette_mode),
+        config,
+        base_path(base_url),
+    )
+
+
+def _http_module(message: Any) -> ModuleType:
+    # httpx or a fork of it, whichever built the request
+    return sys.modules[type(message).__module__.partition(".")[0]]
+
+
+def _limits(http: ModuleType, config: TransportConfig) -> Any:
+    return http.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
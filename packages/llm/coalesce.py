@@ -0,0 +1,119 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+from llm.types import LLMParams
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces identical requests that are in flight at the same time.
+
+    The first caller of a key (the leader) makes the call; callers arriving \
+    with the same key before it returns (followers) wait for it and receive \
+    the same response object, or the same exception. Threads and \
+    coroutines, on any event loop, join the same flights. If a leader is \
+    cancelled, its followers retry and one of them leads a new flight.
+
+    Keys come from `cache.cache_key`, so only requests with the same prompt \
+    and output-affecting parameters are coalesced. Clients sharing one \
+    instance coalesce with each other.
+
+    Args:
+        force: Coalesce requests even when temperature > 0, so identical \
+            sampled requests share a single sample.
+    """
+
+    def __init__(self, force: bool = False) -> None:
+        self.force = force
+        self._flights: Dict[str, "Future[Any]"] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def is_coalescable(self, params: LLMParams) -> bool:
+        """Sampling at temperature > 0 is only coalesced when `force` is set."""
+        return self.force or not params.temperature
+
+    def call(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Run `fn` unless an identical call is in flight, then share its result.
+
+        Returns:
+            The result and whether it was shared from another caller's call.
+        """
+        while True:
+            flight, leader = self.__join(key)
+            if leader:
+                return self.__lead(key, flight, fn), False
+            try:
+                return flight.result(), True
+            except BaseException:
+                if not flight.cancelled():
+                    raise
+
+    async def acall(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Asynchronous counterpart of `call`; `fn` returns the awaitable."""
+        while True:
+            flight, leader = self.__join(key)
+            if leader:
+                try:
+                    result = await fn()
+                except BaseException as exc:
+                    self.__land(key, flight, exc)
+                    raise
+                self.__land(key, flight, result=result)
+                return result, False
+            try:
+                # shielded: a cancelled follower must not cancel the flight
+                return await asyncio.shield(asyncio.wrap_future(flight)), True
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        requests = stats["leaders"] + stats["followers"]
+        stats["coalesced_rate"] = stats["followers"] / requests if requests else 0.0
+        return stats
+
+    def __join(self, key: str) -> Tuple["Future[Any]", bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["followers"] += 1
+                return flight, False
+            flight = self._flights[key] = Future()
+            self._stats["leaders"] += 1
+            return flight, True
+
+    def __lead(self, key: str, flight: "Future[Any]", fn: Callable[[], T]) -> T:
+        try:
+            result = fn()
+        except BaseException as exc:
+            self.__land(key, flight, exc)
+            raise
+        self.__land(key, flight, result=result)
+        return result
+
+    def __land(
+        self,
+        key: str,
+        flight: "Future[Any]",
+        exc: Any = None,
+        result: Any = None,
+    ) -> None:
+        # later callers start a new flight rather than reuse a finished one
+        with self._lock:
+            del self._flights[key]
+        if exc is None:
+            flight.set_result(result)
+        elif isinstance(exc, Exception):
+            flight.set_exception(exc)
+        else:
+            # cancellation or interpreter exit: followers retry on their own
+            flight.cancel()
@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+import yaml
+
+from llm.types import LLMParams
+
+
+@dataclass(frozen=True)
+class _ConfigEntry:
+    mtime_ns: int
+    size: int
+    checked_at: float
+    # top-level mappings of the file; each is parsed on its first lookup
+    raw: Mapping[str, Mapping[str, Any]]
+    parsed: Dict[str, LLMParams] = field(default_factory=dict)
+
+
+class ConfigStore:
+    """
+    Parse-once cache of LLM config files.
+
+    Each file is read once, and each profile is parsed into `LLMParams` \
+    the first time it is requested, so a malformed profile or an unrelated \
+    top-level key only fails lookups of that name. Later lookups are served \
+    from memory and only re-read the file when its mtime or size changes, \
+    so long-running workers pick up edits without a restart. The file is \
+    stat-ed at most once per `check_interval` seconds.
+
+    Args:
+        check_interval: Minimum seconds between mtime checks of a file.
+    """
+
+    def __init__(self, check_interval: float = 1.0) -> None:
+        self.check_interval = check_interval
+        self._entries: Dict[str, _ConfigEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str = "config.yaml", config_name: str = "default") -> LLMParams:
+        """Return a private copy of the `config_name` profile of `path`."""
+        entry = self.__entry(path)
+        if config_name not in entry.raw:
+            raise ValueError(f"Configuration '{config_name}' not found in {path}")
+        # callers may mutate their params; the cached profile must not change
+        return replace(self.__profile(entry, config_name))
+
+    def profiles(self, path: str = "config.yaml") -> Mapping[str, LLMParams]:
+        """Every profile of `path`, parsed into LLMParams."""
+        entry = self.__entry(path)
+        return MappingProxyType(
+            {name: self.__profile(entry, name) for name in entry.raw}
+        )
+
+    def __entry(self, path: str) -> _ConfigEntry:
+        key = os.path.abspath(path)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            return entry
+
+        stat = os.stat(key)
+        if entry is not None and (stat.st_mtime_ns, stat.st_size) == (
+            entry.mtime_ns,
+            entry.size,
+        ):
+            self._entries[key] = replace(entry, checked_at=now)
+            return entry
+
+        with self._lock:
+            entry = _ConfigEntry(
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                checked_at=now,
+                raw=self.__read(key),
+            )
+            self._entries[key] = entry
+        return entry
+
+    @staticmethod
+    def __profile(entry: _ConfigEntry, name: str) -> LLMParams:
+        params = entry.parsed.get(name)
+        if params is None:
+            # concurrent first lookups parse the same values; either may win
+            params = entry.parsed.setdefault(
+                name, LLMParams.from_dict(dict(entry.raw[name]))
+            )
+        return params
+
+    def reload(self, path: Optional[str] = None) -> None:
+        """Drop cached files so the next lookup parses them again."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    @staticmethod
+    def __read(path: str) -> Mapping[str, Mapping[str, Any]]:
+        with open(path, "r") as f:
+            config = yaml.safe_load(f) or {}
+        # anything but a mapping (anchors, version keys, ...) is not a profile
+        return MappingProxyType(
+            {
+                name: values
+                for name, values in config.items()
+                if isinstance(values, dict)
+            }
+        )
+
+
+_store = ConfigStore()
+
+
+def get_config_store() -> ConfigStore:
+    return _store
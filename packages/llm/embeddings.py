@@ -0,0 +1,74 @@
+import os
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from llm.tokens import APPROXIMATE, TokenCounter
+
+EMBEDDING_DTYPE = np.float32
+
+
+def plan_batches(
+    texts: Sequence[str],
+    max_items: int,
+    max_tokens: Optional[int] = None,
+    tokens: TokenCounter = APPROXIMATE,
+) -> List[Tuple[int, int]]:
+    """
+    Split `texts` into consecutive (start, stop) ranges under request limits.
+
+    Args:
+        texts: Inputs to embed.
+        max_items: Maximum inputs per request.
+        max_tokens: Maximum estimated tokens per request; None for no limit. \
+            An input larger than the limit is sent on its own.
+        tokens: Counter the inputs are measured with, normally the client's.
+
+    Returns:
+        List of (start, stop) index ranges covering `texts` in order.
+    """
+    batches = []
+    start = batch_tokens = 0
+    for index, text in enumerate(texts):
+        text_tokens = tokens.count(text)
+        full = index - start >= max_items
+        if max_tokens is not None and batch_tokens + text_tokens > max_tokens:
+            full = full or index > start
+        if full:
+            batches.append((start, index))
+            start, batch_tokens = index, 0
+        batch_tokens += text_tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def allocate_embeddings(
+    rows: int, dimensions: int, path: Optional[Union[str, os.PathLike]] = None
+) -> np.ndarray:
+    """Return an empty float32 matrix, backed by an `.npy` file when `path` is set."""
+    if path is None:
+        return np.empty((rows, dimensions), dtype=EMBEDDING_DTYPE)
+    return np.lib.format.open_memmap(
+        path, mode="w+", dtype=EMBEDDING_DTYPE, shape=(rows, dimensions)
+    )
+
+
+def save_embeddings(path: Union[str, os.PathLike], matrix: np.ndarray) -> None:
+    """Write an embedding matrix as a float32 `.npy` file."""
+    np.save(path, np.ascontiguousarray(matrix, dtype=EMBEDDING_DTYPE))
+
+
+def load_embeddings(path: Union[str, os.PathLike], mmap: bool = True) -> np.ndarray:
+    """
+    Load an embedding matrix saved by `save_embeddings` or `embed(path=...)`.
+
+    Args:
+        path: `.npy` file to read.
+        mmap: Memory-map the file read-only instead of reading it into memory, \
+            so large matrices are paged in on demand and shared between processes.
+
+    Returns:
+        float32 matrix with one row per input text.
+    """
+    return np.load(path, mmap_mode="r" if mmap else None)
@@ -1,30 +1,120 @@
+import importlib
 import os
-from typing import Optional
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
 
-from llm import gemini_client, openai_client
-from llm.llm_utils import LLMEngine, load_llm_params_from_yaml
-from llm.prompt import ExamplePrompt
-from llm.types import Prompt
+from llm.llm_utils import LLMEngine
+from llm.prompt import ExamplePrompt, render_prompt
+from llm.types import PromptInput
 
-load_llm_params_from_yaml()
+
+class ProviderSpec(NamedTuple):
+    module: str
+    client_class: str
+    api_key_arg: str
+
+
+# Provider SDKs are heavy to import, so client modules are only imported the
+# first time load_llm_client asks for them.
+PROVIDERS: Dict[str, ProviderSpec] = {
+    "openai": ProviderSpec("llm.openai_client", "OpenAIClient", "openai_api_key"),
+    "gemini": ProviderSpec("llm.gemini_client", "GeminiClient", "gemini_api_key"),
+}
+
+
+def register_provider(
+    name: str, module: str, client_class: str, api_key_arg: str
+) -> None:
+    """Make a client class available to `load_llm_client` under `name`."""
+    PROVIDERS[name.lower()] = ProviderSpec(module, client_class, api_key_arg)
+
+
+def get_client_class(provider: str) -> Any:
+    """Import (once) and return the client class registered for `provider`."""
+    spec = PROVIDERS.get(provider)
+    if spec is None:
+        raise ValueError(
+            f"Client for {provider if provider else 'NONE'} is not available!"
+        )
+    return getattr(importlib.import_module(spec.module), spec.client_class)
 
 
 def load_llm_client(
     api_key: str,
-    prompt: Prompt = ExamplePrompt.grammar_checker_prompt,
+    prompt: PromptInput = ExamplePrompt.grammar_checker_prompt,
     provider: Optional[str] = None,
+    config_name: str = "default",
+    config_path: str = "config.yaml",
+    variables: Optional[Dict[str, Any]] = None,
 ) -> object:
+    """
+    Build a client for `provider` with `prompt` as its default prompt.
 
-    provider = provider or os.getenv("PROVIDER", "openai").lower()
-    if provider == "openai":
-        return openai_client.OpenAIClient(
-            engine=LLMEngine(), prompt=prompt, openai_api_key=api_key
-        )
-    elif provider == "gemini":
-        return gemini_client.GeminiClient(
-            engine=LLMEngine(), prompt=prompt, gemini_api_key=api_key
-        )
-    else:
-        raise ValueError(
-            f"Client for {provider if provider else 'NONE'} is not available!"
+    Clients are meant to be long-lived: build one per provider and config, \
+    then pass a different prompt, message list or `variables` to each \
+    `call_request` instead of loading a new client per prompt.
+
+    Args:
+        api_key: Provider API key.
+        prompt: Default Prompt or list of chat messages.
+        provider: Provider name; read from the PROVIDER env var when None.
+        config_name: Profile of the config file to use.
+        config_path: Path of the YAML config file.
+        variables: Values for `{name}` placeholders in the default prompt.
+
+    Returns:
+        Client instance of the provider.
+    """
+
+    if provider is None:
+        # PROVIDER may come from the project's .env
+        from utils.secrets_manager import load_secrets
+
+        load_secrets()
+    provider = (provider or os.getenv("PROVIDER", "openai")).lower()
+    client_class = get_client_class(provider)
+    # the config file is parsed once and served from memory afterwards
+    engine = LLMEngine(config_name=config_name, config_path=config_path)
+    return client_class(
+        engine=engine,
+        prompt=render_prompt(prompt, variables),
+        **{PROVIDERS[provider].api_key_arg: api_key},
+    )
+
+
+def load_llm_router(
+    api_keys: Dict[str, str],
+    backends: Sequence[Tuple[str, str]],
+    prompt: PromptInput = ExamplePrompt.grammar_checker_prompt,
+    config_path: str = "config.yaml",
+    variables: Optional[Dict[str, Any]] = None,
+    **router_options: Any,
+) -> object:
+    """
+    Build a `RouterClient` over one client per (provider, config) pair.
+
+    Args:
+        api_keys: API key per provider name.
+        backends: (provider, config_name) pairs, e.g. \
+            [("openai", "default"), ("gemini", "flash")].
+        prompt: Default Prompt or list of chat messages.
+        config_path: Path of the YAML config file.
+        variables: Values for `{name}` placeholders in the default prompt.
+        router_options: Keyword arguments of `RouterClient`, e.g. cost_weight.
+
+    Returns:
+        RouterClient instance.
+    """
+    from llm.router import RouterClient
+
+    clients = [
+        load_llm_client(
+            api_keys[provider.lower()],
+            prompt=prompt,
+            provider=provider,
+            config_name=config_name,
+            config_path=config_path,
+            variables=variables,
         )
+        for provider, config_name in backends
+    ]
+    return RouterClient(clients, **router_options)
@@ -1,127 +1,525 @@
-from dataclasses import asdict
-from typing import Any, Dict, Literal, Optional, Union
+import hashlib
+import io
+import json
+import tempfile
+import threading
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+import httpx
+import numpy as np
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from google.genai.client import AsyncClient
 from google.genai.types import GenerateContentResponse
-from utils import initiate_logger
 
 from llm.base import LLMClientBase
-from llm.llm_utils import GeminiCost, LLMEngine
-from llm.types import (
-    JobInfo,
-    JobInfoType,
-    JobType,
-    Prompt,
-)
+from llm.batch_job import BatchRequestError, batch_request_id, batch_request_index
+from llm.cache import ResponseCache
+from llm.cassette import async_cassette_transport, cassette_transport
+from llm.coalesce import SingleFlight
+from llm.embeddings import EMBEDDING_DTYPE
+from llm.ledger import CostLedger
+from llm.llm_utils import LLMEngine
+from llm.retry import RETRYABLE_STATUS, RetryPolicy
+from llm.semantic_cache import SemanticCache
+from llm.transport import TransportConfig, get_transport_registry
+from llm.types import BatchJob, BatchResult, JobType, Prompt, ResponseUsage
+
+
+def _build_transport(
+    api_key: Optional[str], base_url: Optional[str], config: TransportConfig
+) -> genai.Client:
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+    client_args = {"limits": limits, "http2": config.http2}
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            base_url=base_url,
+            timeout=int(config.timeout * 1000),  # milliseconds
+            client_args={
+                **client_args,
+                "transport": cassette_transport(config, base_url),
+            },
+            async_client_args={
+                **client_args,
+                "transport": async_cassette_transport(config, base_url),
+            },
+        ),
+    )
+
+
+# (API key digest, base URL, model, instructions) -> (cache name, refresh time);
+# a None name marks instructions that could not be cached
+ContextCacheKey = Tuple[str, str, str, str]
+_context_caches: Dict[ContextCacheKey, Tuple[Optional[str], float]] = {}
+_context_caches_lock = threading.Lock()
+
+
+def _known_context_cache(key: ContextCacheKey) -> Tuple[bool, Optional[str]]:
+    with _context_caches_lock:
+        entry = _context_caches.get(key)
+    if entry is None or entry[1] <= time.monotonic():
+        return False, None
+    return True, entry[0]
+
+
+def _remember_context_cache(
+    key: ContextCacheKey, name: Optional[str], ttl: float
+) -> None:
+    # recreated a little before the provider drops it
+    with _context_caches_lock:
+        _context_caches[key] = (name, time.monotonic() + ttl * 0.9)
+
+
+def _forget_context_cache(key: ContextCacheKey, name: str) -> None:
+    with _context_caches_lock:
+        entry = _context_caches.get(key)
+        # another client may already have replaced it
+        if entry is not None and entry[0] == name:
+            del _context_caches[key]
 
 
 class GeminiClient(LLMClientBase):
+    provider = "gemini"
+    # batchEmbedContents accepts up to 100 inputs per request
+    embedding_batch_size = 100
+    # explicit context caches have a minimum size; shorter instructions are
+    # left to Gemini's implicit prefix caching
+    context_cache_min_tokens = 4096
+
     def __init__(
-        self, engine: LLMEngine, prompt: Prompt, gemini_api_key: Optional[str]
+        self,
+        engine: LLMEngine,
+        prompt: Prompt,
+        gemini_api_key: Optional[str],
+        cache: Optional[ResponseCache] = None,
+        ledger: Optional[CostLedger] = None,
+        base_url: Optional[str] = None,
+        transport: Optional[TransportConfig] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        retry: Optional[RetryPolicy] = None,
+        context_overflow: str = "reject",
+        context_cache_ttl: Optional[float] = None,
+        single_flight: Optional[SingleFlight] = None,
     ):
-        self.logger = initiate_logger(self.__class__.__name__)
-        self.client = genai.Client(api_key=gemini_api_key)
-        self.engine = engine
-        self.prompt = prompt
-        self.job_info = JobInfoType(individual=[], aggregated={})
+        super().__init__(
+            engine,
+            prompt,
+            gemini_api_key,
+            cache=cache,
+            ledger=ledger,
+            base_url=base_url,
+            transport=transport,
+            semantic_cache=semantic_cache,
+            retry=retry,
+            context_overflow=context_overflow,
+            single_flight=single_flight,
+        )
+        # seconds explicit context caches of long instructions live; None
+        # sends the instructions with every request
+        self.context_cache_ttl = context_cache_ttl
 
-    def call_request(
-        self,
-        job_name: JobType,
+    @property
+    def aio(self) -> AsyncClient:
+        """Async API of a genai client pooled for the running event loop."""
+        api_key, base_url, transport = self._transport_args
+        return (
+            get_transport_registry()
+            .get_async(
+                self.provider,
+                api_key,
+                base_url,
+                transport,
+                lambda: _build_transport(api_key, base_url, transport),
+            )
+            .aio
+        )
+
+    def submit_batch_job(self, prompts: Sequence[Prompt]) -> BatchJob:
+        # one GenerateContentRequest per line, matched back through its key
+        lines = [
+            json.dumps(
+                {"key": batch_request_id(index), "request": self.__batch_request(p)}
+            )
+            for index, p in enumerate(prompts)
+        ]
+        input_file = self.client.files.upload(
+            file=io.BytesIO("\n".join(lines).encode()),
+            config=types.UploadFileConfig(mime_type="jsonl"),
+        )
+        batch = self.client.batches.create(
+            model=self.engine.params.model, src=input_file.name
+        )
+        return self.__batch_job(batch, len(prompts))
+
+    def poll_batch_job(self, job: BatchJob) -> BatchJob:
+        return self.__batch_job(self.client.batches.get(name=job.id), job.size)
+
+    def iter_batch_job_results(
+        self, job: BatchJob, prompts: Sequence[Prompt]
+    ) -> Iterator[BatchResult]:
+        if job.output_file is None:
+            return
+        # spooled to disk so large result files are never held in memory
+        with tempfile.TemporaryFile() as output:
+            self.client.files.download(file=job.output_file, destination=output)
+            output.seek(0)
+            for line in output:
+                if line.strip():
+                    yield self.__batch_result(json.loads(line), prompts)
+
+    def __batch_request(self, prompt: Prompt) -> Dict[str, Any]:
+        contents = self.__contents(prompt)
+        if isinstance(contents, str):
+            contents = [types.Content(role="user", parts=[types.Part(text=contents)])]
+        generation_config = types.GenerationConfig(
+            temperature=self.engine.params.temperature,
+            max_output_tokens=self.engine.params.max_tokens,
+            top_p=self.engine.params.top_p,
+            top_k=self.engine.params.top_k,
+            presence_penalty=self.engine.params.presence_penalty,
+            frequency_penalty=self.engine.params.frequency_penalty,
+        )
+        request = {
+            "contents": [
+                content.model_dump(mode="json", exclude_none=True, by_alias=True)
+                for content in contents
+            ],
+            "generationConfig": generation_config.model_dump(
+                mode="json", exclude_none=True, by_alias=True
+            ),
+        }
+        if prompt.instructions:
+            request["systemInstruction"] = {"parts": [{"text": prompt.instructions}]}
+        return request
+
+    def __batch_job(self, batch: types.BatchJob, size: int) -> BatchJob:
+        state = batch.state.name if batch.state else "JOB_STATE_UNSPECIFIED"
+        return BatchJob(
+            id=batch.name,
+            status=state,
+            size=size,
+            done=state
+            in (
+                "JOB_STATE_SUCCEEDED",
+                "JOB_STATE_FAILED",
+                "JOB_STATE_CANCELLED",
+                "JOB_STATE_EXPIRED",
+            ),
+            output_file=batch.dest.file_name if batch.dest else None,
+        )
+
+    def __batch_result(
+        self, item: Dict[str, Any], prompts: Sequence[Prompt]
+    ) -> BatchResult:
+        index = batch_request_index(item["key"])
+        if "response" not in item:
+            return BatchResult(
+                index,
+                prompts[index],
+                "error",
+                error=BatchRequestError(item.get("error") or item.get("status")),
+            )
+        response = GenerateContentResponse.model_validate(item["response"])
+        self._record_batch_response(response)
+        return BatchResult(index, prompts[index], "success", response=response)
+
+    def _build_transport(
+        self, api_key: Optional[str], base_url: Optional[str], config: TransportConfig
+    ) -> genai.Client:
+        return _build_transport(api_key, base_url, config)
+
+    def _send(
+        self, prompt: Prompt, timeout: Optional[float] = None
     ) -> GenerateContentResponse:
-        if job_name == JobType.CHAT_COMPLETION:
-            self.logger.info(f"Calling Gemini API and request with {job_name} job...")
-            response = self.__chat_completion()
-        else:
-            self.logger.error(f"The {JobType.value} job is not currently available!")
+        cached_content = self.__context_cache(prompt)
+        try:
+            response = self.client.models.generate_content(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt, timeout, cached_content),
+                contents=self.__contents(prompt),
+            )
+        except errors.ClientError as exc:
+            if not self.__stale_context_cache(prompt, cached_content, exc):
+                raise
+            response = self.client.models.generate_content(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt, timeout),
+                contents=self.__contents(prompt),
+            )
+
+        return response
 
-        # add each call information to job info dictionary
-        self.job_info["individual"].append(self.__get_job_info(response))
+    async def _asend(
+        self, prompt: Prompt, timeout: Optional[float] = None
+    ) -> GenerateContentResponse:
+        cached_content = await self.__acontext_cache(prompt)
+        try:
+            response = await self.aio.models.generate_content(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt, timeout, cached_content),
+                contents=self.__contents(prompt),
+            )
+        except errors.ClientError as exc:
+            if not self.__stale_context_cache(prompt, cached_content, exc):
+                raise
+            response = await self.aio.models.generate_content(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt, timeout),
+                contents=self.__contents(prompt),
+            )
 
         return response
 
-    def get_cost_info(
-        self,
-        type: Literal["aggregated", "individual"] = "aggregated",
-        call_no: Optional[Union[int, Literal["all"]]] = None,
-    ) -> Any:
-        if type == "aggregated":
-            self.logger.info("Calculating overall total cost...")
-            aggregate_keys = [
-                ("input_tokens", 0),
-                ("output_tokens", 0),
-                ("total_tokens", 0),
-                ("input_cost", 0.0),
-                ("output_cost", 0.0),
-                ("total_cost", 0.0),
-            ]
-
-            for key, default in aggregate_keys:
-                self.job_info["aggregated"][f"overall_{key}"] = sum(
-                    getattr(call, key, default)
-                    for call in self.job_info["individual"]
-                    if isinstance(call.get(key, default), (int, float))
-                )
-
-            aggregated = self.job_info["aggregated"]
-            self.logger.info(
-                f"Total cost for all calls: USD {aggregated.get('total_cost', 0.0):.5f}"
+    def _stream(
+        self, prompt: Prompt
+    ) -> Iterator[Tuple[str, Optional[GenerateContentResponse]]]:
+        last_chunk = None
+        for chunk in self.__open_stream(prompt):
+            last_chunk = chunk
+            yield chunk.text or "", None
+        # the final chunk carries the usage metadata for the whole stream
+        if last_chunk is not None and last_chunk.usage_metadata:
+            yield "", last_chunk
+
+    async def _astream(
+        self, prompt: Prompt
+    ) -> AsyncIterator[Tuple[str, Optional[GenerateContentResponse]]]:
+        last_chunk = None
+        async for chunk in await self.__aopen_stream(prompt):
+            last_chunk = chunk
+            yield chunk.text or "", None
+        if last_chunk is not None and last_chunk.usage_metadata:
+            yield "", last_chunk
+
+    def _embed(self, texts: Sequence[str]) -> Tuple[np.ndarray, Optional[int]]:
+        response = self.client.models.embed_content(
+            model=self.engine.params.model, contents=list(texts)
+        )
+        # the Gemini API reports no token usage for embeddings
+        return self.__embedding_matrix(response), None
+
+    async def _aembed(self, texts: Sequence[str]) -> Tuple[np.ndarray, Optional[int]]:
+        response = await self.aio.models.embed_content(
+            model=self.engine.params.model, contents=list(texts)
+        )
+        return self.__embedding_matrix(response), None
+
+    def _usage_from(self, response: GenerateContentResponse) -> ResponseUsage:
+        usage = response.usage_metadata
+        return ResponseUsage(
+            response.response_id,
+            usage.prompt_token_count,
+            usage.candidates_token_count,
+            usage.total_token_count,
+            # prompt_token_count includes the tokens read from a context cache
+            usage.cached_content_token_count or 0,
+        )
+
+    def _load_response(self, payload: str) -> GenerateContentResponse:
+        return GenerateContentResponse.model_validate_json(payload)
+
+    def _retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, errors.APIError):
+            return exc.code in RETRYABLE_STATUS
+        # connection failures and timeouts of the underlying httpx client
+        return isinstance(exc, httpx.TransportError)
+
+    def __open_stream(self, prompt: Prompt) -> Iterator[GenerateContentResponse]:
+        cached_content = self.__context_cache(prompt)
+        started = False
+        try:
+            for chunk in self.client.models.generate_content_stream(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt, cached_content=cached_content),
+                contents=self.__contents(prompt),
+            ):
+                started = True
+                yield chunk
+        except errors.ClientError as exc:
+            if started or not self.__stale_context_cache(prompt, cached_content, exc):
+                raise
+            yield from self.client.models.generate_content_stream(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt),
+                contents=self.__contents(prompt),
+            )
+
+    async def __aopen_stream(
+        self, prompt: Prompt
+    ) -> AsyncIterator[GenerateContentResponse]:
+        cached_content = await self.__acontext_cache(prompt)
+        try:
+            return await self.aio.models.generate_content_stream(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt, cached_content=cached_content),
+                contents=self.__contents(prompt),
+            )
+        except errors.ClientError as exc:
+            if not self.__stale_context_cache(prompt, cached_content, exc):
+                raise
+            return await self.aio.models.generate_content_stream(
+                model=self.engine.params.model,
+                config=self.__generation_config(prompt),
+                contents=self.__contents(prompt),
             )
-        else:
-            if call_no == "all":
-                return self.job_info["individual"]
-            elif call_no is None:
-                raise ValueError("call_no must be provided for individual type")
-            elif self.job_info["individual"] == []:
-                raise ValueError("No individual job data available.")
-            else:
-                return self.job_info["individual"][call_no]
-
-    def get_call_metadata(self) -> Dict[str, Any]:
-        return {
-            "job_parameters": asdict(self.engine.params),
-            "job_cost": {
-                "individual": self.job_info["individual"],
-                "aggregated": self.job_info["aggregated"],
-            },
-        }
 
-    def __chat_completion(self) -> GenerateContentResponse:
-        response = self.client.models.generate_content(
-            model=self.engine.params.model,
-            config=types.GenerateContentConfig(
-                system_instruction=self.prompt.instructions,
-                temperature=self.engine.params.temperature,
-                top_p=self.engine.params.top_p,
-                top_k=self.engine.params.top_k,
-                presence_penalty=self.engine.params.presence_penalty,
-                frequency_penalty=self.engine.params.frequency_penalty,
+    def __generation_config(
+        self,
+        prompt: Prompt,
+        timeout: Optional[float] = None,
+        cached_content: Optional[str] = None,
+    ) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
+            http_options=(
+                None
+                if timeout is None
+                else types.HttpOptions(timeout=int(timeout * 1000))  # milliseconds
             ),
-            contents=self.prompt.prompt,
+            # a context cache already holds the instructions
+            system_instruction=None if cached_content else prompt.instructions,
+            cached_content=cached_content,
+            temperature=self.engine.params.temperature,
+            max_output_tokens=self.engine.params.max_tokens,
+            top_p=self.engine.params.top_p,
+            top_k=self.engine.params.top_k,
+            presence_penalty=self.engine.params.presence_penalty,
+            frequency_penalty=self.engine.params.frequency_penalty,
         )
 
-        return response
+    def __context_cache_key(self, prompt: Prompt) -> Optional[ContextCacheKey]:
+        if self.context_cache_ttl is None or not prompt.instructions:
+            return None
+        if self.tokens.count(prompt.instructions) < self.context_cache_min_tokens:
+            return None
+        api_key, base_url, _ = self._transport_args
+        return (
+            hashlib.sha256((api_key or "").encode()).hexdigest()[:16],
+            base_url or "",
+            self.engine.params.model,
+            prompt.instructions,
+        )
 
-    def __get_job_info(self, response: GenerateContentResponse) -> JobInfo:
-        model_name = (
-            self.engine.params.model.upper().replace("-", "_").replace(".", "_")
+    def __context_cache_config(self, prompt: Prompt) -> types.CreateCachedContentConfig:
+        return types.CreateCachedContentConfig(
+            system_instruction=prompt.instructions,
+            ttl=f"{int(self.context_cache_ttl or 0)}s",
+        )
+
+    def __context_cache(self, prompt: Prompt) -> Optional[str]:
+        """
+        Name of the explicit context cache holding the prompt's instructions.
+
+        Caches are created on first use and shared by every client with the \
+        same key, model and instructions; concurrent first requests may \
+        each create one. Creation and storage are billed by Gemini outside \
+        the ledger.
+        """
+        key = self.__context_cache_key(prompt)
+        if key is None:
+            return None
+        known, name = _known_context_cache(key)
+        if known:
+            return name
+        try:
+            name = self.client.caches.create(
+                model=self.engine.params.model,
+                config=self.__context_cache_config(prompt),
+            ).name
+        except Exception as exc:
+            self.__context_cache_failed(exc)
+            name = None
+        _remember_context_cache(key, name, self.context_cache_ttl or 0)
+        return name
+
+    async def __acontext_cache(self, prompt: Prompt) -> Optional[str]:
+        key = self.__context_cache_key(prompt)
+        if key is None:
+            return None
+        known, name = _known_context_cache(key)
+        if known:
+            return name
+        try:
+            cache = await self.aio.caches.create(
+                model=self.engine.params.model,
+                config=self.__context_cache_config(prompt),
+            )
+            name = cache.name
+        except Exception as exc:
+            self.__context_cache_failed(exc)
+            name = None
+        _remember_context_cache(key, name, self.context_cache_ttl or 0)
+        return name
+
+    def __context_cache_failed(self, exc: Exception) -> None:
+        # remembered like a cache, so the creation is not retried every call
+        self.logger.warning(
+            "Context cache not created (%s: %s); sending instructions inline",
+            type(exc).__name__,
+            exc,
+        )
+
+    def __stale_context_cache(
+        self,
+        prompt: Prompt,
+        cached_content: Optional[str],
+        exc: errors.ClientError,
+    ) -> bool:
+        """
+        Whether `exc` rejects a context cache that Gemini no longer holds.
+
+        Caches deleted or expired on the server are forgotten, so the next \
+        request creates a new one; the failed request is sent once more with \
+        its instructions inline.
+        """
+        if cached_content is None or exc.code not in (403, 404):
+            return False
+        if "cachedcontent" not in str(exc).lower().replace("_", "").replace(" ", ""):
+            return False
+        key = self.__context_cache_key(prompt)
+        if key is not None:
+            _forget_context_cache(key, cached_content)
+        self.logger.warning(
+            "Context cache %s was rejected (%s); sending instructions inline",
+            cached_content,
+            exc.code,
+        )
+        return True
+
+    @staticmethod
+    def __contents(prompt: Prompt) -> Union[str, List[types.Content]]:
+        if not prompt.messages:
+            return prompt.prompt
+        # Gemini names the assistant side of a conversation "model"
+        return [
+            types.Content(
+                role="model" if message["role"] == "assistant" else "user",
+                parts=[types.Part(text=message["content"])],
+            )
+            for message in prompt.messages
+        ]
+
+    @staticmethod
+    def __embedding_matrix(response: types.EmbedContentResponse) -> np.ndarray:
+        return np.array(
+            [embedding.values for embedding in response.embeddings],
+            dtype=EMBEDDING_DTYPE,
         )
-        input_cost = getattr(GeminiCost, model_name).input
-        output_cost = getattr(GeminiCost, model_name).output
-        input_tokens = response.usage_metadata.prompt_token_count
-        output_tokens = response.usage_metadata.candidates_token_count
-        total_tokens = response.usage_metadata.total_token_count
-        return {
-            "id": response.response_id,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": total_tokens,
-            "input_cost": (input_tokens / 1_000_000) * input_cost,
-            "output_cost": (output_tokens / 1_000_000) * output_cost,
-            "total_cost": ((input_tokens / 1_000_000) * input_cost)
-            + ((output_tokens / 1_000_000) * output_cost),
-        }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,384 @@
+import contextlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import weakref
+from array import array
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from llm.types import JobInfo, JobInfoType, JobType
+
+AGGREGATE_KEYS = (
+    "input_tokens",
+    "output_tokens",
+    "total_tokens",
+    "cached_tokens",
+    "input_cost",
+    "output_cost",
+    "total_cost",
+)
+
+# Column layout of a stored JobInfo besides its id: (field, kind). Kinds map
+# to an array typecode for the in-memory window and a struct code on disk.
+RECORD_SCHEMA: Tuple[Tuple[str, str], ...] = (
+    ("input_tokens", "int"),
+    ("output_tokens", "int"),
+    ("total_tokens", "int"),
+    ("cached_tokens", "int"),
+    ("input_cost", "float"),
+    ("output_cost", "float"),
+    ("total_cost", "float"),
+    ("rate_limit_wait", "float"),
+    ("cache_hit", "bool"),
+    ("coalesced", "bool"),
+    ("ttft", "optional_float"),
+    ("tokens_per_second", "optional_float"),
+    ("attempt", "int"),
+    ("hedged", "bool"),
+    ("failed", "bool"),
+)
+_TYPECODES = {"int": "q", "float": "d", "bool": "b", "optional_float": "d"}
+ID_SIZE = 64  # bytes reserved for the provider's response id on disk
+_RECORD = struct.Struct(
+    f"<{ID_SIZE}s" + "".join(_TYPECODES[kind] for _, kind in RECORD_SCHEMA)
+)
+
+
+def make_job_info(
+    id: str,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    cached_tokens: int = 0,
+    input_cost: float = 0.0,
+    output_cost: float = 0.0,
+    total_tokens: Optional[int] = None,
+    rate_limit_wait: float = 0.0,
+    cache_hit: bool = False,
+    coalesced: bool = False,
+    ttft: Optional[float] = None,
+    tokens_per_second: Optional[float] = None,
+    attempt: int = 1,
+    hedged: bool = False,
+    failed: bool = False,
+) -> JobInfo:
+    """
+    Build the ledger record of one request.
+
+    Everything but the id defaults to an unbilled, first and successful \
+    attempt; `total_tokens` defaults to input plus output tokens, and the \
+    total cost is always the sum of the input and output costs.
+    """
+    return {
+        "id": id,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": (
+            input_tokens + output_tokens if total_tokens is None else total_tokens
+        ),
+        "cached_tokens": cached_tokens,
+        "rate_limit_wait": rate_limit_wait,
+        "cache_hit": cache_hit,
+        "coalesced": coalesced,
+        "ttft": ttft,
+        "tokens_per_second": tokens_per_second,
+        "attempt": attempt,
+        "hedged": hedged,
+        "failed": failed,
+        "input_cost": input_cost,
+        "output_cost": output_cost,
+        "total_cost": input_cost + output_cost,
+    }
+
+
+def _empty_totals() -> Dict[str, Union[int, float]]:
+    # every attempt sent to the provider is a call, retries and hedges
+    # included; requests answered from the response cache or by an identical
+    # request in flight are counted apart, as they reach no provider
+    totals: Dict[str, Union[int, float]] = {
+        "calls": 0,
+        "failed_attempts": 0,
+        "hedged_attempts": 0,
+        "cache_hits": 0,
+        "coalesced_requests": 0,
+    }
+    for key in AGGREGATE_KEYS:
+        totals[key] = 0.0 if key.endswith("_cost") else 0
+    return totals
+
+
+def _with_hit_ratio(
+    totals: Dict[str, Union[int, float]],
+) -> Dict[str, Union[int, float]]:
+    # share of input tokens served from the provider's prefix (prompt) cache
+    input_tokens = totals["input_tokens"]
+    ratio = totals["cached_tokens"] / input_tokens if input_tokens else 0.0
+    return {**totals, "prefix_cache_hit_ratio": ratio}
+
+
+def _encode(kind: str, value: Any) -> Union[int, float]:
+    if kind == "optional_float":
+        return math.nan if value is None else float(value)
+    return int(value) if kind in ("int", "bool") else float(value)
+
+
+def _remove_file(path: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+
+def _decode(kind: str, value: Union[int, float]) -> Any:
+    if kind == "bool":
+        return bool(value)
+    if kind == "optional_float" and math.isnan(value):
+        return None
+    return value
+
+
+class JobRecordStore:
+    """
+    Compact, append-only storage for JobInfo records.
+
+    The most recent records live in typed `array` columns instead of one \
+    dict per call. When `window` is set, older records are spilled in \
+    chunks to an append-only file of fixed-size binary records, which is \
+    memory-mapped for O(1) indexed reads without loading it back.
+
+    Args:
+        window: Maximum number of records kept in memory; None keeps all.
+        spill_path: New file receiving spilled records; `FileExistsError` \
+            is raised if it already exists. A temporary file is created \
+            when a window is set without a path, and removed by `close()` \
+            or when the store is garbage collected.
+    """
+
+    def __init__(
+        self, window: Optional[int] = None, spill_path: Optional[str] = None
+    ) -> None:
+        if window is not None and window < 2:
+            raise ValueError("window must hold at least 2 records")
+        self.window = window
+        self._ids: List[str] = []
+        self._columns = {
+            field: array(_TYPECODES[kind]) for field, kind in RECORD_SCHEMA
+        }
+        self._spilled = 0
+        self._mapped = 0
+        self._map: Optional[mmap.mmap] = None
+        self._file = None
+        self._remove_spill: Optional[weakref.finalize] = None
+        if window is not None and spill_path is None:
+            fd, spill_path = tempfile.mkstemp(prefix="llm-ledger-")
+            os.close(fd)
+            self._remove_spill = weakref.finalize(self, _remove_file, spill_path)
+        self.spill_path = spill_path
+        if spill_path is not None and window is not None:
+            # held open for the store's lifetime; closed by close(). A file
+            # named by the caller must not exist yet, so nothing is overwritten
+            mode = "wb+" if self._remove_spill is not None else "xb+"
+            self._file = open(spill_path, mode)  # noqa: SIM115
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._ids)
+
+    def append(self, job_info: JobInfo) -> None:
+        self._ids.append(job_info["id"])
+        for field, kind in RECORD_SCHEMA:
+            value = job_info.get(field)  # type: ignore[misc]
+            self._columns[field].append(_encode(kind, value))
+        if self.window is not None and len(self._ids) >= self.window:
+            self.__spill(self.window // 2)
+
+    def get(self, index: int) -> JobInfo:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("call_no out of range")
+        if index >= self._spilled:
+            return self.__from_memory(index - self._spilled)
+        return self.__from_disk(index)
+
+    def __iter__(self) -> Iterator[JobInfo]:
+        for index in range(len(self)):
+            yield self.get(index)
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._remove_spill is not None:
+            # runs at most once, whether here, on collection or at exit
+            self._remove_spill()
+
+    def __from_memory(self, position: int) -> JobInfo:
+        record: Dict[str, Any] = {"id": self._ids[position]}
+        for field, kind in RECORD_SCHEMA:
+            record[field] = _decode(kind, self._columns[field][position])
+        return record  # type: ignore[return-value]
+
+    def __from_disk(self, index: int) -> JobInfo:
+        assert self._file is not None
+        if self._mapped < self._spilled:
+            # the file grew since it was mapped; remap to cover the new records
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = self._spilled
+        assert self._map is not None
+        values = _RECORD.unpack_from(self._map, index * _RECORD.size)
+        record: Dict[str, Any] = {"id": values[0].rstrip(b"\0").decode()}
+        for (field, kind), value in zip(RECORD_SCHEMA, values[1:]):
+            record[field] = _decode(kind, value)
+        return record  # type: ignore[return-value]
+
+    def __spill(self, count: int) -> None:
+        assert self._file is not None
+        buffer = bytearray(_RECORD.size * count)
+        for position in range(count):
+            _RECORD.pack_into(
+                buffer,
+                position * _RECORD.size,
+                self._ids[position].encode()[:ID_SIZE],
+                *(self._columns[field][position] for field, _ in RECORD_SCHEMA),
+            )
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(buffer)
+        self._file.flush()
+        del self._ids[:count]
+        for column in self._columns.values():
+            del column[:count]
+        self._spilled += count
+
+
+class RecordView(Sequence[JobInfo]):
+    """Read-only, lazily materialized view over a ledger's records."""
+
+    def __init__(self, ledger: "CostLedger") -> None:
+        self._ledger = ledger
+
+    def __len__(self) -> int:
+        return len(self._ledger)
+
+    @overload
+    def __getitem__(self, index: int) -> JobInfo: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[JobInfo]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [
+                self._ledger.individual(i) for i in range(*index.indices(len(self)))
+            ]
+        return self._ledger.individual(index)
+
+
+class CostLedger:
+    """
+    Thread-safe record of every call made by a client plus running totals.
+
+    Totals are updated as each call is recorded, so reading the aggregated \
+    view never walks the individual records. Totals are also broken down \
+    per model and per job type. Records are kept in a `JobRecordStore`, \
+    optionally bounded to a memory window with spill-to-disk.
+    """
+
+    def __init__(
+        self, window: Optional[int] = None, spill_path: Optional[str] = None
+    ) -> None:
+        self._lock = threading.Lock()
+        self._records = JobRecordStore(window=window, spill_path=spill_path)
+        self._totals = _empty_totals()
+        self._by_model: Dict[str, Dict[str, Union[int, float]]] = {}
+        self._by_job_type: Dict[str, Dict[str, Union[int, float]]] = {}
+
+    def record(self, job_info: JobInfo, model: str, job_type: JobType) -> None:
+        with self._lock:
+            self._records.append(job_info)
+            for totals in (
+                self._totals,
+                self._by_model.setdefault(model, _empty_totals()),
+                self._by_job_type.setdefault(job_type.value, _empty_totals()),
+            ):
+                served_locally = job_info["cache_hit"] or job_info["coalesced"]
+                totals["calls"] += not served_locally
+                totals["failed_attempts"] += job_info["failed"]
+                totals["hedged_attempts"] += job_info["hedged"]
+                totals["cache_hits"] += job_info["cache_hit"]
+                totals["coalesced_requests"] += job_info["coalesced"]
+                for key in AGGREGATE_KEYS:
+                    totals[key] += job_info[key]  # type: ignore[literal-required]
+
+    def aggregated(self) -> Dict[str, Any]:
+        """Overall totals as `overall_<key>` plus per-model/job-type breakdowns."""
+        with self._lock:
+            aggregated: Dict[str, Any] = {
+                f"overall_{key}": value
+                for key, value in _with_hit_ratio(self._totals).items()
+            }
+            aggregated["by_model"] = {
+                model: _with_hit_ratio(totals)
+                for model, totals in self._by_model.items()
+            }
+            aggregated["by_job_type"] = {
+                job_type: _with_hit_ratio(totals)
+                for job_type, totals in self._by_job_type.items()
+            }
+        return aggregated
+
+    def individual(self, call_no: Union[int, Literal["all"]]) -> Any:
+        """
+        Return one record by index, or every record for "all".
+
+        Indexed lookups read a single record, from disk if it was spilled; \
+        "all" materializes the full history and should be avoided on \
+        long-running clients in favour of `records()`.
+        """
+        with self._lock:
+            if call_no == "all":
+                return list(self._records)
+            return self._records.get(call_no)
+
+    def records(self) -> RecordView:
+        return RecordView(self)
+
+    def close(self) -> None:
+        with self._lock:
+            self._records.close()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, key: Literal["individual", "aggregated"]) -> Any:
+        # keeps `job_info["individual"]` / `job_info["aggregated"]` working
+        if key == "individual":
+            return self.individual("all")
+        if key == "aggregated":
+            return self.aggregated()
+        raise KeyError(key)
+
+    def snapshot(self) -> JobInfoType:
+        """
+        Every record as a list, with the aggregates; JSON-serializable.
+
+        This copies the full history; use `records()` for a lazy view.
+        """
+        return JobInfoType(
+            individual=self.individual("all"), aggregated=self.aggregated()
+        )
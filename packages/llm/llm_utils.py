@@ -1,8 +1,8 @@
 from typing import Any
 
-import yaml
 from utils import initiate_logger
 
+from llm.config import get_config_store
 from llm.types import LLMParams
 
 
@@ -12,6 +12,9 @@ def load_llm_params_from_yaml(
     """
     Load LLM parameters from YAML configuration file
 
+    The file is parsed once and cached; it is only read again after it \
+    changes on disk (see `llm.config.ConfigStore`).
+
     Args:
         path: Path to the YAML config file
         config_name: Name of the configuration to load (e.g., 'default', 'creative_writing', etc.)
@@ -19,14 +22,7 @@ def load_llm_params_from_yaml(
     Returns:
         LLMParams instance with loaded configuration
     """
-    with open(path, "r") as f:
-        config = yaml.safe_load(f)
-
-    # Get the specific configuration by name
-    if config_name not in config:
-        raise ValueError(f"Configuration '{config_name}' not found in {path}")
-
-    return LLMParams.from_dict(config[config_name])
+    return get_config_store().get(path, config_name)
 
 
 # Example usage functions
@@ -75,30 +71,55 @@ class OpenAICost:
         input = 75.00
         cached_input = 37.50
         output = 150.00
+        rate_limit_rpm = 1000  # requests per minute
+        rate_limit_tpm = 125000  # tokens per minute
 
     class GPT_4O:
         context_length = "128k"
         input = 2.50
         cached_input = 1.25
         output = 10.00
+        rate_limit_rpm = 500
+        rate_limit_tpm = 30000
 
     class GPT_4O_MINI:
         context_length = "128k"
         input = 0.15
         cached_input = 0.075
         output = 0.60
+        rate_limit_rpm = 500
+        rate_limit_tpm = 200000
 
     class O1:
         context_length = "200k"
         input = 15.00
         cached_input = 7.50
         output = 60.00
+        rate_limit_rpm = 500
+        rate_limit_tpm = 30000
 
     class O3_MINI:
         context_length = "200k"
         input = 1.10
         cached_input = 0.55
         output = 4.40
+        rate_limit_rpm = 1000
+        rate_limit_tpm = 100000
+
+    class TEXT_EMBEDDING_3_SMALL:
+        context_window = 8191
+        input = 0.02
+        output = None  # No output tokens for embeddings
+
+    class TEXT_EMBEDDING_3_LARGE:
+        context_window = 8191
+        input = 0.13
+        output = None
+
+    class TEXT_EMBEDDING_ADA_002:
+        context_window = 8191
+        input = 0.10
+        output = None
 
     class GPT_4O_FINE_TUNING:
         input = 3.75
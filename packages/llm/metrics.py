@@ -0,0 +1,335 @@
+import bisect
+import math
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from llm.types import JobInfo, JobType
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKENS_PER_SECOND_BUCKETS = (5.0, 10.0, 25.0, 50.0, 100.0, 200.0, 400.0, 800.0)
+CALL_LABELS = ("provider", "model", "job_type")
+
+# name -> (type, help, label names)
+METRICS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "llm_requests_total": (
+        "counter",
+        "Requests sent to the provider, retries and hedges included.",
+        CALL_LABELS,
+    ),
+    "llm_cache_hits_total": (
+        "counter",
+        "Requests answered from a local cache.",
+        CALL_LABELS,
+    ),
+    "llm_coalesced_requests_total": (
+        "counter",
+        "Requests that shared the response of an identical request in flight.",
+        CALL_LABELS,
+    ),
+    "llm_errors_total": (
+        "counter",
+        "Failed requests by exception type.",
+        CALL_LABELS + ("error",),
+    ),
+    "llm_input_tokens_total": ("counter", "Billed input tokens.", CALL_LABELS),
+    "llm_output_tokens_total": ("counter", "Billed output tokens.", CALL_LABELS),
+    "llm_cached_input_tokens_total": (
+        "counter",
+        "Input tokens read from the provider's prompt cache.",
+        CALL_LABELS,
+    ),
+    "llm_cost_usd_total": ("counter", "Billed cost in USD.", CALL_LABELS),
+    "llm_request_duration_seconds": (
+        "histogram",
+        "Time from sending a request to its complete response.",
+        CALL_LABELS,
+    ),
+    "llm_output_tokens_per_second": (
+        "histogram",
+        "Output tokens per second of successful requests.",
+        CALL_LABELS,
+    ),
+    "llm_in_flight_requests": (
+        "gauge",
+        "Requests currently waiting for the provider.",
+        ("provider", "model"),
+    ),
+}
+BUCKETS = {
+    "llm_request_duration_seconds": LATENCY_BUCKETS,
+    "llm_output_tokens_per_second": TOKENS_PER_SECOND_BUCKETS,
+}
+
+SeriesKey = Tuple[str, Tuple[str, ...]]
+
+
+class _Shard:
+    """Series values written by a single thread."""
+
+    __slots__ = ("thread", "series")
+
+    def __init__(self) -> None:
+        self.thread = threading.current_thread()
+        # counters and gauges hold [value]; histograms hold one count per
+        # bucket, then the +Inf count, then the sum
+        self.series: Dict[SeriesKey, List[float]] = {}
+
+
+class MetricsRegistry:
+    """
+    In-process metrics of every LLM client, exportable to Prometheus.
+
+    Each thread writes to its own shard, so recording takes no lock and \
+    threads never contend; readers sum the shards. Shards of finished \
+    threads are folded into one when read, so short-lived worker pools do \
+    not accumulate shards.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired: Dict[SeriesKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        provider: str,
+        model: str,
+        job_type: JobType,
+        job_info: JobInfo,
+        latency: Optional[float] = None,
+    ) -> None:
+        """
+        Count a request recorded in the ledger.
+
+        Args:
+            provider: Provider name, e.g. "openai".
+            model: Model name.
+            job_type: Job type the request was recorded under.
+            job_info: The ledger record of the request.
+            latency: Seconds the request took, when it was timed.
+        """
+        labels = (provider, model, job_type.value)
+        series = self.__shard().series
+        if job_info["cache_hit"]:
+            _add(series, "llm_cache_hits_total", labels, 1)
+            return
+        if job_info.get("coalesced"):
+            _add(series, "llm_coalesced_requests_total", labels, 1)
+            return
+        _add(series, "llm_requests_total", labels, 1)
+        _add(series, "llm_input_tokens_total", labels, job_info["input_tokens"])
+        _add(series, "llm_output_tokens_total", labels, job_info["output_tokens"])
+        if job_info.get("cached_tokens"):
+            _add(
+                series,
+                "llm_cached_input_tokens_total",
+                labels,
+                job_info["cached_tokens"],
+            )
+        _add(series, "llm_cost_usd_total", labels, job_info["total_cost"])
+        if latency is not None:
+            _observe(series, "llm_request_duration_seconds", labels, latency)
+        tokens_per_second = job_info.get("tokens_per_second")
+        if tokens_per_second is None and latency and job_info["output_tokens"]:
+            tokens_per_second = job_info["output_tokens"] / latency
+        if tokens_per_second is not None:
+            _observe(series, "llm_output_tokens_per_second", labels, tokens_per_second)
+
+    def record_error(
+        self, provider: str, model: str, job_type: JobType, error: BaseException
+    ) -> None:
+        labels = (provider, model, job_type.value, type(error).__name__)
+        _add(self.__shard().series, "llm_errors_total", labels, 1)
+
+    @contextmanager
+    def in_flight(self, provider: str, model: str) -> Iterator[None]:
+        """Count the requests inside the block in the in-flight gauge."""
+        labels = (provider, model)
+        _add(self.__shard().series, "llm_in_flight_requests", labels, 1)
+        try:
+            yield
+        finally:
+            # async code may resume on another thread; shards are summed anyway
+            _add(self.__shard().series, "llm_in_flight_requests", labels, -1)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return every metric as plain data.
+
+        Returns:
+            Dict of metric name -> {"type", "help", "samples"}. Each sample \
+            has "labels" and a "value", or for histograms cumulative \
+            "buckets" keyed by upper bound, "sum" and "count".
+        """
+        totals = self.__collect()
+        snapshot: Dict[str, Dict[str, Any]] = {
+            name: {"type": kind, "help": text, "samples": []}
+            for name, (kind, text, _) in METRICS.items()
+        }
+        for (name, labels), values in sorted(totals.items()):
+            label_names = METRICS[name][2]
+            sample: Dict[str, Any] = {"labels": dict(zip(label_names, labels))}
+            if name in BUCKETS:
+                cumulative, buckets = 0.0, {}
+                for bound, count in zip(BUCKETS[name] + (math.inf,), values):
+                    cumulative += count
+                    buckets[bound] = int(cumulative)
+                sample.update(buckets=buckets, sum=values[-1], count=int(cumulative))
+            else:
+                sample["value"] = values[0]
+            snapshot[name]["samples"].append(sample)
+        return snapshot
+
+    def prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, metric in self.snapshot().items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for sample in metric["samples"]:
+                labels = sample["labels"]
+                if metric["type"] != "histogram":
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_number(sample['value'])}"
+                    )
+                    continue
+                for bound, count in sample["buckets"].items():
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    bucket_labels = _format_labels({**labels, "le": le})
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(
+                    f"{name}_sum{_format_labels(labels)} {_number(sample['sum'])}"
+                )
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop every recorded value."""
+        with self._lock:
+            for shard in self._shards:
+                shard.series.clear()
+            self._retired.clear()
+
+    def __shard(self) -> _Shard:
+        shard: Optional[_Shard] = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def __collect(self) -> Dict[SeriesKey, List[float]]:
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    # nothing writes to a finished thread's shard any more
+                    _merge(self._retired, shard.series)
+            self._shards = live
+            totals = {key: list(values) for key, values in self._retired.items()}
+        for shard in live:
+            # a C-level copy, so the owner thread cannot resize it mid-read
+            _merge(totals, dict(shard.series))
+        return totals
+
+
+def _add(
+    series: Dict[SeriesKey, List[float]],
+    name: str,
+    labels: Tuple[str, ...],
+    value: float,
+) -> None:
+    cell = series.get((name, labels))
+    if cell is None:
+        cell = series[(name, labels)] = [0.0]
+    cell[0] += value
+
+
+def _observe(
+    series: Dict[SeriesKey, List[float]],
+    name: str,
+    labels: Tuple[str, ...],
+    value: float,
+) -> None:
+    buckets = BUCKETS[name]
+    cell = series.get((name, labels))
+    if cell is None:
+        cell = series[(name, labels)] = [0.0] * (len(buckets) + 2)
+    cell[bisect.bisect_left(buckets, value)] += 1
+    cell[-1] += value
+
+
+def _merge(
+    into: Dict[SeriesKey, List[float]], series: Dict[SeriesKey, List[float]]
+) -> None:
+    for key, values in series.items():
+        cell = into.get(key)
+        if cell is None:
+            into[key] = list(values)
+        else:
+            for position, value in enumerate(values):
+                cell[position] += value
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
+
+
+def serve_metrics(
+    port: int = 9464,
+    host: str = "127.0.0.1",
+    registry: Optional[MetricsRegistry] = None,
+) -> ThreadingHTTPServer:
+    """
+    Serve the metrics at http://host:port/metrics from a daemon thread.
+
+    Args:
+        port: Port to listen on; 0 picks a free one.
+        host: Interface to bind.
+        registry: Registry to export; defaults to the process-wide one.
+
+    Returns:
+        The running server; call `shutdown()` to stop it.
+    """
+    registry = registry or get_metrics_registry()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
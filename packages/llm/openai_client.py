@@ -1,115 +1,330 @@
-from dataclasses import asdict
-from typing import Any, Dict, Literal, Optional, Union
+import base64
+import hashlib
+import json
+import weakref
+from functools import lru_cache
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from openai import OpenAI
+import httpx
+import numpy as np
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+)
 from openai.types.responses import Response
-from utils.logging import initiate_logger
 
 from llm.base import LLMClientBase
-from llm.llm_utils import LLMEngine, OpenAICost
-from llm.types import (
-    JobInfo,
-    JobInfoType,
-    JobType,
-    Prompt,
-)
+from llm.batch_job import BatchRequestError, batch_request_id, batch_request_index
+from llm.cache import ResponseCache
+from llm.cassette import async_cassette_transport, cassette_transport
+from llm.coalesce import SingleFlight
+from llm.embeddings import EMBEDDING_DTYPE
+from llm.ledger import CostLedger
+from llm.llm_utils import LLMEngine
+from llm.retry import RETRYABLE_STATUS, RetryPolicy
+from llm.semantic_cache import SemanticCache
+from llm.transport import TransportConfig, get_transport_registry
+from llm.types import BatchJob, BatchResult, Prompt, ResponseUsage
+
+# where the SDK sends requests when no base URL is given
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def _limits(config: TransportConfig) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive_connections,
+        keepalive_expiry=config.keepalive_expiry,
+    )
+
+
+def _build_transport(
+    api_key: str, base_url: Optional[str], config: TransportConfig
+) -> OpenAI:
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=config.timeout,
+        http_client=DefaultHttpxClient(
+            limits=_limits(config),
+            http2=config.http2,
+            transport=cassette_transport(config, base_url or OPENAI_BASE_URL),
+        ),
+    )
+
+
+def _build_async_transport(
+    api_key: str, base_url: Optional[str], config: TransportConfig
+) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=config.timeout,
+        http_client=DefaultAsyncHttpxClient(
+            limits=_limits(config),
+            http2=config.http2,
+            transport=async_cassette_transport(config, base_url or OPENAI_BASE_URL),
+        ),
+    )
+
+
+@lru_cache(maxsize=256)
+def _prompt_cache_key(instructions: str) -> str:
+    return hashlib.sha256(instructions.encode()).hexdigest()[:32]
 
 
 class OpenAIClient(LLMClientBase):
-    def __init__(self, engine: LLMEngine, prompt: Prompt, openai_api_key: str):
-        self.logger = initiate_logger(self.__class__.__name__)
-        self.client = OpenAI(openai_api_key)
-        self.engine = engine
-        self.prompt = prompt
-        self.job_info = JobInfoType(individual=[], aggregated={})
-
-    def call_request(self, job_name: JobType) -> Response:
-        if job_name == JobType.CHAT_COMPLETION:
-            self.logger.info(f"Calling OpenAI API and request with {job_name} job...")
-            response = self.__chat_completion()
-        else:
-            self.logger.error(f"The {JobType.value} job is not currently available!")
-            raise ValueError("Error job name not found!")
-
-        # add each call information to job info dictionary
-        self.job_info["individual"].append(self.__get_job_info(response))
-
-        return response
-
-    def get_cost_info(
+    provider = "openai"
+    # embeddings endpoint: 2048 inputs and 300k tokens per request
+    embedding_batch_size = 2048
+    embedding_batch_tokens = 300_000
+
+    def __init__(
         self,
-        type: Literal["aggregated", "individual"] = "aggregated",
-        call_no: Optional[Union[int, Literal["all"]]] = None,
-    ) -> Any:
-        if type == "aggregated":
-            self.logger.info("Calculating overall total cost...")
-            aggregate_keys = [
-                ("input_tokens", 0),
-                ("output_tokens", 0),
-                ("total_tokens", 0),
-                ("input_cost", 0.0),
-                ("output_cost", 0.0),
-                ("total_cost", 0.0),
-            ]
-
-            for key, default in aggregate_keys:
-                self.job_info["aggregated"][f"overall_{key}"] = sum(
-                    getattr(call, key, default)
-                    for call in self.job_info["individual"]
-                    if isinstance(call.get(key, default), (int, float))
-                )
-
-            aggregated = self.job_info["aggregated"]
-            self.logger.info(
-                f"Total cost for all calls: USD {aggregated.get('total_cost', 0.0):.5f}"
+        engine: LLMEngine,
+        prompt: Prompt,
+        openai_api_key: Optional[str],
+        cache: Optional[ResponseCache] = None,
+        ledger: Optional[CostLedger] = None,
+        base_url: Optional[str] = None,
+        transport: Optional[TransportConfig] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        retry: Optional[RetryPolicy] = None,
+        context_overflow: str = "reject",
+        single_flight: Optional[SingleFlight] = None,
+    ):
+        super().__init__(
+            engine,
+            prompt,
+            openai_api_key,
+            cache=cache,
+            ledger=ledger,
+            base_url=base_url,
+            transport=transport,
+            semantic_cache=semantic_cache,
+            retry=retry,
+            context_overflow=context_overflow,
+            single_flight=single_flight,
+        )
+        # with a policy in charge the SDK must not retry on its own as well
+        self.__chat_client = (
+            self.client.with_options(max_retries=0) if retry else self.client
+        )
+        # async clients are pooled per event loop, so their copies are kept
+        # per pooled client and built on first use
+        self.__async_chat_clients: MutableMapping[AsyncOpenAI, AsyncOpenAI] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI client pooled for the running event loop."""
+        api_key, base_url, transport = self._transport_args
+        return get_transport_registry().get_async(
+            self.provider,
+            api_key,
+            base_url,
+            transport,
+            lambda: _build_async_transport(api_key, base_url, transport),
+        )
+
+    def submit_batch_job(self, prompts: Sequence[Prompt]) -> BatchJob:
+        # one Responses API request per line, matched back through custom_id
+        lines = []
+        for index, prompt in enumerate(prompts):
+            body = {
+                "input": prompt.messages or prompt.prompt,
+                "instructions": prompt.instructions,
+                **self.__request_params(prompt),
+            }
+            request = {
+                "custom_id": batch_request_id(index),
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {
+                    name: value for name, value in body.items() if value is not None
+                },
+            }
+            lines.append(json.dumps(request))
+        input_file = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+        return self.__batch_job(batch, len(prompts))
+
+    def poll_batch_job(self, job: BatchJob) -> BatchJob:
+        return self.__batch_job(self.client.batches.retrieve(job.id), job.size)
+
+    def iter_batch_job_results(
+        self, job: BatchJob, prompts: Sequence[Prompt]
+    ) -> Iterator[BatchResult]:
+        # failed requests are written to a separate error file
+        for file_id in (job.output_file, job.error_file):
+            if file_id is None:
+                continue
+            with self.client.files.with_streaming_response.content(file_id) as lines:
+                for line in lines.iter_lines():
+                    if line:
+                        yield self.__batch_result(json.loads(line), prompts)
+
+    def __batch_job(self, batch: Any, size: int) -> BatchJob:
+        return BatchJob(
+            id=batch.id,
+            status=batch.status,
+            size=size,
+            done=batch.status in ("completed", "failed", "expired", "cancelled"),
+            output_file=batch.output_file_id,
+            error_file=batch.error_file_id,
+        )
+
+    def __batch_result(
+        self, item: Dict[str, Any], prompts: Sequence[Prompt]
+    ) -> BatchResult:
+        index = batch_request_index(item["custom_id"])
+        result = item.get("response") or {}
+        if item.get("error") or result.get("status_code") != 200:
+            error = item.get("error") or result.get("body", {}).get("error")
+            return BatchResult(
+                index, prompts[index], "error", error=BatchRequestError(error)
             )
-        else:
-            if call_no == "all":
-                return self.job_info["individual"]
-            elif call_no is None:
-                raise ValueError("call_no must be provided for individual type")
-            elif self.job_info["individual"] == []:
-                raise ValueError("No individual job data available.")
-            else:
-                return self.job_info["individual"][call_no]
-
-    def get_call_metadata(self) -> Dict[str, Any]:
-        return {
-            "job_parameters": asdict(self.engine.params),
-            "job_cost": {
-                "individual": self.job_info["individual"],
-                "aggregated": self.job_info["aggregated"],
-            },
-        }
+        response = Response.model_construct(**result["body"])
+        self._record_batch_response(response)
+        return BatchResult(index, prompts[index], "success", response=response)
+
+    def _build_transport(
+        self, api_key: Optional[str], base_url: Optional[str], config: TransportConfig
+    ) -> OpenAI:
+        return _build_transport(api_key, base_url, config)
+
+    def _send(self, prompt: Prompt, timeout: Optional[float] = None) -> Response:
+        return self.__chat_client.responses.create(
+            input=prompt.messages or prompt.prompt,
+            instructions=prompt.instructions,
+            **self.__request_params(prompt),
+            **({} if timeout is None else {"timeout": timeout}),
+        )
 
-    def __chat_completion(self) -> Response:
-        response = self.client.responses.create(
-            input=self.prompt.prompt,
-            instructions=self.prompt.instructions,
-            **self.engine.params,
+    async def _asend(self, prompt: Prompt, timeout: Optional[float] = None) -> Response:
+        return await self.__async_chat_client().responses.create(
+            input=prompt.messages or prompt.prompt,
+            instructions=prompt.instructions,
+            **self.__request_params(prompt),
+            **({} if timeout is None else {"timeout": timeout}),
         )
 
-        return response
+    def _stream(self, prompt: Prompt) -> Iterator[Tuple[str, Optional[Response]]]:
+        for event in self.client.responses.create(
+            input=prompt.messages or prompt.prompt,
+            instructions=prompt.instructions,
+            stream=True,
+            **self.__request_params(prompt),
+        ):
+            if event.type == "response.output_text.delta":
+                yield event.delta, None
+            elif event.type == "response.completed":
+                yield "", event.response
 
-    def __get_job_info(self, response: Response) -> JobInfo:
-        model_name = (
-            self.engine.params.model.upper().replace("-", "_").replace(".", "_")
+    async def _astream(
+        self, prompt: Prompt
+    ) -> AsyncIterator[Tuple[str, Optional[Response]]]:
+        async for event in await self.async_client.responses.create(
+            input=prompt.messages or prompt.prompt,
+            instructions=prompt.instructions,
+            stream=True,
+            **self.__request_params(prompt),
+        ):
+            if event.type == "response.output_text.delta":
+                yield event.delta, None
+            elif event.type == "response.completed":
+                yield "", event.response
+
+    def _embed(self, texts: Sequence[str]) -> Tuple[np.ndarray, Optional[int]]:
+        response = self.client.embeddings.create(
+            model=self.engine.params.model,
+            input=list(texts),
+            encoding_format="base64",
+        )
+        return self.__embedding_matrix(response), response.usage.prompt_tokens
+
+    async def _aembed(self, texts: Sequence[str]) -> Tuple[np.ndarray, Optional[int]]:
+        response = await self.async_client.embeddings.create(
+            model=self.engine.params.model,
+            input=list(texts),
+            encoding_format="base64",
+        )
+        return self.__embedding_matrix(response), response.usage.prompt_tokens
+
+    def _usage_from(self, response: Response) -> ResponseUsage:
+        details = response.usage.input_tokens_details
+        return ResponseUsage(
+            response.id,
+            response.usage.input_tokens,
+            response.usage.output_tokens,
+            response.usage.total_tokens,
+            (details.cached_tokens if details else None) or 0,
         )
-        input_cost = getattr(OpenAICost, model_name).input
-        output_cost = getattr(OpenAICost, model_name).output
-        input_tokens = response.usage.input_tokens
-        output_tokens = response.usage.output_tokens
-        total_tokens = response.usage.total_tokens
-        return {
-            "id": response.id,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": total_tokens,
-            "input_cost": (input_tokens / 1_000_000) * input_cost,
-            "output_cost": (output_tokens / 1_000_000) * output_cost,
-            "total_cost": ((input_tokens / 1_000_000) * input_cost)
-            + ((output_tokens / 1_000_000) * output_cost),
+
+    def _load_response(self, payload: str) -> Response:
+        # the SDK builds responses without validation, so rebuild them the same way
+        return Response.model_construct(**json.loads(payload))
+
+    def _retryable(self, exc: BaseException) -> bool:
+        if isinstance(exc, APIStatusError):
+            return exc.status_code in RETRYABLE_STATUS
+        # includes APITimeoutError
+        return isinstance(exc, APIConnectionError)
+
+    def __request_params(self, prompt: Prompt) -> Dict[str, Any]:
+        params = self.engine.params
+        request = {
+            "model": params.model,
+            "temperature": params.temperature,
+            "max_output_tokens": params.max_tokens,
+            "top_p": params.top_p,
+            "user": params.user,
         }
+        if prompt.instructions:
+            # requests sharing instructions share a prefix; the same key
+            # routes them to the same prompt cache
+            request["prompt_cache_key"] = _prompt_cache_key(prompt.instructions)
+        return request
+
+    def __async_chat_client(self) -> AsyncOpenAI:
+        async_client = self.async_client
+        if self.retry is None:
+            return async_client
+        chat_client = self.__async_chat_clients.get(async_client)
+        if chat_client is None:
+            chat_client = async_client.with_options(max_retries=0)
+            self.__async_chat_clients[async_client] = chat_client
+        return chat_client
+
+    @staticmethod
+    def __embedding_matrix(response: Any) -> np.ndarray:
+        # base64 float32 vectors decode straight into the matrix, skipping
+        # the list-of-floats round trip of the default format
+        rows = sorted(response.data, key=lambda row: row.index)
+        return np.frombuffer(
+            b"".join(base64.b64decode(row.embedding) for row in rows),
+            dtype=EMBEDDING_DTYPE,
+        ).reshape(len(rows), -1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,198 @@
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+from utils.logging import initiate_logger
+
+from llm.llm_utils import GeminiCost, OpenAICost
+
+PER_MILLION = 1_000_000
+PROVIDER_TABLES = {"openai": OpenAICost, "gemini": GeminiCost}
+# date and version tags a snapshot adds to the name of the model it pins,
+# after normalization: -2024-08-06, -05-20, -002, -latest, -preview, -exp
+VERSION_SUFFIX = re.compile(
+    r"-(\d{4}-\d{2}-\d{2}|\d{2}-\d{2}|\d{3}|latest|preview|exp)$"
+)
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    """Per-token USD rates and published limits of a single model."""
+
+    input: float = 0.0
+    cached_input: float = 0.0
+    output: float = 0.0
+    context_window: Optional[int] = None
+    rate_limit_rpm: Optional[int] = None
+    rate_limit_tpm: Optional[int] = None
+    # share of the price taken off for requests sent through batch endpoints
+    batch_discount: float = 0.5
+
+    @classmethod
+    def from_table(cls, entry: Any) -> "ModelPricing":
+        """Build from a table entry priced in USD per 1M tokens."""
+
+        def value(name: str) -> Any:
+            if isinstance(entry, dict):
+                return entry.get(name)
+            return getattr(entry, name, None)
+
+        def rate(name: str) -> Optional[float]:
+            return None if value(name) is None else float(value(name)) / PER_MILLION
+
+        def limit(name: str) -> Optional[int]:
+            return None if value(name) is None else int(value(name))
+
+        # OpenAI entries publish their window as e.g. context_length = "128k"
+        context_length = str(value("context_length") or "").lower()
+        context_window = limit("context_window")
+        if context_window is None and context_length:
+            multiplier = 1000 if context_length.endswith("k") else 1
+            context_window = int(float(context_length.rstrip("k")) * multiplier)
+
+        input_rate = rate("input") or 0.0
+        cached_rate = rate("cached_input")
+        return cls(
+            input=input_rate,
+            # models without prompt caching bill cached tokens at the full rate
+            cached_input=input_rate if cached_rate is None else cached_rate,
+            output=rate("output") or 0.0,
+            context_window=context_window,
+            rate_limit_rpm=limit("rate_limit_rpm"),
+            rate_limit_tpm=limit("rate_limit_tpm"),
+            batch_discount=(
+                0.5
+                if value("batch_discount") is None
+                else float(value("batch_discount"))
+            ),
+        )
+
+    def batch(self) -> "ModelPricing":
+        """Return the rates that apply to batch endpoint requests."""
+        factor = 1.0 - self.batch_discount
+        return replace(
+            self,
+            input=self.input * factor,
+            cached_input=self.cached_input * factor,
+            output=self.output * factor,
+        )
+
+    def cost(
+        self, input_tokens: int, output_tokens: int, cached_tokens: int = 0
+    ) -> Tuple[float, float]:
+        """Return (input_cost, output_cost) in USD."""
+        input_cost = (input_tokens - cached_tokens) * self.input
+        input_cost += cached_tokens * self.cached_input
+        return input_cost, output_tokens * self.output
+
+
+def normalize_model_name(model: str) -> str:
+    """Canonical lookup key: "GPT_4_5", "gpt-4.5" -> "gpt-4-5"."""
+    model = model.lower().strip()
+    if model.startswith("models/"):
+        model = model[len("models/") :]
+    if model.startswith("ft:"):
+        # ft:gpt-4o-mini-2024-07-18:org::id is billed at fine-tuning rates
+        base = model[len("ft:") :].split(":", 1)[0]
+        model = re.sub(r"-\d{4}-\d{2}-\d{2}$", "", base) + "-fine-tuning"
+    return re.sub(r"[._]", "-", model)
+
+
+class PricingRegistry:
+    """
+    Flat registry of model prices loaded once from the pricing tables.
+
+    Dated snapshots and version tags ("gpt-4o-2024-08-06", \
+    "gpt-4.5-preview") resolve, with a warning, to the known model left \
+    after stripping their date and version suffixes. Other variants are \
+    never priced as a shorter name ("o1-mini" is not "o1"). Resolutions \
+    are memoized per model string, so cost computation on the request path \
+    is a dict lookup and a multiply.
+
+    Args:
+        overrides_path: Optional YAML or JSON file mapping \
+            provider -> model -> {input, cached_input, output, ...} in USD \
+            per 1M tokens. Defaults to the `LLM_PRICING_FILE` env variable.
+    """
+
+    def __init__(self, overrides_path: Optional[str] = None) -> None:
+        self._prices: Dict[Tuple[str, str], ModelPricing] = {}
+        self._resolved: Dict[Tuple[str, str], Optional[ModelPricing]] = {}
+        self._lock = threading.Lock()
+        self.logger = initiate_logger(self.__class__.__name__)
+
+        for provider, table in PROVIDER_TABLES.items():
+            for name, entry in vars(table).items():
+                if isinstance(entry, type) and hasattr(entry, "input"):
+                    self.register(provider, name, ModelPricing.from_table(entry))
+
+        if overrides_path is None:
+            # LLM_PRICING_FILE may be set in the project's .env
+            from utils.secrets_manager import load_secrets
+
+            load_secrets()
+            overrides_path = os.getenv("LLM_PRICING_FILE")
+        if overrides_path:
+            self.load_overrides(overrides_path)
+
+    def register(self, provider: str, model: str, pricing: ModelPricing) -> None:
+        with self._lock:
+            self._prices[(provider, normalize_model_name(model))] = pricing
+            self._resolved.clear()
+
+    def load_overrides(self, path: str) -> None:
+        with open(path, "r") as f:
+            overrides = json.load(f) if path.endswith(".json") else yaml.safe_load(f)
+
+        for provider, models in (overrides or {}).items():
+            for model, entry in models.items():
+                base = self.resolve(provider, model) or ModelPricing()
+                update = ModelPricing.from_table(entry)
+                changes = {
+                    field.name: getattr(update, field.name)
+                    for field in fields(ModelPricing)
+                    if field.name in entry
+                }
+                if "input" in entry and "cached_input" not in entry:
+                    changes["cached_input"] = update.cached_input
+                self.register(provider, model, replace(base, **changes))
+
+    def resolve(self, provider: str, model: str) -> Optional[ModelPricing]:
+        """Return the pricing of a model, or None when it is unknown."""
+        cache_key = (provider, model)
+        if cache_key in self._resolved:
+            return self._resolved[cache_key]
+
+        name = base = normalize_model_name(model)
+        pricing = self._prices.get((provider, name))
+        while pricing is None and VERSION_SUFFIX.search(base):
+            base = VERSION_SUFFIX.sub("", base)
+            pricing = self._prices.get((provider, base))
+        if pricing is not None and base != name:
+            # a snapshot may be priced differently from the model it pins
+            self.logger.warning(
+                "No pricing for %s model %s; using the rates of %s",
+                provider,
+                model,
+                base,
+            )
+        self._resolved[cache_key] = pricing
+        return pricing
+
+
+_registry: Optional[PricingRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_pricing_registry() -> PricingRegistry:
+    """Return the process-wide registry, building it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PricingRegistry()
+    return _registry
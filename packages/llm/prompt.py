@@ -1,4 +1,9 @@
-from llm.types import Prompt
+from dataclasses import replace
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Callable, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from llm.types import Message, Prompt, PromptInput
 
 """
 Create a Prompt instance by providing a main prompt message, and optionally, specific instructions
@@ -16,6 +21,148 @@ Example:
 
 """
 
+# (segment index, variable name, variables -> rendered text)
+Field = Tuple[int, str, Callable[[Mapping[str, Any]], str]]
+_formatter = Formatter()
+
+
+class PromptTemplate:
+    """
+    Prompt with `{name}` placeholders, parsed once and rendered many times.
+
+    The prompt text is split into static and dynamic segments up front, so \
+    a render only fills in the dynamic ones and joins them. Placeholders \
+    follow `str.format` (`{name}`, `{name!r}`, `{name:>8}`, `{{` for a \
+    literal brace). As with `Prompt.format`, the instructions are sent \
+    verbatim, and every rendered Prompt shares the same instructions string.
+
+    Args:
+        prompt: Prompt text with named placeholders.
+        instructions: System instructions.
+
+    Example:
+    >>>>    template = PromptTemplate("Student's answer: {answer}", "Be brief.")
+    >>>>    for prompt in template.render_many({"answer": a} for a in answers):
+    >>>>        ...
+    """
+
+    def __init__(self, prompt: str, instructions: Optional[str] = None) -> None:
+        self.prompt = prompt
+        self.instructions = instructions
+        self._segments, self._fields = _compile(prompt)
+        # names the template needs; extra variables are ignored
+        self.variables = frozenset(name for _, name, _ in self._fields)
+
+    @classmethod
+    def from_prompt(cls, prompt: Prompt) -> "PromptTemplate":
+        return cls(prompt.prompt, prompt.instructions)
+
+    def render(self, **variables: Any) -> Prompt:
+        """Return the Prompt with every placeholder filled in."""
+        return Prompt(self.__fill(variables), self.instructions)
+
+    def render_many(self, rows: Iterable[Mapping[str, Any]]) -> Iterator[Prompt]:
+        """Lazily render one Prompt per mapping of variables."""
+        instructions = self.instructions
+        for variables in rows:
+            yield Prompt(self.__fill(variables), instructions)
+
+    def __fill(self, variables: Mapping[str, Any]) -> str:
+        segments = self._segments.copy()
+        try:
+            for index, _, render in self._fields:
+                segments[index] = render(variables)
+        except KeyError:
+            missing = sorted(self.variables.difference(variables))
+            if missing:
+                raise KeyError(
+                    f"Missing prompt variables: {', '.join(missing)}"
+                ) from None
+            raise
+        return "".join(segments)
+
+
+def _compile(text: str) -> Tuple[List[str], List[Field]]:
+    segments: List[str] = []
+    fields: List[Field] = []
+    for literal, field, spec, conversion in _formatter.parse(text):
+        if literal:
+            segments.append(literal)
+        if field is None:
+            continue
+        if not field or field.isdigit():
+            raise ValueError(f"Prompt placeholders must be named: {text!r}")
+        if spec and "{" in spec:
+            raise ValueError(f"Nested placeholders are not supported: {field!r}")
+        name = field.split(".", 1)[0].split("[", 1)[0]
+        fields.append((len(segments), name, _field_renderer(field, spec, conversion)))
+        segments.append("")
+    return segments, fields
+
+
+def _field_renderer(
+    field: str, spec: str, conversion: Optional[str]
+) -> Callable[[Mapping[str, Any]], str]:
+    if field.isidentifier() and not spec and not conversion:
+        return lambda variables: format(variables[field])
+
+    def render(variables: Mapping[str, Any]) -> str:
+        value, _ = _formatter.get_field(field, (), variables)
+        if conversion:
+            value = _formatter.convert_field(value, conversion)
+        return format(value, spec)
+
+    return render
+
+
+@lru_cache(maxsize=256)
+def _cached_template(prompt: str, instructions: Optional[str]) -> PromptTemplate:
+    return PromptTemplate(prompt, instructions)
+
+
+def compile_prompt(prompt: Prompt) -> PromptTemplate:
+    """Return the template of `prompt`, parsed once per distinct text."""
+    return _cached_template(prompt.prompt, prompt.instructions)
+
+
+def render_prompt(
+    prompt: PromptInput, variables: Optional[Mapping[str, Any]] = None
+) -> Prompt:
+    """
+    Fill the `{name}` placeholders of a prompt or a list of chat messages.
+
+    Default prompts of the factory and per-call variables both render \
+    through here, with the same compiled templates as `Prompt.format`, so \
+    they share one set of rules and errors.
+    """
+    if isinstance(prompt, list):
+        prompt = Prompt.from_messages(prompt)
+    if not variables:
+        return prompt
+    return format_prompt(prompt, variables)
+
+
+def format_prompt(prompt: Prompt, variables: Mapping[str, Any]) -> Prompt:
+    """
+    Return a copy of `prompt` with its placeholders filled from `variables`.
+
+    The prompt text and the content of every conversation turn are each \
+    rendered through their compiled template; instructions are sent verbatim.
+    """
+    rendered = compile_prompt(prompt).render(**variables)
+    if not prompt.messages:
+        return rendered
+    messages: List[Message] = [
+        {
+            **message,
+            "content": _cached_template(message["content"], None)
+            .render(**variables)
+            .prompt,
+        }
+        for message in prompt.messages
+    ]
+    return replace(prompt, prompt=rendered.prompt, messages=messages)
+
 
 class ExamplePrompt:
     grammar_checker_prompt = Prompt(
@@ -28,9 +175,8 @@ class ExamplePrompt:
         """,
     )
 
-
-def ielts_tutor_prompt(student_answer: str) -> Prompt:
-    return Prompt(
+    # fill per call, e.g. `client.call_request(job, variables={"student_answer": a})`
+    ielts_tutor_template = Prompt(
         instructions="""
         You are an experienced IELTS tutor who specializes in grammar and sentence structure.
         Your task is to evaluate student answers for grammatical accuracy, sentence structure, punctuation, and clarity.
@@ -38,7 +184,13 @@ def ielts_tutor_prompt(student_answer: str) -> Prompt:
         Then, provide brief overall feedback and a personalized recommendation for improving their grammar skills.
         Be constructive, clear, and encouraging in your response.
         """,
-        prompt=f"""
+        prompt="""
         Student's answer: {student_answer}
         """,
     )
+
+
+def ielts_tutor_prompt(student_answer: str) -> Prompt:
+    return compile_prompt(ExamplePrompt.ielts_tutor_template).render(
+        student_answer=student_answer
+    )
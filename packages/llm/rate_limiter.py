@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from llm.pricing import get_pricing_registry
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate` units per second.
+
+    Callers reserve capacity up front; the bucket may go negative, and the \
+    deficit tells the caller how long to wait. Reservations are therefore \
+    served in arrival order instead of failing.
+    """
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units and return the seconds until they are available."""
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(
+                self.capacity, self._level + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._level -= amount
+            return max(0.0, -self._level / self.rate)
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units would be available, without taking them."""
+        with self._lock:
+            level = min(
+                self.capacity,
+                self._level + (time.monotonic() - self._updated) * self.rate,
+            )
+            return max(0.0, (amount - level) / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Give back `amount` units that were reserved but not used."""
+        with self._lock:
+            self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """
+    Request-per-minute and token-per-minute limiter for one model and API key.
+
+    A limit of None disables the matching bucket, so a limiter for a model \
+    without published limits is a no-op.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm, rpm / 60) if rpm else None
+        self._tokens = TokenBucket(tpm, tpm / 60) if tpm else None
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "requests": 0,
+            "throttled_requests": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request and `tokens` tokens fit; return the wait."""
+        wait = self.__reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """Asynchronous counterpart of `acquire`."""
+        wait = self.__reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def estimated_wait(self, tokens: int = 0) -> float:
+        """Seconds `acquire(tokens)` would block right now, reserving nothing."""
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.wait_time(1)
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.wait_time(tokens))
+        return wait
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct the token bucket once the real usage of a request is known."""
+        if self._tokens is None or used == reserved:
+            return
+        if used < reserved:
+            self._tokens.refund(reserved - used)
+        else:
+            self._tokens.reserve(used - reserved)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def __reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.reserve(1)
+        if self._tokens is not None and tokens:
+            wait = max(wait, self._tokens.reserve(tokens))
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            if wait > 0:
+                self._stats["throttled_requests"] += 1
+                self._stats["total_wait"] += wait
+                self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+        return wait
+
+
+# (provider, model, API key digest, rpm, tpm) -> shared limiter
+_limiters: Dict[Tuple[str, str, str, Optional[int], Optional[int]], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def published_rate_limits(
+    provider: str, model: str
+) -> Tuple[Optional[int], Optional[int]]:
+    """Look up (rpm, tpm) for a model in the pricing registry."""
+    pricing = get_pricing_registry().resolve(provider, model)
+    if pricing is None:
+        return None, None
+    return pricing.rate_limit_rpm, pricing.rate_limit_tpm
+
+
+def get_rate_limiter(
+    provider: str,
+    model: str,
+    api_key: Optional[str],
+    rpm: Optional[int] = None,
+    tpm: Optional[int] = None,
+) -> RateLimiter:
+    """
+    Return the process-wide limiter shared by every client of a model and key.
+
+    Clients that resolve to the same limits share one limiter. A client \
+    passing limits of its own gets a separate limiter enforcing them, \
+    instead of silently taking over the limits of whoever came first.
+
+    Args:
+        provider: Provider name, "openai" or "gemini".
+        model: Model name as passed to the provider.
+        api_key: API key the limits apply to; only a digest of it is kept.
+        rpm: Requests per minute, overriding the pricing table.
+        tpm: Tokens per minute, overriding the pricing table.
+
+    Returns:
+        RateLimiter instance.
+    """
+    key_digest = hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+    default_rpm, default_tpm = published_rate_limits(provider, model)
+    rpm, tpm = rpm or default_rpm, tpm or default_tpm
+    key = (provider, model, key_digest, rpm, tpm)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(rpm, tpm)
+        return _limiters[key]
@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+# Statuses worth another attempt: timeouts, conflicts, rate limits and
+# server-side failures. Everything else is the caller's error.
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# (attempt number, hedged, timeout in seconds) -> response
+Attempt = Callable[[int, bool, Optional[float]], T]
+AsyncAttempt = Callable[[int, bool, Optional[float]], Awaitable[T]]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How a client retries and hedges a request.
+
+    Args:
+        max_attempts: Attempts per call, the first one included.
+        deadline: Seconds the whole call may take across attempts and \
+            backoff; None for no limit.
+        attempt_timeout: Seconds a single attempt may take; None keeps the \
+            SDK's timeout.
+        initial_backoff: Seconds before the first retry.
+        max_backoff: Upper bound on the computed backoff.
+        multiplier: Growth factor of the backoff per attempt.
+        jitter: Fraction of each backoff that is randomized, 0 to 1.
+        hedge_percentile: Send a second, hedged attempt when the first has \
+            not answered within this percentile of recent latencies, e.g. 95.
+        hedge_after: Fixed hedging delay in seconds, used until enough \
+            latencies are observed for `hedge_percentile`.
+        hedge_min_samples: Latencies needed before the percentile is trusted.
+        latency_window: Number of recent latencies the percentile covers.
+        hedge_workers: Threads running hedged synchronous calls of one \
+            client; each call occupies up to two.
+    """
+
+    max_attempts: int = 3
+    deadline: Optional[float] = None
+    attempt_timeout: Optional[float] = None
+    initial_backoff: float = 0.5
+    max_backoff: float = 30.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    hedge_percentile: Optional[float] = None
+    hedge_after: Optional[float] = None
+    hedge_min_samples: int = 20
+    latency_window: int = 512
+    hedge_workers: int = 16
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the provider asked to wait via Retry-After, if it did."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyWindow:
+    """Rolling window of recent attempt latencies."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+
+_background: Set["asyncio.Task[Any]"] = set()
+
+
+class RetryRunner:
+    """
+    Runs attempts of one logical call under a `RetryPolicy`.
+
+    Attempts are provider calls that record themselves in the ledger, \
+    successful or not, so retries and hedges show up in the cost. The \
+    hedging delay counts from when the first attempt starts running, not \
+    from when it was queued. A losing attempt that has not started is \
+    cancelled; one already sent finishes in the background and is recorded \
+    like any other attempt.
+
+    Args:
+        policy: Retry and hedging settings.
+        retryable: Decides whether an exception is safe to retry.
+        logger: Logger for retry messages.
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy,
+        retryable: Callable[[BaseException], bool],
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.policy = policy
+        self.retryable = retryable
+        self.logger = logger
+        self.latencies = LatencyWindow(policy.latency_window)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def call(self, attempt: Attempt[T]) -> T:
+        deadline = self.__deadline()
+        number = 0
+        while True:
+            number += 1
+            timeout = self.__attempt_timeout(deadline)
+            try:
+                hedge_delay = self.__hedge_delay()
+                if hedge_delay is None:
+                    return self.__timed(attempt, number, False, timeout)
+                return self.__hedged(attempt, number, timeout, hedge_delay)
+            except Exception as exc:
+                delay = self.__next_delay(exc, number, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def acall(self, attempt: AsyncAttempt[T]) -> T:
+        deadline = self.__deadline()
+        number = 0
+        while True:
+            number += 1
+            timeout = self.__attempt_timeout(deadline)
+            try:
+                hedge_delay = self.__hedge_delay()
+                if hedge_delay is None:
+                    return await self.__atimed(attempt, number, False, timeout)
+                return await self.__ahedged(attempt, number, timeout, hedge_delay)
+            except Exception as exc:
+                delay = self.__next_delay(exc, number, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def backoff(self, number: int, exc: Optional[BaseException] = None) -> float:
+        """Seconds to wait after failed attempt `number` (1-based)."""
+        policy = self.policy
+        delay = min(
+            policy.max_backoff,
+            policy.initial_backoff * policy.multiplier ** (number - 1),
+        )
+        delay *= 1 - policy.jitter * random.random()
+        requested = retry_after(exc) if exc is not None else None
+        # the provider's Retry-After is a floor, never shortened by jitter
+        return delay if requested is None else max(delay, requested)
+
+    def __deadline(self) -> Optional[float]:
+        if self.policy.deadline is None:
+            return None
+        return time.monotonic() + self.policy.deadline
+
+    def __attempt_timeout(self, deadline: Optional[float]) -> Optional[float]:
+        timeout = self.policy.attempt_timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def __hedge_delay(self) -> Optional[float]:
+        if self.policy.hedge_percentile is not None:
+            delay = self.latencies.percentile(
+                self.policy.hedge_percentile, self.policy.hedge_min_samples
+            )
+            if delay is not None:
+                return delay
+        return self.policy.hedge_after
+
+    def __next_delay(
+        self, exc: BaseException, number: int, deadline: Optional[float]
+    ) -> Optional[float]:
+        if number >= self.policy.max_attempts or not self.retryable(exc):
+            return None
+        delay = self.backoff(number, exc)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        if self.logger is not None:
+            self.logger.warning(
+                "Attempt %d failed with %s; retrying in %.2fs",
+                number,
+                type(exc).__name__,
+                delay,
+            )
+        return delay
+
+    def __timed(
+        self, attempt: Attempt[T], number: int, hedged: bool, timeout: Optional[float]
+    ) -> T:
+        start = time.monotonic()
+        result = attempt(number, hedged, timeout)
+        self.latencies.add(time.monotonic() - start)
+        return result
+
+    async def __atimed(
+        self,
+        attempt: AsyncAttempt[T],
+        number: int,
+        hedged: bool,
+        timeout: Optional[float],
+    ) -> T:
+        start = time.monotonic()
+        result = await attempt(number, hedged, timeout)
+        self.latencies.add(time.monotonic() - start)
+        return result
+
+    def __hedged(
+        self,
+        attempt: Attempt[T],
+        number: int,
+        timeout: Optional[float],
+        hedge_delay: float,
+    ) -> T:
+        pool = self.__hedge_pool()
+        started = threading.Event()
+
+        def run_first() -> T:
+            started.set()
+            return self.__timed(attempt, number, False, timeout)
+
+        first = pool.submit(run_first)
+        # time spent queued for a worker is not latency of the attempt
+        started.wait()
+        done, _ = wait([first], timeout=hedge_delay)
+        if done:
+            return first.result()
+        if timeout is not None:
+            timeout = max(0.0, timeout - hedge_delay)
+        second = pool.submit(self.__timed, attempt, number, True, timeout)
+        return _first_success([first, second])
+
+    def __hedge_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.policy.hedge_workers,
+                    thread_name_prefix="llm-hedge",
+                )
+            return self._pool
+
+    async def __ahedged(
+        self,
+        attempt: AsyncAttempt[T],
+        number: int,
+        timeout: Optional[float],
+        hedge_delay: float,
+    ) -> T:
+        started = asyncio.Event()
+
+        async def run_first() -> T:
+            started.set()
+            return await self.__atimed(attempt, number, False, timeout)
+
+        first = asyncio.ensure_future(run_first())
+        await started.wait()
+        done, _ = await asyncio.wait({first}, timeout=hedge_delay)
+        if done:
+            return first.result()
+        if timeout is not None:
+            timeout = max(0.0, timeout - hedge_delay)
+        second = asyncio.ensure_future(self.__atimed(attempt, number, True, timeout))
+        pending = {first, second}
+        errors: List[BaseException] = []
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    for loser in pending:
+                        _keep_in_background(loser)
+                    return task.result()
+                errors.append(task.exception())
+        raise errors[0]
+
+
+def _first_success(futures: List["Future[T]"]) -> T:
+    pending = set(futures)
+    errors: List[BaseException] = []
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    # only succeeds while it is still queued for a worker
+                    loser.cancel()
+                return future.result()
+            errors.append(future.exception())
+    raise errors[0]
+
+
+def _keep_in_background(task: "asyncio.Task[Any]") -> None:
+    # the event loop only keeps weak references to tasks
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
@@ -0,0 +1,339 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+from utils.logging import initiate_logger
+
+from llm.base import LLMClientBase
+from llm.ledger import CostLedger
+from llm.retry import RETRYABLE_STATUS
+from llm.types import JobType, Prompt, PromptInput
+
+
+@dataclass
+class Backend:
+    """Live health and latency estimate of one client behind a router."""
+
+    name: str
+    client: LLMClientBase
+    latency: Optional[float] = None  # EWMA of successful call durations
+    error_rate: float = 0.0  # EWMA of failures, 0 to 1
+    calls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class RouterClient(LLMClientBase):
+    """
+    Client spreading requests over several backend clients.
+
+    Each request goes to the backend with the best score, which weighs the \
+    expected latency (an EWMA of recent calls, plus the wait its rate \
+    limiter would impose, inflated by its error rate) against the price of \
+    the request at the backend's per-token rates. Both terms are relative \
+    to the best backend, so `cost_weight` alone sets the trade-off: 0 \
+    routes purely on latency, 1 sends everything to the cheapest model \
+    that is up.
+
+    When a backend fails with a provider-side error (connection errors, \
+    408/409/429 and 5xx), the request fails over to the next backend. A \
+    backend failing `eject_after` times in a row, or whose error rate \
+    exceeds `eject_error_rate`, is taken out of rotation for \
+    `eject_seconds`, doubling on each consecutive ejection. Other errors, \
+    such as invalid requests, are raised without failing over.
+
+    All backends record into the router's ledger, so `get_cost_info` \
+    covers every call regardless of where it was sent.
+
+    Args:
+        backends: Clients to route between, e.g. OpenAI and Gemini clients.
+        prompt: Default prompt; defaults to that of the first backend.
+        ledger: Ledger shared by all backends.
+        cost_weight: Weight of price against latency, 0 to 1.
+        smoothing: Weight of the newest sample in the EWMAs.
+        eject_after: Consecutive failures that eject a backend.
+        eject_error_rate: Error rate that ejects a backend once it has \
+            served `min_samples` calls.
+        min_samples: Calls before the error rate is trusted.
+        eject_seconds: First ejection period, in seconds.
+        max_eject_seconds: Upper bound on the ejection period.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[LLMClientBase],
+        prompt: Optional[Prompt] = None,
+        ledger: Optional[CostLedger] = None,
+        cost_weight: float = 0.5,
+        smoothing: float = 0.2,
+        eject_after: int = 3,
+        eject_error_rate: float = 0.5,
+        min_samples: int = 10,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 600.0,
+    ):
+        if not backends:
+            raise ValueError("RouterClient needs at least one backend")
+        if not 0.0 <= cost_weight <= 1.0:
+            raise ValueError("cost_weight must be between 0 and 1")
+        self.logger = initiate_logger(self.__class__.__name__)
+        self.backends = [
+            Backend(f"{type(client).__name__}:{client.engine.params.model}", client)
+            for client in backends
+        ]
+        # metadata reports the parameters of the primary backend
+        self.engine = backends[0].engine
+        self.prompt = prompt if prompt is not None else backends[0].prompt
+        self.job_info = ledger if ledger is not None else CostLedger()
+        for client in backends:
+            client.job_info = self.job_info
+        self.cost_weight = cost_weight
+        self.smoothing = smoothing
+        self.eject_after = eject_after
+        self.eject_error_rate = eject_error_rate
+        self.min_samples = min_samples
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._lock = threading.Lock()
+
+    def call_request(
+        self,
+        job_name: JobType,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        prompt = self.resolve_prompt(prompt, variables)
+        error: Optional[BaseException] = None
+        for backend in self.rank(prompt):
+            start = time.monotonic()
+            try:
+                response = backend.client.call_request(job_name, prompt=prompt)
+            except Exception as exc:
+                self.__record_failure(backend, exc)
+                error = exc
+                continue
+            self.__record_success(backend, time.monotonic() - start)
+            return response
+        raise error
+
+    async def acall_request(
+        self,
+        job_name: JobType,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        prompt = self.resolve_prompt(prompt, variables)
+        error: Optional[BaseException] = None
+        for backend in self.rank(prompt):
+            start = time.monotonic()
+            try:
+                response = await backend.client.acall_request(job_name, prompt=prompt)
+            except Exception as exc:
+                self.__record_failure(backend, exc)
+                error = exc
+                continue
+            self.__record_success(backend, time.monotonic() - start)
+            return response
+        raise error
+
+    def stream_request(
+        self,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[str]:
+        prompt = self.resolve_prompt(prompt, variables)
+        error: Optional[BaseException] = None
+        for backend in self.rank(prompt):
+            stream = backend.client.stream_request(prompt=prompt)
+            # a stream can only fail over until its first chunk is handed out
+            try:
+                first = next(stream)
+            except StopIteration:
+                self.__record_success(backend)
+                return
+            except Exception as exc:
+                self.__record_failure(backend, exc)
+                error = exc
+                continue
+            yield first
+            try:
+                yield from stream
+            except Exception as exc:
+                self.__record_failure(backend, exc)
+                raise
+            # stream durations depend on the reader, so they are not latencies
+            self.__record_success(backend)
+            return
+        raise error
+
+    async def astream_request(
+        self,
+        prompt: Optional[PromptInput] = None,
+        variables: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        prompt = self.resolve_prompt(prompt, variables)
+        error: Optional[BaseException] = None
+        for backend in self.rank(prompt):
+            stream = backend.client.astream_request(prompt=prompt)
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                self.__record_success(backend)
+                return
+            except Exception as exc:
+                self.__record_failure(backend, exc)
+                error = exc
+                continue
+            yield first
+            try:
+                async for chunk in stream:
+                    yield chunk
+            except Exception as exc:
+                self.__record_failure(backend, exc)
+                raise
+            self.__record_success(backend)
+            return
+        raise error
+
+    def rank(self, prompt: Prompt) -> List[Backend]:
+        """
+        Order the backends in rotation from best to worst for `prompt`.
+
+        Backends that have never answered rank as the fastest, so each one \
+        gets tried. When every backend is \
+        ejected, all of them are returned, soonest to return first, rather \
+        than failing without trying.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends if b.available(now)]
+            if not candidates:
+                return sorted(self.backends, key=lambda b: b.ejected_until)
+            # a backend without samples scores as instantaneous until it answers
+            estimates = {b.name: (b.latency or 0.0, b.error_rate) for b in candidates}
+
+        latencies, costs = {}, {}
+        for backend in candidates:
+            latency, error_rate = estimates[backend.name]
+            latency += self.__rate_limit_wait(backend.client, prompt)
+            # a failing backend costs a retry elsewhere on top of its latency
+            latencies[backend.name] = latency / max(0.05, 1.0 - error_rate)
+            costs[backend.name] = self.__request_cost(backend.client, prompt)
+
+        best_latency = max(min(latencies.values()), 1e-3)
+        best_cost = min(costs.values())
+
+        def score(backend: Backend) -> float:
+            latency = latencies[backend.name] / best_latency
+            cost = costs[backend.name] / best_cost if best_cost else 1.0
+            return (1.0 - self.cost_weight) * latency + self.cost_weight * cost
+
+        return sorted(candidates, key=score)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the live estimate and health of every backend."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                b.name: {
+                    "latency": b.latency,
+                    "error_rate": b.error_rate,
+                    "calls": b.calls,
+                    "failures": b.failures,
+                    "ejections": b.ejections,
+                    "ejected_for": max(0.0, b.ejected_until - now),
+                }
+                for b in self.backends
+            }
+
+    def __record_success(
+        self, backend: Backend, latency: Optional[float] = None
+    ) -> None:
+        with self._lock:
+            backend.calls += 1
+            backend.consecutive_failures = 0
+            backend.ejections = 0
+            backend.error_rate *= 1.0 - self.smoothing
+            if latency is not None:
+                backend.latency = (
+                    latency
+                    if backend.latency is None
+                    else (1.0 - self.smoothing) * backend.latency
+                    + self.smoothing * latency
+                )
+
+    def __record_failure(self, backend: Backend, exc: BaseException) -> None:
+        if not _is_backend_failure(exc):
+            raise exc
+        with self._lock:
+            backend.calls += 1
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.error_rate += self.smoothing * (1.0 - backend.error_rate)
+            eject = backend.consecutive_failures >= self.eject_after or (
+                backend.calls >= self.min_samples
+                and backend.error_rate >= self.eject_error_rate
+            )
+            if eject:
+                backend.ejections += 1
+                period = min(
+                    self.max_eject_seconds,
+                    self.eject_seconds * 2 ** (backend.ejections - 1),
+                )
+                backend.ejected_until = time.monotonic() + period
+                # back in rotation on probation: one more failure ejects again
+                backend.consecutive_failures = self.eject_after - 1
+                backend.error_rate = self.eject_error_rate / 2
+        if eject:
+            self.logger.warning(
+                "Backend %s ejected for %.0fs after %s: %s",
+                backend.name,
+                period,
+                type(exc).__name__,
+                exc,
+            )
+        else:
+            self.logger.warning(
+                "Backend %s failed with %s; failing over",
+                backend.name,
+                type(exc).__name__,
+            )
+
+    def __rate_limit_wait(self, client: LLMClientBase, prompt: Prompt) -> float:
+        limiter = getattr(client, "rate_limiter", None)
+        if limiter is None:
+            return 0.0
+        return limiter.estimated_wait(client.reserved_tokens(prompt))
+
+    def __request_cost(self, client: LLMClientBase, prompt: Prompt) -> float:
+        # the same output budget everywhere; input tokens follow each
+        # backend's own tokenizer
+        input_cost, output_cost = client.pricing.cost(
+            client.tokens.count_prompt(prompt), self.engine.params.max_tokens
+        )
+        return input_cost + output_cost
+
+
+def _is_backend_failure(exc: BaseException) -> bool:
+    # OpenAI errors carry `status_code`, google-genai errors `code`
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(exc, "code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    # no HTTP status: connection failures and timeouts, but not caller errors
+    return not isinstance(exc, (ValueError, TypeError, NotImplementedError))
@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from llm.cache import cache_key
+from llm.embeddings import EMBEDDING_DTYPE
+from llm.types import LLMParams, Prompt
+
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+
+class SemanticQuery(NamedTuple):
+    """Result of `SemanticCache.query`; pass it back to `add` on a miss."""
+
+    vector: np.ndarray
+    scope: int
+    payload: Optional[str]
+    similarity: float
+
+
+class SemanticCache:
+    """
+    Embedding-similarity cache of serialized responses.
+
+    Near-duplicate prompts (say, two student answers that differ by a typo) \
+    miss an exact-match cache but deserve the same response. Prompts are \
+    embedded and compared by cosine similarity against a matrix of past \
+    prompt embeddings in one vectorized NumPy product; the stored response \
+    of the closest prompt is served when its similarity reaches \
+    `threshold`. Only prompts with the same provider, instructions and \
+    output parameters are compared. The index holds at most `capacity` \
+    prompts and replaces the least recently used one when full.
+
+    Args:
+        embedder: Function embedding a list of texts into a matrix, e.g. the \
+            `embed` method of a client configured with an embedding model.
+        threshold: Minimum cosine similarity served as a hit.
+        capacity: Maximum number of prompts in the index.
+        path: `.npz` file the index is loaded from and saved to.
+        force: Cache responses even when temperature > 0.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        threshold: float = 0.95,
+        capacity: int = 10_000,
+        path: Optional[str] = None,
+        force: bool = False,
+    ) -> None:
+        self.embedder = embedder
+        self.threshold = threshold
+        self.capacity = capacity
+        self.path = path
+        self.force = force
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes = np.zeros(capacity, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._payloads: List[Optional[str]] = [None] * capacity
+        self._size = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._embed_latency: Deque[float] = deque(maxlen=1024)
+        self._search_latency: Deque[float] = deque(maxlen=1024)
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def is_cacheable(self, params: LLMParams) -> bool:
+        """Sampling at temperature > 0 is only cached when `force` is set."""
+        return self.force or not params.temperature
+
+    def query(self, provider: str, prompt: Prompt, params: LLMParams) -> SemanticQuery:
+        """Embed the prompt and look up the most similar cached prompt."""
+        start = time.perf_counter()
+        vector = np.asarray(self.embedder([_prompt_text(prompt)])[0], EMBEDDING_DTYPE)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        searched = time.perf_counter()
+        scope = _scope(provider, prompt, params)
+
+        payload, similarity = None, 0.0
+        with self._lock:
+            if self._size:
+                similarities = self._vectors[: self._size] @ vector
+                similarities[self._scopes[: self._size] != scope] = -1.0
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+                if similarity >= self.threshold:
+                    payload = self._payloads[best]
+                    self._clock += 1
+                    self._last_used[best] = self._clock
+            self._stats["hits" if payload is not None else "misses"] += 1
+            self._embed_latency.append(searched - start)
+            self._search_latency.append(time.perf_counter() - searched)
+        return SemanticQuery(vector, scope, payload, similarity)
+
+    def add(self, query: SemanticQuery, payload: str) -> None:
+        """Store the response of a prompt that missed the cache."""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros(
+                    (self.capacity, len(query.vector)), dtype=EMBEDDING_DTYPE
+                )
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._stats["evictions"] += 1
+            self._clock += 1
+            self._vectors[slot] = query.vector
+            self._scopes[slot] = query.scope
+            self._last_used[slot] = self._clock
+            self._payloads[slot] = payload
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            stats["entries"] = self._size
+            embed_latency = np.array(self._embed_latency)
+            search_latency = np.array(self._search_latency)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        for name, latency in (("embed", embed_latency), ("search", search_latency)):
+            stats[f"{name}_ms_mean"] = float(latency.mean() * 1000) if lookups else 0.0
+            stats[f"{name}_ms_p95"] = (
+                float(np.percentile(latency, 95) * 1000) if lookups else 0.0
+            )
+        return stats
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the index to `path` (or the configured path) atomically."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to save the semantic cache to")
+        with self._lock:
+            size = self._size
+            vectors = (
+                self._vectors[:size]
+                if self._vectors is not None
+                else np.zeros((0, 0), dtype=EMBEDDING_DTYPE)
+            )
+            arrays = {
+                "vectors": vectors,
+                "scopes": self._scopes[:size],
+                "last_used": self._last_used[:size],
+                # plain JSON keeps the file loadable without pickle
+                "payloads": np.array(json.dumps(self._payloads[:size])),
+            }
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(f, **arrays)
+        os.replace(temp_path, path)
+
+    def load(self, path: str) -> None:
+        """Replace the index with the one saved at `path`."""
+        with np.load(path, allow_pickle=False) as saved:
+            vectors = saved["vectors"]
+            scopes = saved["scopes"]
+            last_used = saved["last_used"]
+            payloads = json.loads(str(saved["payloads"]))
+        # keep the most recently used entries if the capacity shrank
+        keep = np.argsort(last_used)[-self.capacity :]
+        with self._lock:
+            self._size = len(keep)
+            self._vectors = None
+            if self._size:
+                self._vectors = np.zeros(
+                    (self.capacity, vectors.shape[1]), dtype=EMBEDDING_DTYPE
+                )
+                self._vectors[: self._size] = vectors[keep]
+            self._scopes[: self._size] = scopes[keep]
+            self._last_used[: self._size] = last_used[keep]
+            self._payloads = [payloads[i] for i in keep] + [None] * (
+                self.capacity - self._size
+            )
+            self._clock = int(last_used.max()) if self._size else 0
+
+    def close(self) -> None:
+        if self.path:
+            self.save()
+
+
+def _prompt_text(prompt: Prompt) -> str:
+    # instructions are part of the scope, so only the varying part is embedded
+    if prompt.messages:
+        return "\n".join(message["content"] for message in prompt.messages)
+    return prompt.prompt
+
+
+def _scope(provider: str, prompt: Prompt, params: LLMParams) -> int:
+    key = cache_key(
+        provider, Prompt(prompt="", instructions=prompt.instructions), params
+    )
+    return int.from_bytes(bytes.fromhex(key[:16]), "big", signed=True)
@@ -0,0 +1,39 @@
+import time
+from typing import Optional
+
+
+class StreamTimer:
+    """Track time-to-first-token and generation speed of a streamed call."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def mark_token(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    def finish(self) -> None:
+        self.finished = time.perf_counter()
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Seconds from sending the request to receiving the first chunk."""
+        if self.first_token is None:
+            return None
+        return self.first_token - self.started
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        """Seconds from sending the request to the end of the stream."""
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def tokens_per_second(self, output_tokens: int) -> Optional[float]:
+        """Output tokens per second measured after the first chunk arrived."""
+        if self.first_token is None or self.finished is None:
+            return None
+        elapsed = self.finished - self.first_token
+        return output_tokens / elapsed if elapsed > 0 else None
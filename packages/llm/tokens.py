@@ -0,0 +1,216 @@
+import threading
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from llm.types import Prompt
+
+CHARS_PER_TOKEN = 4
+# OpenAI chat formatting: tokens wrapping each message, and priming the reply
+OPENAI_MESSAGE_TOKENS = 3
+OPENAI_REPLY_TOKENS = 3
+
+
+class ContextWindowExceeded(ValueError):
+    """Raised before sending a request that cannot fit the model's context window."""
+
+    def __init__(self, input_tokens: int, max_tokens: int, context_window: int):
+        super().__init__(
+            f"Request needs {input_tokens} input + {max_tokens} output tokens, "
+            f"over the {context_window}-token context window"
+        )
+        self.input_tokens = input_tokens
+        self.max_tokens = max_tokens
+        self.context_window = context_window
+
+
+@dataclass(frozen=True)
+class RequestEstimate:
+    """Tokens and cost of a chat request, estimated before it is sent."""
+
+    input_tokens: int
+    max_output_tokens: int
+    # USD if the model writes all `max_output_tokens`
+    max_cost: float
+    context_window: Optional[int] = None
+
+    @property
+    def fits(self) -> bool:
+        if self.context_window is None:
+            return True
+        return self.input_tokens + self.max_output_tokens <= self.context_window
+
+
+class TokenCounter:
+    """
+    Local token counts for one model, without a round trip to the provider.
+
+    Counts of individual strings are memoized, so instructions repeated on \
+    every request are only tokenized once.
+
+    Args:
+        count_text: Tokens in a string; defaults to ~4 characters per token.
+        truncate_text: Cuts a string to at most the given number of tokens; \
+            defaults to shortening it in proportion to its count.
+        exact: Whether `count_text` is the model's own tokenizer.
+        message_tokens: Formatting tokens added around each message.
+        reply_tokens: Formatting tokens added once per request.
+        cache_size: Distinct strings whose counts are memoized.
+    """
+
+    def __init__(
+        self,
+        count_text: Optional[Callable[[str], int]] = None,
+        truncate_text: Optional[Callable[[str, int], str]] = None,
+        exact: bool = False,
+        message_tokens: int = 0,
+        reply_tokens: int = 0,
+        cache_size: int = 1024,
+    ) -> None:
+        self.exact = exact
+        self.message_tokens = message_tokens
+        self.reply_tokens = reply_tokens
+        self.count = lru_cache(maxsize=cache_size)(count_text or _approximate_count)
+        self._truncate_text = truncate_text
+
+    def count_prompt(self, prompt: Prompt) -> int:
+        """Input tokens of a request sending `prompt`."""
+        if prompt.messages:
+            parts = [message["content"] for message in prompt.messages]
+        else:
+            parts = [prompt.prompt]
+        if prompt.instructions:
+            parts.append(prompt.instructions)
+        return (
+            sum(self.count(part) for part in parts)
+            + self.message_tokens * len(parts)
+            + self.reply_tokens
+        )
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """Return the longest prefix of `text` within `tokens` tokens."""
+        if tokens <= 0:
+            return ""
+        if self.count(text) <= tokens:
+            return text
+        if self._truncate_text is not None:
+            return self._truncate_text(text, tokens)
+        while text and self.count(text) > tokens:
+            text = text[: int(len(text) * tokens / self.count(text) * 0.95)]
+        return text
+
+    def truncate_prompt(self, prompt: Prompt, tokens: int) -> Optional[Prompt]:
+        """
+        Shorten `prompt` to at most `tokens` input tokens.
+
+        Conversations lose their oldest turns first; then the text of the \
+        last turn, or of a single prompt, is cut at the end. Instructions \
+        are never cut.
+
+        Returns:
+            The shortened prompt, or None when even the instructions alone \
+            do not fit.
+        """
+        if prompt.messages:
+            messages = list(prompt.messages)
+            while (
+                len(messages) > 1
+                and self.count_prompt(replace(prompt, messages=messages)) > tokens
+            ):
+                messages.pop(0)
+            prompt = replace(prompt, messages=messages)
+        overflow = self.count_prompt(prompt) - tokens
+        if overflow <= 0:
+            return prompt
+        text = prompt.messages[-1]["content"] if prompt.messages else prompt.prompt
+        text = self.truncate(text, self.count(text) - overflow)
+        if not text:
+            return None
+        if prompt.messages:
+            last = {**prompt.messages[-1], "content": text}
+            return replace(prompt, prompt=text, messages=prompt.messages[:-1] + [last])
+        return replace(prompt, prompt=text)
+
+
+def _approximate_count(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+# used where no provider tokenizer applies
+APPROXIMATE = TokenCounter()
+
+
+def _tiktoken_encoding(model: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # models newer than the installed tiktoken
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # encodings are downloaded on first use, which fails offline
+        return None
+
+
+def _openai_counter(model: str) -> TokenCounter:
+    encoding = _tiktoken_encoding(model)
+    if encoding is None:
+        return TokenCounter(
+            message_tokens=OPENAI_MESSAGE_TOKENS, reply_tokens=OPENAI_REPLY_TOKENS
+        )
+    return TokenCounter(
+        lambda text: len(encoding.encode_ordinary(text)),
+        lambda text, tokens: encoding.decode(encoding.encode_ordinary(text)[:tokens]),
+        exact=True,
+        message_tokens=OPENAI_MESSAGE_TOKENS,
+        reply_tokens=OPENAI_REPLY_TOKENS,
+    )
+
+
+def _gemini_counter(model: str) -> TokenCounter:
+    try:
+        from google.genai.local_tokenizer import LocalTokenizer
+
+        tokenizer = LocalTokenizer(model_name=model)
+    except Exception:
+        # needs sentencepiece, a supported model and the tokenizer download
+        return APPROXIMATE
+    return TokenCounter(
+        lambda text: tokenizer.count_tokens(text).total_tokens or 0, exact=True
+    )
+
+
+COUNTER_FACTORIES: Dict[str, Callable[[str], TokenCounter]] = {
+    "openai": _openai_counter,
+    "gemini": _gemini_counter,
+}
+_counters: Dict[Tuple[str, str], TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(provider: str, model: str) -> TokenCounter:
+    """
+    Return the process-wide token counter of a model.
+
+    The provider's tokenizer is used when its package is installed \
+    (tiktoken for OpenAI, google-genai with sentencepiece for Gemini), \
+    and ~4 characters per token otherwise.
+    """
+    key = (provider, model)
+    counter = _counters.get(key)
+    if counter is not None:
+        return counter
+    # built outside the lock: tokenizers may download their vocabulary, and
+    # one slow download must not hold up clients of other models
+    factory = COUNTER_FACTORIES.get(provider)
+    try:
+        counter = factory(model) if factory else APPROXIMATE
+    except Exception:
+        counter = APPROXIMATE
+    with _counters_lock:
+        # a concurrent first call may have finished first; keep its counter
+        return _counters.setdefault(key, counter)
@@ -0,0 +1,171 @@
+import asyncio
+import atexit
+import hashlib
+import inspect
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class TransportConfig:
+    """
+    Connection-pool settings shared by every client of a provider transport.
+
+    Args:
+        max_connections: Upper bound on open connections per transport.
+        max_keepalive_connections: Idle connections kept for reuse.
+        keepalive_expiry: Seconds an idle connection stays in the pool.
+        http2: Negotiate HTTP/2 where the SDK's HTTP stack supports it \
+            (requires the `h2` package).
+        timeout: Per-request timeout in seconds.
+        cassette: Cassette file to record traffic to or replay it from, \
+            see `llm.cassette`; None talks to the provider as usual.
+        cassette_mode: "record", "replay" (at full speed, with no network \
+            and no client-side rate limiting) or "replay_timed" (with the \
+            recorded latencies).
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    timeout: float = 60.0
+    cassette: Optional[str] = None
+    cassette_mode: str = "replay"
+
+    @property
+    def offline(self) -> bool:
+        """Whether responses come from a cassette instead of the network."""
+        return self.cassette is not None and self.cassette_mode != "record"
+
+
+TransportKey = Tuple[str, str, Optional[str], TransportConfig]
+
+
+class TransportRegistry:
+    """
+    Process-wide cache of provider SDK clients and their connection pools.
+
+    LLM clients are cheap and often built per prompt, while SDK clients own \
+    the HTTP connection pool. Sharing one SDK client per (provider, API key, \
+    base URL, config) keeps connections and TLS sessions warm no matter how \
+    callers create LLM clients. Async pools are bound to the event loop that \
+    opened their connections, so async SDK clients are shared per loop \
+    instead. The registry is emptied in forked children so pre-fork workers \
+    never share sockets with their parent.
+    """
+
+    def __init__(self) -> None:
+        self._transports: Dict[TransportKey, Any] = {}
+        # loop -> transports; entries go away with their loop
+        self._async_transports: (
+            "weakref.WeakKeyDictionary[Any, Dict[TransportKey, Any]]"
+        ) = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        provider: str,
+        api_key: Optional[str],
+        base_url: Optional[str],
+        config: TransportConfig,
+        build: Callable[[], T],
+    ) -> T:
+        """Return the shared transport for the key, building it on first use."""
+        return self.__get(
+            self._transports, _transport_key(provider, api_key, base_url, config), build
+        )
+
+    def get_async(
+        self,
+        provider: str,
+        api_key: Optional[str],
+        base_url: Optional[str],
+        config: TransportConfig,
+        build: Callable[[], T],
+    ) -> T:
+        """
+        Return the async transport for the key on the running event loop.
+
+        A client used from several `asyncio.run` calls, or from threads \
+        running their own loops, gets one pool per loop rather than a pool \
+        whose connections belong to a closed loop. Must be called from a \
+        coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        transports = self._async_transports.get(loop)
+        if transports is None:
+            with self._lock:
+                transports = self._async_transports.setdefault(loop, {})
+        return self.__get(
+            transports, _transport_key(provider, api_key, base_url, config), build
+        )
+
+    def __get(
+        self,
+        transports: Dict[TransportKey, Any],
+        key: TransportKey,
+        build: Callable[[], T],
+    ) -> T:
+        transport = transports.get(key)
+        if transport is None:
+            with self._lock:
+                transport = transports.get(key)
+                if transport is None:
+                    transport = transports[key] = build()
+        return transport  # type: ignore[no-any-return]
+
+    def close_all(self) -> None:
+        """Close every pooled transport; async pools are closed when possible."""
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+            # pools of other loops cannot be closed from here; drop them
+            self._async_transports.clear()
+        for transport in transports:
+            for client in transport if isinstance(transport, tuple) else (transport,):
+                _close(client)
+
+    def forget(self) -> None:
+        """Drop references without closing; used in freshly forked children."""
+        self._lock = threading.Lock()
+        self._transports = {}
+        self._async_transports = weakref.WeakKeyDictionary()
+
+
+def _transport_key(
+    provider: str,
+    api_key: Optional[str],
+    base_url: Optional[str],
+    config: TransportConfig,
+) -> TransportKey:
+    key_digest = hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+    return (provider, key_digest, base_url, config)
+
+
+def _close(client: Any) -> None:
+    close = getattr(client, "close", None)
+    if close is None:
+        return
+    result = close()
+    if inspect.isawaitable(result):
+        try:
+            asyncio.run(result)
+        except RuntimeError:
+            # an event loop is already running or gone; drop the pool instead
+            result.close()
+
+
+_registry = TransportRegistry()
+atexit.register(_registry.close_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_registry.forget)
+
+
+def get_transport_registry() -> TransportRegistry:
+    return _registry
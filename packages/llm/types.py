@@ -1,11 +1,22 @@
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional, TypedDict, Union
+from typing import (
+    Any,
+    Dict,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypedDict,
+    Union,
+)
 
 
 class JobType(Enum):
     CHAT_COMPLETION = "chat_completion"
     TEXT_EMBEDDING = "text_embedding"
+    BATCH = "batch"  # offline requests through a provider batch endpoint
 
 
 class JobInfo(TypedDict):
@@ -16,17 +27,98 @@ class JobInfo(TypedDict):
     input_tokens: int
     output_tokens: int
     total_tokens: int
+    # input tokens read from the provider's prompt cache, billed at cached_input
+    cached_tokens: int
+    rate_limit_wait: float  # seconds spent queued by the client-side limiter
+    cache_hit: bool  # served from the local response cache at zero cost
+    coalesced: bool  # shared the response of an identical request in flight
+    ttft: Optional[float]  # seconds to first streamed chunk, streaming only
+    tokens_per_second: Optional[float]  # output speed after the first chunk
+    attempt: int  # 1-based attempt number of the call under a retry policy
+    hedged: bool  # sent as a hedge while an earlier attempt was still running
+    failed: bool  # the attempt raised; the id holds the exception type
+
+
+class ResponseUsage(NamedTuple):
+    """Id and token usage read from a provider response."""
+
+    id: str
+    input_tokens: int
+    output_tokens: int
+    total_tokens: int
+    # input tokens read from the provider's prompt cache
+    cached_tokens: int = 0
 
 
 class JobInfoType(TypedDict):
     individual: List[JobInfo]
-    aggregated: Dict[str, Union[str, int, float]]
+    aggregated: Dict[str, Any]
+
+
+class Message(TypedDict):
+    role: Literal["system", "user", "assistant"]
+    content: str
 
 
 @dataclass
 class Prompt:
     prompt: str
     instructions: Optional[str] = None
+    # conversation turns sent instead of `prompt` when set
+    messages: Optional[List[Message]] = None
+
+    @classmethod
+    def from_messages(cls, messages: Sequence[Message]) -> "Prompt":
+        """Split chat messages into system instructions and conversation turns."""
+        system = [m["content"] for m in messages if m["role"] == "system"]
+        turns = [m for m in messages if m["role"] != "system"]
+        return cls(
+            prompt=turns[-1]["content"] if turns else "",
+            instructions="\n\n".join(system) if system else None,
+            messages=turns,
+        )
+
+    def format(self, **variables: Any) -> "Prompt":
+        """Return a copy with `{name}` placeholders filled in, turns included."""
+        from llm.prompt import format_prompt  # llm.prompt imports this module
+
+        return format_prompt(self, variables)
+
+    @property
+    def text(self) -> str:
+        """All text sent to the model, used for hashing and token estimates."""
+        if self.messages:
+            body = "\n".join(m["content"] for m in self.messages)
+        else:
+            body = self.prompt
+        return f"{self.instructions}\n{body}" if self.instructions else body
+
+
+# What callers may pass as the prompt of a single request
+PromptInput = Union[Prompt, List[Message]]
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a single prompt within `LLMClientBase.call_batch`."""
+
+    index: int
+    prompt: Prompt
+    status: Literal["success", "error"]
+    response: Any = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class BatchJob:
+    """Handle of a job submitted through `LLMClientBase.submit_batch_job`."""
+
+    id: str
+    status: str  # provider status, e.g. "in_progress" or "JOB_STATE_RUNNING"
+    size: int  # number of requests in the job
+    done: bool = False
+    output_file: Optional[str] = None
+    error_file: Optional[str] = None
 
 
 @dataclass
@@ -44,6 +136,9 @@ class LLMParams:
     top_k: Optional[float] = None
     frequency_penalty: Optional[float] = 0.0
     presence_penalty: Optional[float] = 0.0
+    # client-side rate limits; override the pricing table values when set
+    rate_limit_rpm: Optional[int] = None
+    rate_limit_tpm: Optional[int] = None
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "LLMParams":
@@ -66,4 +161,14 @@ class LLMParams:
             ),
             echo=bool(data.get("echo", False)),
             user=data.get("user"),
+            rate_limit_rpm=(
+                int(data["rate_limit_rpm"])
+                if data.get("rate_limit_rpm") is not None
+                else None
+            ),
+            rate_limit_tpm=(
+                int(data["rate_limit_tpm"])
+                if data.get("rate_limit_tpm") is not None
+                else None
+            ),
         )
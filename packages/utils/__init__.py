@@ -1,4 +1,15 @@
+from typing import Any
+
 from .logging import initiate_logger
-from .secrets_manager import Safebox
 
 __all__ = ["initiate_logger", "Safebox"]
+
+
+def __getattr__(name: str) -> Any:
+    # Safebox pulls in python-dotenv and searches for .env, so only pay for it
+    # when it is actually used
+    if name == "Safebox":
+        from .secrets_manager import Safebox
+
+        return Safebox
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
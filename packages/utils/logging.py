@@ -1,44 +1,216 @@
+import atexit
+import contextlib
+import json
 import logging
+import os
+import queue
+import random
 import sys
-from typing import Optional
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_FORMAT = "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s"
+DEFAULT_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+# logger name -> its sinks; a sink is only ever attached once per logger
+_sinks: Dict[str, List[logging.Handler]] = {}
+# (kind, target, format, date format, json) -> handler shared by all loggers
+_handlers: Dict[Tuple[str, str, str, str, bool], logging.Handler] = {}
+_queue_handlers: Dict[str, "_DeferredQueueHandler"] = {}
+# logger name -> (format, date format, json) its sinks are created with
+_formats: Dict[str, Tuple[str, str, bool]] = {}
+_lock = threading.Lock()
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        sample_rate = getattr(record, "sample_rate", 1.0)
+        if sample_rate < 1.0:
+            # consumers scale counts of sampled records back up by 1 / rate
+            line["sample_rate"] = sample_rate
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+class _SampleFilter(logging.Filter):
+    """Keeps a share of the records below WARNING; warnings always pass."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        if random.random() >= self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the queue never leaves the process, so the writer thread can do
+        # all the formatting instead of the caller
+        return record
+
+
+class _Dispatcher(logging.Handler):
+    """Hands each dequeued record to the sinks of the logger that made it."""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        for handler in _sinks.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        pass
+
+
+def _ensure_listener() -> None:
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_queue, _Dispatcher())
+        _listener.start()
+
+
+def stop_logging() -> None:
+    """
+    Write out every queued record and stop the writer thread.
+
+    Runs at exit; loggers keep working afterwards, restarting the writer on \
+    their next `initiate_logger` call.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in _handlers.values():
+            # as in logging.shutdown: the stream may already be closed at exit
+            with contextlib.suppress(OSError, ValueError):
+                handler.flush()
+
+
+def _reset_after_fork() -> None:
+    # the writer thread does not survive a fork; the child starts its own
+    global _listener, _queue, _lock
+    _lock = threading.Lock()
+    _queue = queue.SimpleQueue()
+    _listener = None
+    for queue_handler in _queue_handlers.values():
+        queue_handler.queue = _queue
+    if _sinks:
+        _ensure_listener()
+
+
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _sink(
+    kind: str, target: str, fmt: str, datefmt: str, json_lines: bool
+) -> logging.Handler:
+    key = (kind, target, fmt, datefmt, json_lines)
+    handler = _handlers.get(key)
+    if handler is None:
+        if kind == "console":
+            handler = logging.StreamHandler(sys.stdout)
+        else:
+            handler = logging.FileHandler(target)
+        handler.setFormatter(
+            JsonLinesFormatter(datefmt=datefmt)
+            if json_lines
+            else logging.Formatter(fmt=fmt, datefmt=datefmt)
+        )
+        _handlers[key] = handler
+    return handler
 
 
 def initiate_logger(
     name: str = __name__,
-    level: int = logging.INFO,
-    log_to_console: bool = True,
+    level: Optional[int] = None,
+    log_to_console: Optional[bool] = None,
     log_to_file: Optional[str] = None,
-    fmt: str = "[%(asctime)s] [%(levelname)s] %(name)s: %(message)s",
-    datefmt: str = "%Y-%m-%d %H:%M:%S",
+    fmt: Optional[str] = None,
+    datefmt: Optional[str] = None,
+    json_lines: Optional[bool] = None,
+    sample_rate: Optional[float] = None,
 ) -> logging.Logger:
     """
     Initialize and return a logger with optional console and file output.
 
+    Records are put on an in-process queue and written by a single \
+    background thread, so logging never blocks the caller on stdout or \
+    file I/O. The first call for a name configures the logger; later calls, \
+    as every client instance makes, only apply the arguments they pass, so \
+    a logger set up for JSON lines or sampling keeps that setup.
+
     Args:
         name (str): Name of the logger (usually __name__).
-        level (int): Logging level (e.g., logging.INFO, logging.DEBUG).
-        log_to_console (bool): Whether to log to console (stdout).
+        level (int): Logging level (e.g., logging.INFO, logging.DEBUG); \
+            defaults to logging.INFO.
+        log_to_console (bool): Whether to log to console (stdout); \
+            defaults to True.
         log_to_file (str or None): If set, logs will also be written to file.
         fmt (str): Log format string.
         datefmt (str): Format for timestamps.
+        json_lines (bool): Write one JSON object per record instead of `fmt`.
+        sample_rate (float): Share of records below WARNING that are kept, \
+            for high-volume workers; warnings and errors are never dropped.
 
     Returns:
         logging.Logger: Configured logger instance.
     """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    logger.propagate = False  # Prevent duplicate logs if root logger is configured
 
-    formatter = logging.Formatter(fmt=fmt, datefmt=datefmt)
+    with _lock:
+        first = name not in _formats
+        if first:
+            logger.propagate = False  # Prevent duplicate logs if root is configured
+            _formats[name] = (DEFAULT_FORMAT, DEFAULT_DATEFMT, False)
+            level = logging.INFO if level is None else level
+            log_to_console = True if log_to_console is None else log_to_console
+        previous = _formats[name]
+        _formats[name] = (
+            previous[0] if fmt is None else fmt,
+            previous[1] if datefmt is None else datefmt,
+            previous[2] if json_lines is None else json_lines,
+        )
+        if level is not None:
+            logger.setLevel(level)
 
-    if log_to_console:
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        sinks = _sinks.setdefault(name, [])
+        wanted = []
+        if log_to_console:
+            wanted.append(_sink("console", "stdout", *_formats[name]))
+        if log_to_file:
+            path = os.path.abspath(log_to_file)
+            wanted.append(_sink("file", path, *_formats[name]))
+        sinks.extend(handler for handler in wanted if handler not in sinks)
 
-    if log_to_file:
-        file_handler = logging.FileHandler(log_to_file)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        queue_handler = _queue_handlers.get(name)
+        if queue_handler is None:
+            queue_handler = _queue_handlers[name] = _DeferredQueueHandler(_queue)
+            logger.addHandler(queue_handler)
+        if sample_rate is not None:
+            queue_handler.filters = (
+                [_SampleFilter(sample_rate)] if sample_rate < 1 else []
+            )
+        _ensure_listener()
 
     return logger
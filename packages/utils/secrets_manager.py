@@ -1,24 +1,39 @@
 import os
+import threading
 from pathlib import Path
 
 from dotenv import load_dotenv
 
 from utils import initiate_logger
 
-# Find project root - go up until we find the directory containing .env
-current_path = Path(__file__).resolve()
-project_root = current_path
-while project_root.parent != project_root:  # Stop at filesystem root
-    if (project_root / ".env").exists():
-        break
-    project_root = project_root.parent
+_dotenv_lock = threading.Lock()
+_dotenv_loaded = False
 
-dotenv_path = project_root / ".env"
-load_dotenv(dotenv_path)
+
+def find_dotenv_path() -> Path:
+    # Find project root - go up until we find the directory containing .env
+    current_path = Path(__file__).resolve()
+    project_root = current_path
+    while project_root.parent != project_root:  # Stop at filesystem root
+        if (project_root / ".env").exists():
+            break
+        project_root = project_root.parent
+
+    return project_root / ".env"
+
+
+def load_secrets() -> None:
+    """Load the project's .env into the environment once per process."""
+    global _dotenv_loaded
+    with _dotenv_lock:
+        if not _dotenv_loaded:
+            load_dotenv(find_dotenv_path())
+            _dotenv_loaded = True
 
 
 class Safebox:
     def __init__(self) -> None:
+        load_secrets()
         self.logger = initiate_logger(self.__class__.__name__)
         for key, value in os.environ.items():
             if key.startswith("SECRET_"):
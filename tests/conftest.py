@@ -0,0 +1,53 @@
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "packages"), str(ROOT / "benchmarks")]
+
+from llm.factory import get_client_class  # noqa: E402
+from llm.llm_utils import LLMEngine  # noqa: E402
+from llm.types import Prompt  # noqa: E402
+from mock_provider import MockProvider  # noqa: E402
+
+MODELS = {"openai": "gpt-4o-mini", "gemini": "gemini-1.5-flash"}
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _quiet_logs() -> Iterator[None]:
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def mock() -> Iterator[MockProvider]:
+    with MockProvider() as provider:
+        yield provider
+
+
+@pytest.fixture(params=sorted(MODELS))
+def provider(request: pytest.FixtureRequest) -> str:
+    return str(request.param)
+
+
+@pytest.fixture
+def make_client(mock: MockProvider) -> Callable[..., Any]:
+    """Build a client of `provider` talking to the mock server."""
+
+    def make(provider: str, **kwargs: Any) -> Any:
+        base_url = mock.openai_url if provider == "openai" else mock.gemini_url
+        kwargs.setdefault("base_url", base_url)
+        return get_client_class(provider)(
+            LLMEngine(
+                config_path="", model=MODELS[provider], max_tokens=64, temperature=0.0
+            ),
+            Prompt("Say hello.", "You are terse."),
+            "test-key",
+            **kwargs,
+        )
+
+    return make
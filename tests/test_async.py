@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from llm.types import JobType, Prompt
+
+
+def test_async_requests_overlap_on_one_loop(mock, make_client, provider):
+    mock.latency = 0.3
+    client = make_client(provider)
+
+    async def call_many():
+        return await asyncio.gather(
+            *(
+                client.acall_request(JobType.CHAT_COMPLETION, Prompt(f"Hello {i}"))
+                for i in range(8)
+            )
+        )
+
+    start = time.perf_counter()
+    responses = asyncio.run(call_many())
+    # run one after another the calls would take 2.4s
+    assert time.perf_counter() - start < 1.2
+    assert len({response.model_dump_json() for response in responses}) == 8
+    records = client.get_cost_info("individual", "all")
+    assert len(records) == 8 and not any(record["failed"] for record in records)
+
+
+def test_async_and_sync_calls_are_recorded_alike(make_client, provider):
+    client = make_client(provider)
+    client.call_request(JobType.CHAT_COMPLETION, Prompt("Hello"))
+    asyncio.run(client.acall_request(JobType.CHAT_COMPLETION, Prompt("Hello")))
+
+    sync_record, async_record = client.get_cost_info("individual", "all")
+    for field in ("input_tokens", "output_tokens", "total_cost"):
+        assert async_record[field] == sync_record[field]
+
+
+def test_async_stream_yields_text(make_client, provider):
+    client = make_client(provider)
+
+    async def collect():
+        return "".join([chunk async for chunk in client.astream_request(Prompt("Hi"))])
+
+    assert asyncio.run(collect())
+    assert client.job_info.individual(-1)["output_tokens"] > 0
@@ -0,0 +1,50 @@
+import pytest
+from llm.ledger import CostLedger
+from llm.types import BatchJob, JobType, Prompt
+
+# no shared instructions, so real-time calls get no prompt-cache discount
+PROMPTS = [Prompt(f"Correct the grammar of sentence {i}.") for i in range(6)]
+
+
+def test_submit_poll_collect(make_client, provider):
+    client = make_client(provider)
+    job = client.submit_batch_job(PROMPTS)
+    assert isinstance(job, BatchJob)
+    assert job.size == len(PROMPTS)
+    assert not job.done
+
+    while not job.done:
+        job = client.poll_batch_job(job)
+
+    results = list(client.iter_batch_job_results(job, PROMPTS))
+    assert sorted(result.index for result in results) == list(range(len(PROMPTS)))
+    assert all(result.status == "success" for result in results)
+    for result in results:
+        assert result.prompt is PROMPTS[result.index]
+
+
+def test_batch_job_costs_half_of_real_time(make_client, provider):
+    real_time = CostLedger()
+    make_client(provider, ledger=real_time).call_batch(PROMPTS)
+    batch = CostLedger()
+    results = list(
+        make_client(provider, ledger=batch).call_batch_job(PROMPTS, poll_interval=0)
+    )
+
+    assert len(results) == len(PROMPTS)
+    assert batch.aggregated()["overall_total_tokens"] == pytest.approx(
+        real_time.aggregated()["overall_total_tokens"]
+    )
+    assert batch.aggregated()["overall_total_cost"] == pytest.approx(
+        real_time.aggregated()["overall_total_cost"] / 2
+    )
+    assert set(batch.aggregated()["by_job_type"]) == {JobType.BATCH.value}
+
+
+def test_failed_requests_come_back_as_errors(mock, make_client, provider):
+    mock.error_rate = 1.0
+    results = list(make_client(provider).call_batch_job(PROMPTS, poll_interval=0))
+
+    assert len(results) == len(PROMPTS)
+    assert all(result.status == "error" for result in results)
+    assert all(result.error is not None for result in results)
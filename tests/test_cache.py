@@ -0,0 +1,62 @@
+import time
+
+from llm.cache import ResponseCache, cache_key
+from llm.llm_utils import LLMEngine
+from llm.types import JobType, Prompt
+
+
+def test_memory_entries_expire():
+    cache = ResponseCache(ttl=0.05)
+    cache.set("key", "payload")
+    assert cache.get("key") == "payload"
+    time.sleep(0.1)
+    assert cache.get("key") is None
+
+
+def test_lru_evicts_the_oldest_entry():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+
+def test_disk_promotion_keeps_the_original_age(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    writer = ResponseCache(db_path=db_path, ttl=0.3)
+    writer.set("key", "payload")
+    writer.close()
+
+    reader = ResponseCache(db_path=db_path, ttl=0.3)
+    time.sleep(0.2)
+    assert reader.get("key") == "payload"
+    assert reader.stats()["disk_hits"] == 1
+    time.sleep(0.15)
+    # promoted to memory 0.2s in, yet still expires 0.3s after it was written
+    assert reader.get("key") is None
+    reader.close()
+
+
+def test_key_ignores_parameters_that_do_not_change_the_output():
+    prompt = Prompt("Hello", "Be brief.")
+    plain = LLMEngine(config_path="", model="gpt-4o-mini").params
+    streamed = LLMEngine(config_path="", model="gpt-4o-mini", stream=True).params
+    hotter = LLMEngine(config_path="", model="gpt-4o-mini", temperature=0.5).params
+    assert cache_key("openai", prompt, plain) == cache_key("openai", prompt, streamed)
+    assert cache_key("openai", prompt, plain) != cache_key("openai", prompt, hotter)
+
+
+def test_client_serves_repeats_from_the_cache(mock, make_client, provider):
+    client = make_client(provider, cache=ResponseCache())
+    first = client.call_request(JobType.CHAT_COMPLETION, Prompt("Hello"))
+    requests = mock.requests
+    second = client.call_request(JobType.CHAT_COMPLETION, Prompt("Hello"))
+
+    assert mock.requests == requests
+    assert second.model_dump() == first.model_dump()
+    hit = client.job_info.individual(-1)
+    assert hit["cache_hit"] and hit["total_cost"] == 0.0
+    totals = client.job_info.aggregated()
+    assert (totals["overall_calls"], totals["overall_cache_hits"]) == (1, 1)
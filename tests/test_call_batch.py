@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+from llm.tokens import ContextWindowExceeded
+from llm.types import Prompt
+
+
+def batch_prompts(client):
+    oversized = Prompt("word " * client.pricing.context_window)
+    return [Prompt("Hello"), oversized, Prompt("Hi")]
+
+
+def test_results_keep_input_order_and_isolate_failures(make_client, provider):
+    client = make_client(provider)
+    prompts = batch_prompts(client)
+    results = client.call_batch(prompts, max_concurrency=2)
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert [result.prompt for result in results] == prompts
+    assert [result.status for result in results] == ["success", "error", "success"]
+    assert isinstance(results[1].error, ContextWindowExceeded)
+
+
+def test_async_batch_matches_the_threaded_one(make_client, provider):
+    client = make_client(provider)
+    results = asyncio.run(client.acall_batch(batch_prompts(client), max_concurrency=2))
+    assert [result.status for result in results] == ["success", "error", "success"]
+
+
+def test_concurrency_is_bounded(mock, make_client):
+    mock.latency = 0.2
+    client = make_client("openai")
+    start = time.perf_counter()
+    client.call_batch([Prompt(f"Hello {i}") for i in range(4)], max_concurrency=2)
+    # two waves of two requests
+    assert 0.4 <= time.perf_counter() - start < 0.8
+
+
+def test_rejects_a_concurrency_below_one(make_client):
+    client = make_client("openai")
+    with pytest.raises(ValueError):
+        client.call_batch([Prompt("Hello")], max_concurrency=0)
+    with pytest.raises(ValueError):
+        asyncio.run(client.acall_batch([Prompt("Hello")], max_concurrency=0))
@@ -0,0 +1,58 @@
+import pytest
+from llm.cassette import CassetteMiss
+from llm.ledger import CostLedger
+from llm.transport import TransportConfig
+from llm.types import JobType, Prompt
+
+PROMPTS = [Prompt("Define entropy.", "You are terse."), Prompt("Define enthalpy.")]
+
+
+def run(client):
+    for prompt in PROMPTS:
+        client.call_request(JobType.CHAT_COMPLETION, prompt)
+    return "".join(client.stream_request(PROMPTS[0]))
+
+
+def test_replay_matches_recorded_costs(make_client, provider, tmp_path):
+    cassette = str(tmp_path / f"{provider}.cas")
+    recorded = CostLedger()
+    recorded_text = run(
+        make_client(
+            provider,
+            ledger=recorded,
+            transport=TransportConfig(cassette=cassette, cassette_mode="record"),
+        )
+    )
+
+    replayed = CostLedger()
+    # no server behind this base URL: every response must come from the cassette
+    replayed_text = run(
+        make_client(
+            provider,
+            ledger=replayed,
+            base_url="http://127.0.0.1:9/proxy",
+            transport=TransportConfig(cassette=cassette, cassette_mode="replay"),
+        )
+    )
+
+    assert replayed_text == recorded_text
+    for key in ("overall_calls", "overall_total_tokens", "overall_cached_tokens"):
+        assert replayed.aggregated()[key] == recorded.aggregated()[key]
+    assert replayed.aggregated()["overall_total_cost"] == pytest.approx(
+        recorded.aggregated()["overall_total_cost"]
+    )
+
+
+def test_unrecorded_request_misses(make_client, provider, tmp_path):
+    cassette = str(tmp_path / f"{provider}.cas")
+    make_client(
+        provider, transport=TransportConfig(cassette=cassette, cassette_mode="record")
+    ).call_request(JobType.CHAT_COMPLETION, PROMPTS[0])
+
+    client = make_client(
+        provider, transport=TransportConfig(cassette=cassette, cassette_mode="replay")
+    )
+    with pytest.raises(Exception) as raised:
+        client.call_request(JobType.CHAT_COMPLETION, Prompt("Never recorded."))
+    chain = [raised.value, raised.value.__cause__, raised.value.__context__]
+    assert any(isinstance(exc, CassetteMiss) for exc in chain)
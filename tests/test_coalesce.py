@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from llm.coalesce import SingleFlight
+from llm.types import JobType, Prompt
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait(1)
+        return object()
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight.call, "key", fn) for _ in range(8)]
+        time.sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert len({id(result) for result, _ in results}) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight()
+
+    def fn():
+        time.sleep(0.05)
+        raise RuntimeError("provider down")
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.call, "key", fn) for _ in range(4)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_sampled_requests_are_only_coalesced_when_forced(make_client):
+    params = make_client("openai").engine.params
+    params.temperature = 0.7
+    assert not SingleFlight().is_coalescable(params)
+    assert SingleFlight(force=True).is_coalescable(params)
+
+
+def test_client_sends_identical_requests_once(mock, make_client, provider):
+    mock.latency = 0.2
+    client = make_client(provider, single_flight=SingleFlight())
+    requests = mock.requests
+
+    async def burst():
+        return await asyncio.gather(
+            *[
+                client.acall_request(JobType.CHAT_COMPLETION, Prompt("Same question"))
+                for _ in range(5)
+            ]
+        )
+
+    responses = asyncio.run(burst())
+    assert mock.requests - requests == 1
+    assert len({id(response) for response in responses}) == 1
+    totals = client.job_info.aggregated()
+    # only the leader reached the provider
+    assert totals["overall_calls"] == 1
+    assert totals["overall_coalesced_requests"] == 4
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+import yaml
+from llm.config import ConfigStore
+
+CONFIG = """
+version: 2
+defaults: &defaults
+  temperature: 0.2
+default:
+  <<: *defaults
+  model: gpt-4o-mini
+  max_tokens: 256
+broken:
+  model: gpt-4o-mini
+  max_tokens: lots
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def test_profiles_are_parsed_once_and_copied(config_path):
+    store = ConfigStore()
+    params = store.get(config_path)
+    assert (params.model, params.temperature, params.max_tokens) == (
+        "gpt-4o-mini",
+        0.2,
+        256,
+    )
+    params.max_tokens = 1
+    assert store.get(config_path).max_tokens == 256
+
+
+def test_unrelated_keys_do_not_break_other_profiles(config_path):
+    store = ConfigStore()
+    assert store.get(config_path, "default").model == "gpt-4o-mini"
+    with pytest.raises(ValueError, match="'version' not found"):
+        store.get(config_path, "version")
+    # a malformed profile only fails its own lookup
+    with pytest.raises(ValueError, match="lots"):
+        store.get(config_path, "broken")
+    assert store.get(config_path, "default").max_tokens == 256
+
+
+def test_edits_are_picked_up_after_the_check_interval(config_path):
+    store = ConfigStore(check_interval=0.0)
+    assert store.get(config_path).max_tokens == 256
+    with open(config_path, "w") as f:
+        f.write(CONFIG.replace("max_tokens: 256", "max_tokens: 512"))
+    # the size is unchanged; bump the mtime so the edit is noticed
+    stat = os.stat(config_path)
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.get(config_path).max_tokens == 512
+
+
+def test_unchanged_files_are_not_read_again(config_path, monkeypatch):
+    store = ConfigStore(check_interval=0.0)
+    store.get(config_path)
+
+    def fail(*args):
+        raise AssertionError("config.yaml was parsed again")
+
+    monkeypatch.setattr(yaml, "safe_load", fail)
+    assert store.get(config_path, "default").max_tokens == 256
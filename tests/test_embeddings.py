@@ -0,0 +1,76 @@
+import asyncio
+
+import numpy as np
+import pytest
+from llm.embeddings import load_embeddings, plan_batches, save_embeddings
+from llm.factory import get_client_class
+from llm.llm_utils import LLMEngine
+from llm.types import JobType, Prompt
+
+EMBEDDING_MODELS = {"openai": "text-embedding-3-small", "gemini": "text-embedding-004"}
+TEXTS = [f"text number {i}" for i in range(5)]
+
+
+@pytest.fixture
+def embedder(mock, provider):
+    base_url = mock.openai_url if provider == "openai" else mock.gemini_url
+    client = get_client_class(provider)(
+        LLMEngine(config_path="", model=EMBEDDING_MODELS[provider]),
+        Prompt(""),
+        "test-key",
+        base_url=base_url,
+    )
+    client.embedding_batch_size = 2
+    return client
+
+
+def test_batches_respect_item_and_token_limits():
+    assert plan_batches(TEXTS, 2) == [(0, 2), (2, 4), (4, 5)]
+    assert plan_batches(["a" * 40, "b", "c" * 40], 10, max_tokens=10) == [
+        (0, 1),
+        (1, 2),
+        (2, 3),
+    ]
+    assert plan_batches([], 2) == []
+
+
+def test_embed_fills_one_float32_matrix_in_input_order(embedder, mock):
+    matrix = embedder.embed(TEXTS)
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (len(TEXTS), mock.embedding_dimensions)
+    # rows come back in input order whatever order the batches finish in
+    np.testing.assert_array_equal(matrix[3], embedder.embed([TEXTS[3]])[0])
+
+
+def test_every_request_is_recorded_as_an_embedding(embedder):
+    embedder.embed(TEXTS)
+    records = embedder.get_cost_info("individual", "all")
+    assert len(records) == 3
+    assert all(record["input_tokens"] > 0 for record in records)
+    by_job_type = embedder.get_cost_info()["by_job_type"]
+    assert by_job_type[JobType.TEXT_EMBEDDING.value]["calls"] == 3
+
+
+def test_async_embed_matches_embed(embedder):
+    np.testing.assert_array_equal(
+        asyncio.run(embedder.aembed(TEXTS)), embedder.embed(TEXTS)
+    )
+
+
+def test_embeddings_can_be_written_to_a_memory_map(embedder, tmp_path):
+    path = tmp_path / "vectors.npy"
+    matrix = embedder.embed(TEXTS, path=path)
+    loaded = load_embeddings(path)
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, matrix)
+
+    save_embeddings(tmp_path / "copy.npy", matrix[:2])
+    assert load_embeddings(tmp_path / "copy.npy", mmap=False).shape == (
+        2,
+        matrix.shape[1],
+    )
+
+
+def test_call_request_embeds_the_prompt_text(embedder, mock):
+    vectors = embedder.call_request(JobType.TEXT_EMBEDDING, Prompt("Hello"))
+    assert vectors.shape == (1, mock.embedding_dimensions)
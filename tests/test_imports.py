@@ -0,0 +1,70 @@
+import subprocess
+import sys
+
+import pytest
+from conftest import ROOT
+from llm.factory import get_client_class, register_provider
+from llm.pricing import get_pricing_registry
+from utils import secrets_manager
+
+
+@pytest.fixture
+def dotenv(tmp_path, monkeypatch):
+    """Point load_secrets at a fresh .env and count how often it is read."""
+    # built first, as the registry reads LLM_PRICING_FILE from the .env
+    get_pricing_registry()
+    path = tmp_path / ".env"
+    path.write_text("OPENAI_API_KEY=from-dotenv\n")
+    loads = []
+    load_dotenv = secrets_manager.load_dotenv
+    monkeypatch.setattr(secrets_manager, "find_dotenv_path", lambda: path)
+    monkeypatch.setattr(secrets_manager, "_dotenv_loaded", False)
+    monkeypatch.setattr(
+        secrets_manager,
+        "load_dotenv",
+        lambda dotenv_path: loads.append(dotenv_path) or load_dotenv(dotenv_path),
+    )
+    # registered for restoring, so the value read from the .env is removed too
+    monkeypatch.setenv("OPENAI_API_KEY", "")
+    monkeypatch.delenv("OPENAI_API_KEY")
+    return loads
+
+
+def test_import_llm_skips_provider_sdks_and_dotenv():
+    code = (
+        "import sys, llm\n"
+        "heavy = ('openai', 'google.genai', 'dotenv', 'numpy')\n"
+        "print(','.join(m for m in heavy if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={"PYTHONPATH": str(ROOT / "packages")},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_dotenv_is_read_only_when_a_key_is_missing(make_client, dotenv):
+    client = make_client("openai")
+    assert dotenv == []
+
+    for _ in range(2):
+        keyless = type(client)(client.engine, client.prompt, None, base_url="http://x")
+    assert len(dotenv) == 1
+    assert keyless.client.api_key == "from-dotenv"
+
+
+def test_unknown_providers_are_rejected():
+    with pytest.raises(ValueError):
+        get_client_class("nope")
+
+
+def test_registered_providers_are_imported_on_demand(monkeypatch):
+    from llm import factory
+
+    monkeypatch.setattr(factory, "PROVIDERS", dict(factory.PROVIDERS))
+    register_provider("Mirror", "llm.openai_client", "OpenAIClient", "openai_api_key")
+    assert get_client_class("mirror") is get_client_class("openai")
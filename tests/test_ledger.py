@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+from llm.ledger import CostLedger, JobRecordStore, make_job_info
+from llm.types import JobType
+
+
+def job_info(n):
+    return {
+        "id": f"resp_{n}",
+        "input_tokens": 10 + n,
+        "output_tokens": n,
+        "total_tokens": 10 + 2 * n,
+        "cached_tokens": n % 3,
+        "rate_limit_wait": n / 10,
+        "cache_hit": n % 5 == 0,
+        "coalesced": False,
+        "ttft": None if n % 2 else n / 100,
+        "tokens_per_second": None,
+        "attempt": 1 + n % 2,
+        "hedged": n % 4 == 0,
+        "failed": False,
+        "input_cost": n * 1e-6,
+        "output_cost": n * 2e-6,
+        "total_cost": n * 3e-6,
+    }
+
+
+def test_spilled_records_read_back():
+    store = JobRecordStore(window=4)
+    records = [job_info(n) for n in range(25)]
+    for record in records:
+        store.append(record)
+
+    assert len(store) == len(records)
+    assert os.path.getsize(store.spill_path) > 0
+    for n, record in enumerate(records):
+        read = store.get(n)
+        for field, value in record.items():
+            if isinstance(value, float):
+                assert read[field] == pytest.approx(value)
+            else:
+                assert read[field] == value
+    assert [read["id"] for read in store] == [record["id"] for record in records]
+    assert store.get(-1)["id"] == "resp_24"
+    with pytest.raises(IndexError):
+        store.get(len(records))
+    store.close()
+
+
+def test_temporary_spill_file_is_removed():
+    store = JobRecordStore(window=4)
+    for n in range(10):
+        store.append(job_info(n))
+    path = store.spill_path
+    store.close()
+    assert not os.path.exists(path)
+
+
+def test_windowed_ledger_totals_cover_spilled_records(tmp_path):
+    spill = str(tmp_path / "ledger.bin")
+    windowed = CostLedger(window=4, spill_path=spill)
+    unbounded = CostLedger()
+    for n in range(30):
+        windowed.record(job_info(n), "gpt-4o-mini", JobType.CHAT_COMPLETION)
+        unbounded.record(job_info(n), "gpt-4o-mini", JobType.CHAT_COMPLETION)
+
+    assert windowed.aggregated() == unbounded.aggregated()
+    assert windowed.individual(3) == unbounded.individual(3)
+    assert os.path.exists(spill)
+    windowed.close()
+    # a file the caller named is kept
+    assert os.path.exists(spill)
+
+
+def test_existing_spill_file_is_not_truncated(tmp_path):
+    spill = tmp_path / "ledger.bin"
+    spill.write_bytes(b"records of an earlier run")
+    with pytest.raises(FileExistsError):
+        JobRecordStore(window=4, spill_path=str(spill))
+    assert spill.read_bytes() == b"records of an earlier run"
+
+
+def test_snapshot_is_a_serializable_list():
+    ledger = CostLedger(window=4)
+    assert ledger.snapshot()["individual"] == []
+    for n in range(6):
+        ledger.record(job_info(n), "gpt-4o-mini", JobType.CHAT_COMPLETION)
+
+    snapshot = ledger.snapshot()
+    assert isinstance(snapshot["individual"], list)
+    assert len(json.loads(json.dumps(snapshot))["individual"]) == 6
+    ledger.close()
+
+
+def test_totals_are_kept_per_model_and_job_type():
+    ledger = CostLedger()
+    for n in range(1, 5):
+        model = "gpt-4o" if n % 2 else "gpt-4o-mini"
+        ledger.record(job_info(n), model, JobType.CHAT_COMPLETION)
+    ledger.record(job_info(5), "gpt-4o-mini", JobType.BATCH)
+
+    totals = ledger.aggregated()
+    assert totals["overall_total_cost"] == pytest.approx(sum(range(1, 6)) * 3e-6)
+    assert totals["by_model"]["gpt-4o"]["input_tokens"] == 11 + 13
+    assert totals["by_job_type"]["batch"]["total_tokens"] == 20
+    assert totals["overall_prefix_cache_hit_ratio"] == pytest.approx(
+        sum(n % 3 for n in range(1, 6)) / sum(10 + n for n in range(1, 6))
+    )
+
+
+def test_calls_count_only_requests_sent_to_the_provider():
+    ledger = CostLedger()
+    for n in range(1, 6):  # the fifth record is a cache hit
+        ledger.record(job_info(n), "gpt-4o-mini", JobType.CHAT_COMPLETION)
+    ledger.record(
+        {**job_info(6), "coalesced": True}, "gpt-4o-mini", JobType.CHAT_COMPLETION
+    )
+
+    totals = ledger.aggregated()
+    assert totals["overall_calls"] == 4
+    assert totals["overall_cache_hits"] == 1
+    assert totals["overall_coalesced_requests"] == 1
+    assert totals["by_model"]["gpt-4o-mini"]["calls"] == 4
+
+
+def test_made_records_default_to_an_unbilled_first_attempt():
+    record = make_job_info("resp_1", 10, 5, input_cost=1e-6, output_cost=2e-6)
+    assert record["total_tokens"] == 15
+    assert record["total_cost"] == pytest.approx(3e-6)
+    assert (record["attempt"], record["failed"], record["ttft"]) == (1, False, None)
+    assert make_job_info("error-Timeout", failed=True)["total_cost"] == 0.0
+
+    store = JobRecordStore()
+    store.append(record)
+    assert store.get(0) == record
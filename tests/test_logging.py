@@ -0,0 +1,61 @@
+import json
+
+from utils import logging as logging_state
+from utils.logging import initiate_logger, stop_logging
+
+
+def read_lines(path):
+    # stop_logging drains the queue; the next initiate_logger restarts it
+    stop_logging()
+    return path.read_text().splitlines()
+
+
+def test_records_are_written_once_however_often_the_logger_is_set_up(tmp_path):
+    path = tmp_path / "log.txt"
+    for _ in range(3):
+        logger = initiate_logger(
+            "test_logging.once", log_to_console=False, log_to_file=str(path)
+        )
+    logger.warning("hello %s", "world")
+    assert [line.split(": ", 1)[1] for line in read_lines(path)] == ["hello world"]
+
+
+def test_later_calls_keep_the_json_setup(tmp_path):
+    path = tmp_path / "log.jsonl"
+    initiate_logger(
+        "test_logging.json",
+        log_to_console=False,
+        log_to_file=str(path),
+        json_lines=True,
+    )
+    # a client instance asking for its logger again, without arguments
+    logger = initiate_logger("test_logging.json", log_to_console=False)
+    logger.warning("still json")
+    (line,) = read_lines(path)
+    assert json.loads(line)["message"] == "still json"
+
+
+def test_sampling_never_drops_warnings(tmp_path):
+    path = tmp_path / "log.txt"
+    logger = initiate_logger(
+        "test_logging.sampled",
+        log_to_console=False,
+        log_to_file=str(path),
+        sample_rate=0.0,
+    )
+    for _ in range(5):
+        logger.warning("kept")
+    assert len(read_lines(path)) == 5
+
+
+def test_exit_flush_tolerates_closed_streams(tmp_path):
+    name = "test_logging.closed"
+    logger = initiate_logger(
+        name, log_to_console=False, log_to_file=str(tmp_path / "log")
+    )
+    logger.warning("written")
+    stop_logging()
+    # as at interpreter exit, when other atexit hooks closed the stream first
+    (sink,) = logging_state._sinks[name]
+    sink.stream.close()
+    stop_logging()
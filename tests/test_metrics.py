@@ -0,0 +1,101 @@
+import threading
+import urllib.request
+
+import pytest
+from llm.ledger import make_job_info
+from llm.metrics import MetricsRegistry, get_metrics_registry, serve_metrics
+from llm.types import JobType, Prompt
+
+LABELS = {"provider": "openai", "model": "gpt-4o-mini", "job_type": "chat_completion"}
+
+
+def record(registry, latency=0.3, **job_info):
+    registry.record(
+        "openai",
+        "gpt-4o-mini",
+        JobType.CHAT_COMPLETION,
+        make_job_info("resp", **job_info),
+        latency,
+    )
+
+
+def value(snapshot, name, **labels):
+    samples = snapshot[name]["samples"]
+    return sum(
+        sample.get("value", sample.get("count"))
+        for sample in samples
+        if labels.items() <= sample["labels"].items()
+    )
+
+
+def test_requests_and_cache_hits_are_counted_apart():
+    registry = MetricsRegistry()
+    record(registry, input_tokens=10, output_tokens=20, output_cost=0.5)
+    record(registry, cache_hit=True)
+    record(registry, coalesced=True)
+
+    snapshot = registry.snapshot()
+    assert value(snapshot, "llm_requests_total", **LABELS) == 1
+    assert value(snapshot, "llm_cache_hits_total", **LABELS) == 1
+    assert value(snapshot, "llm_coalesced_requests_total", **LABELS) == 1
+    assert value(snapshot, "llm_output_tokens_total", **LABELS) == 20
+    assert value(snapshot, "llm_cost_usd_total", **LABELS) == 0.5
+
+
+def test_histograms_are_cumulative():
+    registry = MetricsRegistry()
+    record(registry, latency=0.07, output_tokens=7)
+    record(registry, latency=3.0, output_tokens=30)
+
+    (sample,) = registry.snapshot()["llm_request_duration_seconds"]["samples"]
+    assert sample["buckets"][0.05] == 0
+    assert sample["buckets"][0.1] == 1
+    assert sample["buckets"][5.0] == 2
+    assert sample["count"] == 2 and sample["sum"] == pytest.approx(3.07)
+    (throughput,) = registry.snapshot()["llm_output_tokens_per_second"]["samples"]
+    assert throughput["sum"] == pytest.approx(110.0)
+
+
+def test_shards_of_every_thread_are_summed():
+    registry = MetricsRegistry()
+    threads = [
+        threading.Thread(target=record, args=(registry,), kwargs={"output_tokens": 1})
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    record(registry, output_tokens=1)
+    assert value(registry.snapshot(), "llm_requests_total") == 5
+    assert value(registry.snapshot(), "llm_output_tokens_total") == 5
+
+
+def test_prometheus_endpoint_exports_the_registry():
+    registry = MetricsRegistry()
+    record(registry, output_tokens=3)
+    server = serve_metrics(port=0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+    assert body == registry.prometheus()
+    assert "# TYPE llm_request_duration_seconds histogram" in body
+    assert (
+        'llm_output_tokens_total{provider="openai",model="gpt-4o-mini",'
+        'job_type="chat_completion"} 3'
+    ) in body
+    assert 'le="+Inf"' in body
+
+
+def test_clients_record_their_calls(make_client, provider):
+    client = make_client(provider)
+    labels = {"provider": provider, "model": client.engine.params.model}
+    before = value(get_metrics_registry().snapshot(), "llm_requests_total", **labels)
+    client.call_request(JobType.CHAT_COMPLETION, Prompt("Hello"))
+
+    snapshot = get_metrics_registry().snapshot()
+    assert value(snapshot, "llm_requests_total", **labels) == before + 1
+    assert value(snapshot, "llm_in_flight_requests", **labels) == 0
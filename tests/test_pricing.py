@@ -0,0 +1,59 @@
+import pytest
+from llm.pricing import ModelPricing, PricingRegistry, normalize_model_name
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.delenv("LLM_PRICING_FILE", raising=False)
+    return PricingRegistry()
+
+
+def test_names_are_normalized():
+    assert normalize_model_name("GPT_4.5") == "gpt-4-5"
+    assert normalize_model_name("models/gemini-1.5-flash") == "gemini-1-5-flash"
+    assert (
+        normalize_model_name("ft:gpt-4o-mini-2024-07-18:org::abc")
+        == "gpt-4o-mini-fine-tuning"
+    )
+
+
+def test_tables_are_priced_per_token(registry):
+    pricing = registry.resolve("openai", "gpt-4o-mini")
+    assert pricing.input == pytest.approx(0.15e-6)
+    assert pricing.cached_input == pytest.approx(0.075e-6)
+    assert pricing.context_window == 128_000
+    # no cached rate published: cached tokens cost the full input rate
+    embedding = registry.resolve("openai", "text-embedding-3-small")
+    assert embedding.cached_input == embedding.input
+
+
+def test_snapshots_resolve_to_their_model(registry):
+    assert registry.resolve("openai", "gpt-4o-2024-08-06") is registry.resolve(
+        "openai", "gpt-4o"
+    )
+    assert registry.resolve("gemini", "gemini-1.5-flash-latest") is registry.resolve(
+        "gemini", "gemini-1.5-flash"
+    )
+
+
+def test_unknown_models_and_variants_are_not_priced(registry):
+    assert registry.resolve("openai", "gpt-unknown") is None
+    assert registry.resolve("openai", "o1-pro") is None
+    assert registry.resolve("gemini", "gpt-4o") is None
+
+
+def test_overrides_update_and_add_models(tmp_path):
+    overrides = tmp_path / "pricing.yaml"
+    overrides.write_text(
+        "openai:\n"
+        "  gpt-4o-mini: {output: 1.0}\n"
+        "  my-model: {input: 2.0, context_window: 8192}\n"
+    )
+    registry = PricingRegistry(str(overrides))
+
+    mini = registry.resolve("openai", "gpt-4o-mini")
+    assert mini.output == pytest.approx(1e-6)
+    assert mini.input == pytest.approx(0.15e-6)
+    assert registry.resolve("openai", "my-model") == ModelPricing(
+        input=2e-6, cached_input=2e-6, context_window=8192
+    )
@@ -0,0 +1,96 @@
+from typing import List
+
+import pytest
+from llm.cache import ResponseCache, cache_key
+from llm.prompt import compile_prompt, render_prompt
+from llm.types import JobType, LLMParams, Message, Prompt
+
+CONVERSATION: List[Message] = [
+    {"role": "system", "content": "You grade {subject} answers."},
+    {"role": "user", "content": "Is {first} right?"},
+    {"role": "assistant", "content": "Yes."},
+    {"role": "user", "content": "And {second}?"},
+]
+VARIABLES = {"subject": "maths", "first": "2+2=4", "second": "2+2=5"}
+
+
+def sent_turns(provider, request):
+    if provider == "openai":
+        return [message["content"] for message in request["input"]]
+    return [content["parts"][0]["text"] for content in request["contents"]]
+
+
+def test_render_prompt_fills_every_turn():
+    prompt = render_prompt(CONVERSATION, VARIABLES)
+    assert prompt.messages is not None
+    assert [m["content"] for m in prompt.messages] == [
+        "Is 2+2=4 right?",
+        "Yes.",
+        "And 2+2=5?",
+    ]
+    assert prompt.prompt == "And 2+2=5?"
+    # instructions are never templated
+    assert prompt.instructions == "You grade {subject} answers."
+    assert Prompt.from_messages(CONVERSATION).format(**VARIABLES) == prompt
+
+
+def test_rendered_turns_change_the_cache_key():
+    params = LLMParams(model="gpt-4o-mini", temperature=0.0)
+    first = render_prompt(CONVERSATION, VARIABLES)
+    second = render_prompt(CONVERSATION, {**VARIABLES, "first": "1+1=2"})
+    assert cache_key("openai", first, params) != cache_key("openai", second, params)
+
+
+def test_client_sends_rendered_turns(provider, make_client, mock):
+    client = make_client(provider)
+    client.call_request(JobType.CHAT_COMPLETION, CONVERSATION, VARIABLES)
+    assert sent_turns(provider, mock.last_request) == [
+        "Is 2+2=4 right?",
+        "Yes.",
+        "And 2+2=5?",
+    ]
+
+
+def test_per_call_variables_hit_the_cache_per_rendering(provider, make_client):
+    client = make_client(provider, cache=ResponseCache())
+    for first in ("2+2=4", "1+1=2", "2+2=4"):
+        client.call_request(
+            JobType.CHAT_COMPLETION, CONVERSATION, {**VARIABLES, "first": first}
+        )
+    hits = [record["cache_hit"] for record in client.get_cost_info("individual", "all")]
+    assert hits == [False, False, True]
+
+
+def test_template_renders_placeholders():
+    template = compile_prompt(Prompt("Grade {answer!r} out of {points:>3}", "Hi."))
+    rendered = template.render(answer="yes", points=10)
+    assert rendered == Prompt("Grade 'yes' out of  10", "Hi.")
+    assert template.variables == {"answer", "points"}
+    assert compile_prompt(Prompt("Grade {answer!r} out of {points:>3}", "Hi.")) is (
+        template
+    )
+
+
+def test_template_reports_missing_variables():
+    with pytest.raises(KeyError, match="answer, points"):
+        Prompt("Grade {answer} out of {points}").format()
+
+
+def test_render_many_is_lazy():
+    rows = ({"n": n} for n in range(3))
+    prompts = compile_prompt(Prompt("#{n}", "Same.")).render_many(rows)
+    assert [p.prompt for p in prompts] == ["#0", "#1", "#2"]
+
+
+def test_templates_match_str_format_on_literals_and_attributes():
+    text = "{{literal}} {user.name} {scores[0]:.1f}"
+    user = type("User", (), {"name": "Ada"})
+    variables = {"user": user, "scores": [9.25]}
+    assert compile_prompt(Prompt(text)).render(**variables).prompt == text.format(
+        **variables
+    )
+
+
+def test_positional_placeholders_are_rejected():
+    with pytest.raises(ValueError):
+        compile_prompt(Prompt("Grade {} out of {0}"))
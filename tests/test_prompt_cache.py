@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+from llm.types import JobType, Prompt
+
+
+def long_instructions():
+    # unique per test, as context caches are remembered process-wide
+    return f"Grade IELTS essays. {uuid.uuid4().hex} " + "Be strict. " * 50
+
+
+@pytest.fixture
+def gemini(make_client):
+    client = make_client("gemini", context_cache_ttl=600)
+    client.context_cache_min_tokens = 1
+    return client
+
+
+def test_openai_requests_share_a_key_per_instructions(make_client, mock):
+    client = make_client("openai")
+    keys = []
+    for instructions in ("Be brief.", "Be brief.", "Be verbose.", None):
+        client.call_request(JobType.CHAT_COMPLETION, Prompt("Hello", instructions))
+        keys.append(mock.last_request.get("prompt_cache_key"))
+    assert keys[0] == keys[1]
+    assert keys[2] not in (None, keys[0])
+    assert keys[3] is None
+
+
+def test_cached_tokens_are_billed_at_the_cached_rate(make_client, provider, gemini):
+    # OpenAI caches prefixes on its own; Gemini through a context cache
+    client = gemini if provider == "gemini" else make_client(provider)
+    prompt = Prompt("Hello", long_instructions())
+    for _ in range(2):
+        client.call_request(JobType.CHAT_COMPLETION, prompt)
+
+    record = client.job_info.individual(-1)
+    assert record["cached_tokens"] > 0
+    input_cost, _ = client.pricing.cost(
+        record["input_tokens"], 0, record["cached_tokens"]
+    )
+    assert record["input_cost"] == pytest.approx(input_cost)
+    assert record["input_cost"] < record["input_tokens"] * client.pricing.input
+    assert client.get_cost_info()["overall_cached_tokens"] >= record["cached_tokens"]
+
+
+def test_gemini_sends_long_instructions_through_a_context_cache(gemini, mock):
+    prompt = Prompt("Hello", long_instructions())
+    for _ in range(3):
+        gemini.call_request(JobType.CHAT_COMPLETION, prompt)
+
+    assert len(mock.context_caches) == 1
+    assert mock.last_request["cachedContent"] in mock.context_caches
+    assert "systemInstruction" not in mock.last_request
+
+
+def test_short_instructions_are_sent_inline(make_client, mock):
+    client = make_client("gemini", context_cache_ttl=600)
+    client.call_request(JobType.CHAT_COMPLETION, Prompt("Hello", "Be brief."))
+    assert mock.context_caches == {}
+    assert "cachedContent" not in mock.last_request
+
+
+def test_an_expired_context_cache_is_replaced(gemini, mock):
+    prompt = Prompt("Hello", long_instructions())
+    gemini.call_request(JobType.CHAT_COMPLETION, prompt)
+    mock.context_caches.clear()
+
+    # rejected, then sent again with the instructions inline
+    gemini.call_request(JobType.CHAT_COMPLETION, prompt)
+    assert "systemInstruction" in mock.last_request
+    assert not gemini.job_info.individual(-1)["failed"]
+
+    gemini.call_request(JobType.CHAT_COMPLETION, prompt)
+    assert mock.last_request["cachedContent"] in mock.context_caches
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+from llm.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+
+
+def test_bucket_reports_the_wait_for_a_deficit():
+    bucket = TokenBucket(capacity=10, rate=10)
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(5) == pytest.approx(0.5, abs=0.01)
+
+
+def test_requests_over_the_limit_wait():
+    limiter = RateLimiter(rpm=120)  # two requests per second
+    for _ in range(120):
+        assert limiter.acquire() == 0.0
+    start = time.monotonic()
+    waited = limiter.acquire()
+    assert waited > 0
+    assert time.monotonic() - start >= waited * 0.9
+    assert limiter.stats()["throttled_requests"] == 1
+
+
+def test_settle_refunds_unused_tokens():
+    limiter = RateLimiter(tpm=600)
+    limiter.acquire(600)
+    assert limiter.estimated_wait(100) > 0
+    limiter.settle(600, 100)
+    assert limiter.estimated_wait(100) == 0.0
+
+
+def test_clients_of_a_key_share_one_limiter():
+    first = get_rate_limiter("openai", "gpt-4o-mini", "key-a")
+    assert get_rate_limiter("openai", "gpt-4o-mini", "key-a") is first
+    assert get_rate_limiter("openai", "gpt-4o-mini", "key-b") is not first
+
+
+def test_explicit_limits_are_not_ignored():
+    shared = get_rate_limiter("openai", "gpt-4o-mini", "key-c")
+    own = get_rate_limiter("openai", "gpt-4o-mini", "key-c", rpm=7, tpm=700)
+    assert own is not shared
+    assert (own.rpm, own.tpm) == (7, 700)
+    assert get_rate_limiter("openai", "gpt-4o-mini", "key-c", rpm=7, tpm=700) is own
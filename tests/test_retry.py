@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from llm.retry import RetryPolicy, RetryRunner
+from llm.types import JobType
+
+
+class Flaky(Exception):
+    pass
+
+
+def runner(**policy):
+    policy.setdefault("initial_backoff", 0.0)
+    return RetryRunner(RetryPolicy(**policy), lambda exc: isinstance(exc, Flaky))
+
+
+def test_retries_until_success():
+    attempts = []
+
+    def attempt(number, hedged, timeout):
+        attempts.append(number)
+        if number < 3:
+            raise Flaky()
+        return "ok"
+
+    assert runner(max_attempts=3).call(attempt) == "ok"
+    assert attempts == [1, 2, 3]
+
+
+def test_gives_up_after_max_attempts():
+    def attempt(number, hedged, timeout):
+        raise Flaky()
+
+    with pytest.raises(Flaky):
+        runner(max_attempts=2).call(attempt)
+
+
+def test_does_not_retry_other_errors():
+    attempts = []
+
+    def attempt(number, hedged, timeout):
+        attempts.append(number)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        runner(max_attempts=3).call(attempt)
+    assert attempts == [1]
+
+
+def test_backoff_honours_retry_after():
+    class Response:
+        headers = {"retry-after": "7"}
+
+    exc = Flaky()
+    exc.response = Response()
+    assert runner(initial_backoff=0.1, jitter=0.0).backoff(1, exc) == 7.0
+
+
+def test_slow_attempt_is_hedged():
+    def attempt(number, hedged, timeout):
+        time.sleep(0.01 if hedged else 0.5)
+        return "hedge" if hedged else "first"
+
+    assert runner(hedge_after=0.05).call(attempt) == "hedge"
+
+
+def test_fast_attempts_are_not_hedged_while_queued():
+    hedges = []
+    lock = threading.Lock()
+
+    def attempt(number, hedged, timeout):
+        with lock:
+            hedges.append(hedged)
+        time.sleep(0.02)
+        return hedged
+
+    retry = runner(hedge_after=0.1, hedge_workers=2)
+    threads = [threading.Thread(target=retry.call, args=(attempt,)) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # queued for the two workers far longer than hedge_after, yet each ran fast
+    assert len(hedges) == 12 and not any(hedges)
+
+
+def test_async_slow_attempt_is_hedged():
+    async def attempt(number, hedged, timeout):
+        await asyncio.sleep(0.01 if hedged else 0.5)
+        return "hedge" if hedged else "first"
+
+    assert asyncio.run(runner(hedge_after=0.05).acall(attempt)) == "hedge"
+
+
+def test_async_requests_reuse_the_retry_free_client(make_client, monkeypatch):
+    from openai import AsyncOpenAI
+
+    copies = []
+    with_options = AsyncOpenAI.with_options
+
+    def counted(self, **options):
+        copies.append(options)
+        return with_options(self, **options)
+
+    monkeypatch.setattr(AsyncOpenAI, "with_options", counted)
+    client = make_client("openai", retry=RetryPolicy(max_attempts=2))
+
+    async def run():
+        for _ in range(3):
+            await client.acall_request(JobType.CHAT_COMPLETION)
+
+    asyncio.run(run())
+    assert copies == [{"max_retries": 0}]
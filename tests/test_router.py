@@ -0,0 +1,35 @@
+from llm.retry import RetryPolicy
+from llm.router import RouterClient
+from llm.types import JobType, Prompt
+from mock_provider import MockProvider
+
+
+def test_fails_over_and_ejects_a_failing_backend(make_client):
+    with MockProvider(error_rate=1.0) as broken:
+        # no retries, so each failure goes straight to the next backend
+        failing = make_client(
+            "openai", base_url=broken.openai_url, retry=RetryPolicy(max_attempts=1)
+        )
+        healthy = make_client("gemini")
+        router = RouterClient([failing, healthy], cost_weight=0.0, eject_after=2)
+
+        for _ in range(3):
+            router.call_request(JobType.CHAT_COMPLETION, Prompt("Hello"))
+
+    stats = router.stats()
+    failing_stats = next(v for k, v in stats.items() if k.startswith("OpenAI"))
+    healthy_stats = next(v for k, v in stats.items() if k.startswith("Gemini"))
+    assert failing_stats["failures"] == 2
+    assert failing_stats["ejections"] == 1
+    assert healthy_stats["calls"] == 3
+    totals = router.job_info.aggregated()
+    assert totals["overall_failed_attempts"] == 2
+    assert totals["overall_calls"] == 5
+
+
+def test_cost_weight_one_prefers_the_cheaper_backend(make_client):
+    expensive = make_client("openai")
+    expensive.pricing = type(expensive.pricing)(input=1e-3, output=1e-3)
+    cheap = make_client("gemini")
+    router = RouterClient([expensive, cheap], cost_weight=1.0)
+    assert router.rank(Prompt("Hello"))[0].client is cheap
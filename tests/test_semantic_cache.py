@@ -0,0 +1,79 @@
+import numpy as np
+from llm.llm_utils import LLMEngine
+from llm.semantic_cache import SemanticCache
+from llm.types import JobType, Prompt
+
+WORDS = ["paris", "capital", "france", "berlin", "germany", "what", "is", "the"]
+PARAMS = LLMEngine(config_path="", model="gpt-4o-mini", temperature=0.0).params
+
+
+def bag_of_words(texts):
+    """Deterministic stand-in for an embedding model."""
+    return np.array(
+        [[text.lower().count(word) for word in WORDS] for text in texts],
+        dtype=np.float32,
+    )
+
+
+def stored(cache, text, payload, instructions=None):
+    query = cache.query("openai", Prompt(text, instructions), PARAMS)
+    cache.add(query, payload)
+
+
+def lookup(cache, text, instructions=None, provider="openai"):
+    return cache.query(provider, Prompt(text, instructions), PARAMS).payload
+
+
+def test_similar_prompts_share_a_response():
+    cache = SemanticCache(bag_of_words, threshold=0.9)
+    stored(cache, "What is the capital of France?", "paris")
+
+    assert lookup(cache, "what is the capital of france") == "paris"
+    assert lookup(cache, "What is the capital of Germany?") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_prompts_are_only_compared_within_their_scope():
+    cache = SemanticCache(bag_of_words)
+    stored(cache, "What is the capital of France?", "paris", "Be brief.")
+    assert lookup(cache, "What is the capital of France?") is None
+    assert (
+        lookup(cache, "What is the capital of France?", "Be brief.", "gemini") is None
+    )
+
+
+def test_the_least_recently_used_prompt_is_evicted():
+    cache = SemanticCache(bag_of_words, capacity=2)
+    stored(cache, "paris", "1")
+    stored(cache, "berlin", "2")
+    lookup(cache, "paris")
+    stored(cache, "germany", "3")
+
+    assert lookup(cache, "paris") == "1"
+    assert lookup(cache, "berlin") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_index_round_trips_through_a_file(tmp_path):
+    path = str(tmp_path / "semantic.npz")
+    cache = SemanticCache(bag_of_words, path=path)
+    stored(cache, "What is the capital of France?", "paris")
+    cache.save()
+
+    reloaded = SemanticCache(bag_of_words, path=path)
+    assert lookup(reloaded, "what is the capital of france") == "paris"
+
+
+def test_client_serves_near_duplicates_from_the_index(mock, make_client, provider):
+    client = make_client(provider, semantic_cache=SemanticCache(bag_of_words))
+    first = client.call_request(
+        JobType.CHAT_COMPLETION, Prompt("What is the capital of France?")
+    )
+    requests = mock.requests
+    second = client.call_request(
+        JobType.CHAT_COMPLETION, Prompt("what is the capital of France")
+    )
+
+    assert mock.requests == requests
+    assert second.model_dump() == first.model_dump()
+    assert client.job_info.individual(-1)["cache_hit"]
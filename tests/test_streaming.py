@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+from llm.types import Prompt
+
+
+def test_completed_stream_records_usage(make_client, provider):
+    client = make_client(provider)
+    text = "".join(client.stream_request(Prompt("Hello")))
+
+    record = client.job_info.individual(-1)
+    assert text
+    assert not record["failed"]
+    assert record["output_tokens"] > 0 and record["ttft"] is not None
+
+
+def test_abandoned_stream_is_recorded_and_settled(make_client, provider):
+    client = make_client(provider)
+    stream = client.stream_request(Prompt("Hello"))
+    next(stream)
+    stream.close()
+
+    record = client.job_info.individual(-1)
+    assert record["failed"]
+    assert record["input_tokens"] > 0 and record["output_tokens"] > 0
+    assert record["total_cost"] > 0
+
+
+def test_abandoned_async_stream_is_recorded(make_client, provider):
+    client = make_client(provider)
+
+    async def consume_one():
+        stream = client.astream_request(Prompt("Hello"))
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(consume_one())
+    assert client.job_info.individual(-1)["failed"]
+
+
+def test_failed_stream_records_the_error(mock, make_client, provider):
+    mock.error_rate = 1.0
+    client = make_client(provider)
+    with pytest.raises(Exception) as raised:
+        "".join(client.stream_request(Prompt("Hello")))
+    record = client.job_info.individual(-1)
+    assert record["failed"] and record["id"] == f"error-{raised.type.__name__}"
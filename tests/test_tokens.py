@@ -0,0 +1,64 @@
+import pytest
+from llm import tokens
+from llm.embeddings import plan_batches
+from llm.tokens import APPROXIMATE, ContextWindowExceeded, TokenCounter
+from llm.types import JobType, Prompt
+
+
+def oversized(client):
+    # whatever the tokenizer, one token per word at the least
+    return Prompt("word " * client.pricing.context_window, "Be brief.")
+
+
+def test_estimate_request_prices_the_whole_output_budget(provider, make_client):
+    client = make_client(provider)
+    estimate = client.estimate_request(Prompt("Say hello.", "You are terse."))
+    input_cost, output_cost = client.pricing.cost(estimate.input_tokens, 64)
+    assert estimate.max_output_tokens == 64
+    assert estimate.max_cost == pytest.approx(input_cost + output_cost)
+    assert estimate.fits
+
+
+def test_oversized_prompts_are_rejected_before_sending(provider, make_client, mock):
+    client = make_client(provider)
+    with pytest.raises(ContextWindowExceeded):
+        client.call_request(JobType.CHAT_COMPLETION, oversized(client))
+    assert mock.requests == 0
+    assert len(client.job_info) == 0
+
+
+def test_truncate_drops_the_oldest_turns_first(provider, make_client):
+    client = make_client(provider, context_overflow="truncate")
+    window = client.pricing.context_window
+    messages = [
+        {"role": "user", "content": "word " * window},
+        {"role": "assistant", "content": "Noted."},
+        {"role": "user", "content": "Say hello."},
+    ]
+    response = client.call_request(JobType.CHAT_COMPLETION, messages)
+    assert response is not None
+    assert client.job_info.individual(0)["input_tokens"] < 100
+
+
+def test_embedding_batches_use_the_client_counter():
+    counter = TokenCounter(lambda text: len(text.split()))
+    texts = ["one two three"] * 4
+    assert plan_batches(texts, 10, max_tokens=6, tokens=counter) == [(0, 2), (2, 4)]
+    # the same texts measure ~4 characters per token without a tokenizer
+    assert plan_batches(texts, 10, max_tokens=8) == [(0, 2), (2, 4)]
+    assert APPROXIMATE.count("one two three") == 4
+
+
+def test_failing_tokenizers_fall_back_to_the_estimate(monkeypatch):
+    def broken(model):
+        raise OSError("vocabulary download failed")
+
+    monkeypatch.setitem(tokens.COUNTER_FACTORIES, "openai", broken)
+    monkeypatch.setattr(tokens, "_counters", {})
+    assert tokens.get_token_counter("openai", "gpt-4o") is APPROXIMATE
+    assert tokens.get_token_counter("mistral", "large") is APPROXIMATE
+
+
+def test_gemini_requests_carry_the_output_budget(make_client, mock):
+    make_client("gemini").call_request(JobType.CHAT_COMPLETION)
+    assert mock.last_request["generationConfig"]["maxOutputTokens"] == 64
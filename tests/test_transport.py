@@ -0,0 +1,45 @@
+import asyncio
+
+from llm.transport import TransportConfig, TransportRegistry
+
+
+def test_clients_share_one_transport_per_key(make_client, provider):
+    first, second = make_client(provider), make_client(provider)
+    assert first.client is second.client
+    _, base_url, _ = first._transport_args
+    other_key = type(first)(first.engine, first.prompt, "other-key", base_url=base_url)
+    assert other_key.client is not first.client
+
+
+def test_transport_settings_get_their_own_pool(make_client):
+    default = make_client("openai")
+    tuned = make_client("openai", transport=TransportConfig(max_connections=4))
+    assert tuned.client is not default.client
+
+
+def test_async_transports_are_pooled_per_event_loop(make_client):
+    client = make_client("openai")
+
+    async def pooled_twice():
+        return client.async_client, client.async_client
+
+    first, again = asyncio.run(pooled_twice())
+    second, _ = asyncio.run(pooled_twice())
+    assert first is again
+    assert first is not second
+
+
+def test_close_all_closes_and_forgets_transports():
+    registry = TransportRegistry()
+    closed = []
+
+    class Transport:
+        def close(self):
+            closed.append(self)
+
+    config = TransportConfig()
+    transport = registry.get("openai", "key", None, config, Transport)
+    assert registry.get("openai", "key", None, config, Transport) is transport
+    registry.close_all()
+    assert closed == [transport]
+    assert registry.get("openai", "key", None, config, Transport) is not transport